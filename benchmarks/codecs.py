@@ -0,0 +1,84 @@
+"""Measure what each queue codec costs to encode and decode, and how many bytes it sends.
+
+Every item takes the same path it does on a memory queue: the codec encodes it in the main process, the
+queue pickles the result onto the pipe, and the worker unpickles and decodes it. `none` is the queue's own
+pickling alone. Use `run.py --suite codecs` for the throughput of a real queue with each codec.
+
+    python benchmarks/codecs.py --items 20000 --output codecs.json
+"""
+
+import argparse
+import importlib.util
+import json
+import pickle
+import time
+from multiprocessing.reduction import ForkingPickler
+from typing import Any, Callable, Dict, List
+
+from quasiqueue.codecs import create_codec
+
+# Codec names with an optional `-zlib` suffix, which compresses payloads of at least 1 KB.
+CODECS = ["none", "pickle", "pickle-zlib", "msgpack", "msgpack-zlib"]
+
+
+def payloads(count: int) -> Dict[str, List[Any]]:
+    body = " ".join(f"word{i % 97}" for i in range(600))
+    return {
+        "small-dict": [{"id": i, "url": f"https://example.com/images/{i}.jpg", "retries": 0} for i in range(count)],
+        "large-dict": [
+            {"id": i, "title": f"Document {i}", "tags": ["a", "b", "c"], "body": body} for i in range(count)
+        ],
+    }
+
+
+def make_codec(name: str):
+    codec, _, compression = name.partition("-")
+    return create_codec(codec, 1024 if compression else 0)
+
+
+def timed(function: Callable[[Any], Any], items: List[Any]) -> tuple[float, List[Any]]:
+    started = time.perf_counter()
+    results = [function(item) for item in items]
+    return time.perf_counter() - started, results
+
+
+def measure(name: str, items: List[Any]) -> Dict[str, float]:
+    codec = make_codec(name)
+    encode = codec.encode if codec else lambda item: item
+    decode = codec.decode if codec else lambda item: item
+
+    encode_seconds, wire = timed(lambda item: bytes(ForkingPickler.dumps(encode(item))), items)
+    decode_seconds, decoded = timed(lambda data: decode(pickle.loads(data)), wire)
+    assert decoded == items, f"{name} changed the items."
+    return {
+        "encode_us": encode_seconds / len(items) * 1e6,
+        "decode_us": decode_seconds / len(items) * 1e6,
+        "bytes": sum(len(data) for data in wire) / len(items),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=20000)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    codecs = [name for name in CODECS if not name.startswith("msgpack") or importlib.util.find_spec("msgpack")]
+    results: Dict[str, Dict[str, Dict[str, float]]] = {}
+    for shape, items in payloads(args.items).items():
+        results[shape] = {}
+        for name in codecs:
+            result = measure(name, items)
+            results[shape][name] = result
+            print(
+                f"{shape:12} {name:14} encode {result['encode_us']:7.2f} us  decode {result['decode_us']:7.2f} us  "
+                f"{result['bytes']:9.1f} bytes",
+                flush=True,
+            )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
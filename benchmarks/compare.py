@@ -0,0 +1,70 @@
+"""Compare two benchmark result files written by `benchmarks/run.py`.
+
+    python benchmarks/compare.py before.json after.json --threshold 10
+
+Exits with status 1 when any scenario's throughput drops, or its p99 latency rises, by more than the threshold.
+"""
+
+import argparse
+import json
+import sys
+from typing import Any, Dict
+
+# Metrics shown in the comparison, and whether a higher value is better.
+METRICS = {
+    "items_per_sec": True,
+    "latency_p50_ms": False,
+    "latency_p99_ms": False,
+    "parent_cpu_percent": False,
+    "parent_rss_mb": False,
+}
+# Metrics that fail the comparison when they regress past the threshold.
+GATED = ("items_per_sec", "latency_p99_ms")
+
+
+def load(path: str) -> Dict[str, Any]:
+    with open(path) as f:
+        report = json.load(f)
+    return {"meta": report["meta"], "results": {result["name"]: result for result in report["results"]}}
+
+
+def change(before: float, after: float) -> float:
+    if before == 0:
+        return 0.0
+    return 100 * (after - before) / before
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Allowed regression in percent.")
+    args = parser.parse_args()
+
+    before, after = load(args.before), load(args.after)
+    print(f"before: {before['meta'].get('commit')}  after: {after['meta'].get('commit')}")
+
+    regressions = []
+    for name, result in after["results"].items():
+        baseline = before["results"].get(name)
+        if baseline is None:
+            print(f"{name}: no baseline")
+            continue
+        columns = []
+        for metric, higher_is_better in METRICS.items():
+            delta = change(baseline[metric], result[metric])
+            columns.append(f"{metric} {result[metric]:.2f} ({delta:+.1f}%)")
+            regressed = -delta if higher_is_better else delta
+            if metric in GATED and regressed > args.threshold:
+                regressions.append(f"{name} {metric} {delta:+.1f}%")
+        print(f"{name:28} " + "  ".join(columns))
+
+    if regressions:
+        print("\nRegressions past the threshold:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
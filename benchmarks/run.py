@@ -0,0 +1,311 @@
+"""Benchmark QuasiQueue throughput and latency with synthetic readers and writers.
+
+Every scenario pushes a fixed number of unique items through a real QueueRunner and records items per second,
+end to end latency percentiles (from the writer yielding an item to the reader finishing it), and the CPU time
+and memory of the parent and its workers. Results are written as JSON so runs can be compared across commits
+with `benchmarks/compare.py`.
+
+    python benchmarks/run.py --output before.json
+    python benchmarks/run.py --suite full --repeat 3 --set max_jobs_per_process=1000
+    python benchmarks/run.py --suite durability --output durability.json
+    python benchmarks/run.py --suite codecs --output codecs.json
+    python benchmarks/run.py --suite placement --set cpu_affinity=0-15 --output placement.json
+"""
+
+import argparse
+import asyncio
+import hashlib
+import importlib.util
+import itertools
+import json
+import logging
+import multiprocessing as mp
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import psutil
+
+from quasiqueue import QuasiQueue, Settings, __version__
+
+SUITES: Dict[str, Dict[str, List[Any]]] = {
+    "quick": {
+        "mode": ["sync", "async"],
+        "work": ["sleep", "cpu"],
+        "payload": [64],
+        "processes": [2],
+    },
+    "full": {
+        "mode": ["sync", "async"],
+        "work": ["sleep", "cpu"],
+        "payload": [64, 4096, 65536],
+        "processes": [1, 2, 4, 8],
+    },
+    # The cost of keeping queued items on disk, see queue_backend.
+    "durability": {
+        "mode": ["sync", "async"],
+        "work": ["sleep"],
+        "payload": [64, 4096],
+        "processes": [2],
+        "backend": ["memory", "sqlite-normal", "sqlite-full"],
+    },
+    # Dict items through each queue_codec, see benchmarks/codecs.py for the cost of each one alone.
+    "codecs": {
+        "mode": ["async"],
+        "work": ["sleep"],
+        "payload": [64, 4096],
+        "processes": [2],
+        "codec": ["none", "pickle", "pickle-zlib"]
+        + (["msgpack", "msgpack-zlib"] if importlib.util.find_spec("msgpack") else []),
+    },
+    # CPU bound readers with each cpu_pinning mode. The differences need several cores, ideally on two sockets.
+    "placement": {
+        "mode": ["sync"],
+        "work": ["cpu"],
+        "payload": [64],
+        "processes": [2, 4, 8],
+        "pinning": ["none", "cpu", "numa"],
+    },
+}
+
+# How long a sleep bound reader waits, and how many hash rounds a CPU bound reader runs, per item.
+SLEEP_SECONDS = 0.001
+CPU_ROUNDS = 200
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def make_reader(mode: str, work: str, finished: Any, done: Any):
+    def record(item: str | Dict[str, Any]) -> None:
+        if isinstance(item, dict):
+            index, enqueued = item["index"], item["enqueued"]
+        else:
+            index, enqueued, _ = item.split("|", 2)
+        finished[int(index)] = time.monotonic() - float(enqueued)
+        with done.get_lock():
+            done.value += 1
+
+    def burn(item: str | Dict[str, Any]) -> None:
+        digest = str(item).encode()
+        for _ in range(CPU_ROUNDS):
+            digest = hashlib.sha256(digest).digest()
+
+    if mode == "async":
+
+        async def async_reader(item: str):
+            if work == "sleep":
+                await asyncio.sleep(SLEEP_SECONDS)
+            else:
+                burn(item)
+            record(item)
+
+        return async_reader
+
+    def sync_reader(item: str):
+        if work == "sleep":
+            time.sleep(SLEEP_SECONDS)
+        else:
+            burn(item)
+        record(item)
+
+    return sync_reader
+
+
+def make_writer(items: int, payload: int, as_dict: bool = False):
+    counter = itertools.count()
+    padding = "x" * payload
+
+    async def writer(desired: int):
+        for _ in range(desired):
+            index = next(counter)
+            if index >= items:
+                return
+            if as_dict:
+                yield {"index": index, "enqueued": time.monotonic(), "padding": padding}
+            else:
+                yield f"{index}|{time.monotonic()}|{padding}"
+
+    return writer
+
+
+def backend_settings(backend: str, directory: str) -> Dict[str, str]:
+    """Settings for a backend name like `memory` or `sqlite-full`, where the suffix is the synchronous mode."""
+    name, _, synchronous = backend.partition("-")
+    if name == "memory":
+        return {}
+    return {
+        "queue_backend": name,
+        "queue_path": f"{directory}/queue.db",
+        "queue_sqlite_synchronous": synchronous.upper() or "NORMAL",
+    }
+
+
+def item_index(item: Dict[str, Any]) -> int:
+    return item["index"]
+
+
+def codec_settings(codec: str) -> Dict[str, str]:
+    """Settings for a codec name like `pickle` or `msgpack-zlib`, where the suffix compresses items of 1 KB or more."""
+    name, _, compression = codec.partition("-")
+    return {"queue_codec": name, "queue_compress_min_bytes": "1024" if compression else "0"}
+
+
+async def run_scenario(params: Dict[str, Any], items: int, overrides: Dict[str, str]) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory() as directory:
+        backend = backend_settings(params.get("backend", "memory"), directory)
+        codec = codec_settings(params.get("codec", "none"))
+        pinning = {"cpu_pinning": params["pinning"]} if "pinning" in params else {}
+        return await _run_scenario(params, items, {**backend, **codec, **pinning, **overrides})
+
+
+async def _run_scenario(params: Dict[str, Any], items: int, overrides: Dict[str, str]) -> Dict[str, Any]:
+    ctx = mp.get_context("fork")
+    finished = ctx.RawArray("d", items)
+    done = ctx.Value("i", 0)
+    settings = Settings(num_processes=params["processes"], **overrides)
+    runner = QuasiQueue(
+        f"benchmark_{params['mode']}_{params['work']}",
+        reader=make_reader(params["mode"], params["work"], finished, done),
+        writer=make_writer(items, params["payload"], as_dict="codec" in params),
+        # Dict items aren't hashable, so they are deduplicated by index.
+        dedup_key=item_index if "codec" in params else None,
+        settings=settings,
+    )
+
+    shutdown_event = ctx.Event()
+    parent = psutil.Process()
+    parent_rss = worker_rss = 0
+    usage_before = resource.getrusage(resource.RUSAGE_SELF)
+    children_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    started = time.monotonic()
+
+    loop_task = asyncio.create_task(runner._run_loop(shutdown_event))
+    while done.value < items and not loop_task.done():
+        await asyncio.sleep(0.01)
+        parent_rss = max(parent_rss, parent.memory_info().rss)
+        try:
+            worker_rss = max(worker_rss, sum(child.memory_info().rss for child in parent.children()))
+        except psutil.NoSuchProcess:
+            pass
+    elapsed = time.monotonic() - started
+
+    shutdown_event.set()
+    await loop_task
+    for process in runner.processes:
+        process.join(settings.graceful_shutdown_timeout)
+        if process.is_alive():
+            process.terminate()
+            process.join()
+
+    usage_after = resource.getrusage(resource.RUSAGE_SELF)
+    children_after = resource.getrusage(resource.RUSAGE_CHILDREN)
+    parent_cpu = (usage_after.ru_utime - usage_before.ru_utime) + (usage_after.ru_stime - usage_before.ru_stime)
+    worker_cpu = (children_after.ru_utime - children_before.ru_utime) + (
+        children_after.ru_stime - children_before.ru_stime
+    )
+    latencies = list(finished)
+
+    return {
+        "items": items,
+        "seconds": elapsed,
+        "items_per_sec": items / elapsed,
+        "latency_p50_ms": percentile(latencies, 0.50) * 1000,
+        "latency_p99_ms": percentile(latencies, 0.99) * 1000,
+        "parent_cpu_seconds": parent_cpu,
+        "parent_cpu_percent": 100 * parent_cpu / elapsed,
+        "worker_cpu_seconds": worker_cpu,
+        "parent_rss_mb": parent_rss / 2**20,
+        "worker_rss_mb": worker_rss / 2**20,
+    }
+
+
+def median_result(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_overrides(values: List[str]) -> Dict[str, str]:
+    overrides = {}
+    for value in values:
+        key, _, setting = value.partition("=")
+        if key not in Settings.model_fields:
+            raise SystemExit(f"Unknown setting: {key}")
+        overrides[key] = setting
+    return overrides
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--suite", choices=SUITES, default="quick")
+    parser.add_argument("--items", type=int, default=2000, help="Items pushed through each scenario.")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per scenario, the median is reported.")
+    parser.add_argument("--filter", default="", help="Only run scenarios whose name contains this string.")
+    parser.add_argument("--set", action="append", default=[], metavar="SETTING=VALUE", help="Override a setting.")
+    parser.add_argument("--output", default="benchmark.json")
+    args = parser.parse_args()
+    # Keep the per-scenario shutdown warnings out of the results.
+    logging.basicConfig(level=logging.ERROR)
+
+    overrides = parse_overrides(args.set)
+    suite = SUITES[args.suite]
+    results = []
+    for values in itertools.product(*suite.values()):
+        params = dict(zip(suite.keys(), values))
+        name = "{mode}-{work}-{payload}b-{processes}p".format(**params)
+        if "backend" in params:
+            name += f"-{params['backend']}"
+        if "codec" in params:
+            name += f"-{params['codec']}"
+        if "pinning" in params:
+            name += f"-pin-{params['pinning']}"
+        if args.filter not in name:
+            continue
+        runs = [asyncio.run(run_scenario(params, args.items, overrides)) for _ in range(args.repeat)]
+        result = {"name": name, "params": params, **median_result(runs)}
+        results.append(result)
+        print(
+            f"{name:42} {result['items_per_sec']:10.1f} items/s  p50 {result['latency_p50_ms']:8.2f} ms  "
+            f"p99 {result['latency_p99_ms']:8.2f} ms  parent cpu {result['parent_cpu_percent']:5.1f}%",
+            flush=True,
+        )
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "version": __version__,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": psutil.cpu_count(),
+            "timestamp": time.time(),
+            "suite": args.suite,
+            "items": args.items,
+            "repeat": args.repeat,
+            "settings": overrides,
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {len(results)} results to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Measure how long workers take to start under each multiprocessing start method.
+
+The queue runs in its own process and every worker records when its context function runs, which is the moment
+it is ready to read items. `--heap-mb` grows the parent before the workers start, since the cost of forking
+grows with the size of the parent while spawn and forkserver workers don't inherit it.
+
+    python benchmarks/startup.py --repeat 5 --heap-mb 512 --preload numpy
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing as mp
+import os
+import signal
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from quasiqueue import QuasiQueue, Settings
+
+METHODS = ("fork", "forkserver", "spawn")
+
+
+class StartupSettings(Settings):
+    ready_dir: str
+
+
+async def idle_writer():
+    return
+    yield
+
+
+def idle_reader(item: str):
+    pass
+
+
+def ready_context(settings: Dict[str, Any]) -> Dict[str, Any]:
+    # CLOCK_MONOTONIC is shared by every process on the machine, so the times can be compared with the parent's.
+    ready = time.monotonic()
+    path = Path(settings["ready_dir"]) / str(os.getpid())
+    # Rename into place so the parent never reads a half written file.
+    path.with_suffix(".tmp").write_text(str(ready))
+    path.with_suffix(".tmp").rename(path)
+    return {}
+
+
+def run_queue(settings: StartupSettings, heap_mb: int) -> None:
+    heap = b"x" * (heap_mb * 2**20)  # noqa: F841
+    queue = QuasiQueue("startup", reader=idle_reader, writer=idle_writer, context=ready_context, settings=settings)
+    asyncio.run(queue.main())
+
+
+def measure(method: str, processes: int, heap_mb: int, preload: List[str]) -> Dict[str, float]:
+    with tempfile.TemporaryDirectory() as ready_dir:
+        settings = StartupSettings(
+            ready_dir=ready_dir,
+            num_processes=processes,
+            start_method=method,
+            preload_modules=preload,
+            full_queue_sleep_min=0.05,
+            full_queue_sleep_max=0.05,
+            graceful_shutdown_timeout=5,
+        )
+        runner = mp.get_context("fork").Process(target=run_queue, args=(settings, heap_mb))
+        # The heap is allocated before the workers start, so it is included here for every method.
+        started = time.monotonic()
+        runner.start()
+        deadline = started + 60
+        while len(list(Path(ready_dir).glob("[0-9]*[0-9]"))) < processes:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"{method} workers did not start.")
+            time.sleep(0.005)
+        ready = sorted(float(path.read_text()) - started for path in Path(ready_dir).glob("[0-9]*[0-9]"))
+        os.kill(runner.pid, signal.SIGTERM)
+        runner.join()
+    return {"first_ready_seconds": ready[0], "all_ready_seconds": ready[-1]}
+
+
+def summarize(runs: List[Dict[str, float]]) -> Dict[str, Dict[str, float]]:
+    return {
+        key: {"median": statistics.median(run[key] for run in runs), "max": max(run[key] for run in runs)}
+        for key in runs[0]
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--heap-mb", type=int, default=0, help="Memory the parent allocates before starting workers.")
+    parser.add_argument("--preload", action="append", default=[], help="Module passed to preload_modules.")
+    parser.add_argument("--method", action="append", choices=METHODS, help="Start methods to compare.")
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    results = {}
+    for method in args.method or METHODS:
+        runs = [measure(method, args.processes, args.heap_mb, args.preload) for _ in range(args.repeat)]
+        results[method] = summarize(runs)
+        for key, values in results[method].items():
+            print(f"{method:10} {key:20} median {values['median'] * 1000:9.1f} ms  max {values['max'] * 1000:9.1f} ms")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Measure how long QuasiQueue takes to replace a dead worker and to shut down.
+
+The queue runs in its own process with a writer that never has work, so the scheduler backs off for up to
+`full_queue_sleep_max` seconds between attempts. That is the worst case for anything tied to the scheduler loop.
+
+    python benchmarks/supervision.py --repeat 5
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing as mp
+import os
+import signal
+import statistics
+import time
+from typing import Dict, List
+
+import psutil
+
+from quasiqueue import QuasiQueue, Settings
+
+
+async def idle_writer():
+    return
+    yield
+
+
+def idle_reader(item: str):
+    pass
+
+
+def run_queue(backoff_max: float) -> None:
+    settings = Settings(
+        num_processes=2,
+        full_queue_sleep_min=0.5,
+        full_queue_sleep_max=backoff_max,
+        empty_queue_sleep_time=0.05,
+        graceful_shutdown_timeout=10,
+    )
+    asyncio.run(QuasiQueue("supervision", reader=idle_reader, writer=idle_writer, settings=settings).main())
+
+
+def wait_for_workers(parent: psutil.Process, count: int, exclude: int | None = None, timeout: float = 30) -> float:
+    """Poll until the parent has `count` workers, none of them `exclude`, and return when that happened."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        children = [child for child in parent.children() if child.pid != exclude and child.status() != "zombie"]
+        if len(children) == count:
+            return time.monotonic()
+        time.sleep(0.001)
+    raise TimeoutError("Workers were not replaced.")
+
+
+def measure(backoff_max: float, warm_up: float) -> Dict[str, float]:
+    runner = mp.get_context("fork").Process(target=run_queue, args=(backoff_max,))
+    runner.start()
+    parent = psutil.Process(runner.pid)
+    wait_for_workers(parent, 2)
+    # Let the scheduler reach a long backoff sleep.
+    time.sleep(warm_up)
+
+    victim = parent.children()[0].pid
+    killed = time.monotonic()
+    os.kill(victim, signal.SIGKILL)
+    restart = wait_for_workers(parent, 2, exclude=victim) - killed
+
+    time.sleep(warm_up)
+    stopping = time.monotonic()
+    os.kill(runner.pid, signal.SIGTERM)
+    runner.join()
+    shutdown = time.monotonic() - stopping
+    return {"restart_seconds": restart, "shutdown_seconds": shutdown}
+
+
+def summarize(runs: List[Dict[str, float]]) -> Dict[str, Dict[str, float]]:
+    return {
+        key: {"median": statistics.median(run[key] for run in runs), "max": max(run[key] for run in runs)}
+        for key in runs[0]
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--backoff-max", type=float, default=4.0, help="full_queue_sleep_max for the queue.")
+    parser.add_argument("--warm-up", type=float, default=3.0, help="Seconds to run before each measurement.")
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    results = summarize([measure(args.backoff_max, args.warm_up) for _ in range(args.repeat)])
+    for key, values in results.items():
+        print(f"{key:18} median {values['median'] * 1000:9.1f} ms  max {values['max'] * 1000:9.1f} ms")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
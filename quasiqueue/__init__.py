@@ -1,3 +1,5 @@
+from typing import TYPE_CHECKING, Any
+
 try:
     from . import _version  # type: ignore
 
@@ -5,16 +7,45 @@ try:
 except Exception:
     __version__ = "0.0.0-dev"
 
-from .builder import Builder  # noqa: F401
-from .reader import reader_process  # noqa: F401
-from .runner import QueueRunner as QuasiQueue  # noqa: F401
-from .runner import run_queues  # noqa: F401
-from .settings import Settings  # noqa: F401
+if TYPE_CHECKING:
+    from .builder import Builder  # noqa: F401
+    from .cursor import Cursor  # noqa: F401
+    from .reader import reader_process  # noqa: F401
+    from .runner import QueueRunner as QuasiQueue  # noqa: F401
+    from .runner import run_queues  # noqa: F401
+    from .settings import Settings  # noqa: F401
+
+# The public names are imported on first use, so workers and the cli only pay for pydantic and psutil when they
+# need them.
+_LAZY_IMPORTS = {
+    "Builder": ("builder", "Builder"),
+    "Cursor": ("cursor", "Cursor"),
+    "QuasiQueue": ("runner", "QueueRunner"),
+    "Settings": ("settings", "Settings"),
+    "reader_process": ("reader", "reader_process"),
+    "run_queues": ("runner", "run_queues"),
+}
 
 __all__ = [
     "Builder",
+    "Cursor",
     "QuasiQueue",
     "Settings",
     "reader_process",
     "run_queues",
 ]
+
+
+def __getattr__(name: str) -> Any:
+    if name not in _LAZY_IMPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from importlib import import_module
+
+    module, attribute = _LAZY_IMPORTS[name]
+    value = getattr(import_module(f".{module}", __name__), attribute)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list:
+    return sorted(list(globals()) + list(_LAZY_IMPORTS))
@@ -0,0 +1,255 @@
+import logging
+import multiprocessing.queues
+import os
+import pickle
+import sqlite3
+import time
+from multiprocessing.context import BaseContext
+from queue import Empty, Full
+from typing import Any, Dict, List, Tuple, Type
+
+from .imports import get_function_from_string
+
+logger = logging.getLogger(__name__)
+
+# How often a blocking get or put on a polling backend checks again.
+POLL_INTERVAL = 0.005
+
+_inherited_connections: List[sqlite3.Connection] = []
+
+
+class Claim:
+    """An item taken from a backend that must be acknowledged once the reader is done with it.
+
+    Backends with visibility timeouts return these from `get`. Workers unwrap them before calling the reader
+    and pass the receipt to `ack` afterwards.
+    """
+
+    __slots__ = ("item", "receipt")
+
+    def __init__(self, item: Any, receipt: Any) -> None:
+        self.item = item
+        self.receipt = receipt
+
+
+def split_claim(item: Any) -> Tuple[Any, Any]:
+    """Return the original item and its receipt, or None if the backend doesn't use acknowledgements."""
+    if type(item) is Claim:
+        return item.item, item.receipt
+    return item, None
+
+
+class QueueBackend:
+    """The queue between the writer and the workers.
+
+    It follows the `multiprocessing.Queue` interface: `get` raises `queue.Empty` and `put` raises `queue.Full`
+    when the timeout passes. A backend is created in the main process with `from_settings` and then sent to
+    every worker, so it has to be picklable and open its own resources in each process.
+    """
+
+    # Whether the Builder should hand the backend a whole block of items at once with `put_many`.
+    batch_puts = False
+    # Whether items outlive the process tree. Durable queues don't get shutdown sentinels.
+    durable = False
+
+    @classmethod
+    def from_settings(cls, settings: Any, name: str, ctx: BaseContext) -> "QueueBackend":
+        raise NotImplementedError
+
+    def put(self, item: Any, block: bool = True, timeout: float | None = None) -> None:
+        raise NotImplementedError
+
+    def get(self, block: bool = True, timeout: float | None = None) -> Any:
+        raise NotImplementedError
+
+    def qsize(self) -> int:
+        raise NotImplementedError
+
+    def put_nowait(self, item: Any) -> None:
+        self.put(item, False)
+
+    def get_nowait(self) -> Any:
+        return self.get(False)
+
+    def put_many(self, items: List[Any], timeout: float | None = None) -> None:
+        for item in items:
+            self.put(item, True, timeout)
+
+    def get_many(self, max_items: int, timeout: float | None = None) -> List[Any]:
+        """Wait up to `timeout` for one item, then take up to `max_items` without waiting."""
+        items = [self.get(True, timeout)]
+        while len(items) < max_items:
+            try:
+                items.append(self.get(False))
+            except Empty:
+                break
+        return items
+
+    def ack(self, receipt: Any) -> None:
+        """Mark a claimed item as done. Backends without visibility timeouts have nothing to do."""
+
+    def close(self) -> None:
+        pass
+
+    def join_thread(self) -> None:
+        pass
+
+
+class MemoryQueue(multiprocessing.queues.Queue, QueueBackend):
+    """The default backend, a `multiprocessing.Queue`. Items only live in memory."""
+
+    @classmethod
+    def from_settings(cls, settings: Any, name: str, ctx: BaseContext) -> "MemoryQueue":
+        return cls(settings.max_queue_size, ctx=ctx)
+
+
+class SQLiteQueue(QueueBackend):
+    """A durable backend storing items in a SQLite database in WAL mode.
+
+    `get` claims an item by hiding it for `visibility_timeout` seconds, and `ack` deletes it once the reader
+    is done. Items claimed by a worker that crashed become visible again when their timeout runs out, and
+    every claim is released when the queue starts, so queued work survives the whole process tree
+    crashing. Items delivered more than `max_deliveries` times are dropped so one item that kills its
+    worker can't block the queue forever.
+    """
+
+    batch_puts = True
+    durable = True
+
+    def __init__(
+        self,
+        path: str,
+        maxsize: int = 0,
+        visibility_timeout: float = 300.0,
+        max_deliveries: int = 3,
+        synchronous: str = "NORMAL",
+    ) -> None:
+        self.path = path
+        self.maxsize = maxsize
+        self.visibility_timeout = visibility_timeout
+        self.max_deliveries = max_deliveries
+        self.synchronous = synchronous
+        self._connection: sqlite3.Connection | None = None
+        self._pid: int | None = None
+
+    @classmethod
+    def from_settings(cls, settings: Any, name: str, ctx: BaseContext) -> "SQLiteQueue":
+        if not settings.queue_path:
+            raise ValueError(f"[{name}] The sqlite queue_backend needs a queue_path.")
+        queue = cls(
+            settings.queue_path,
+            settings.max_queue_size,
+            settings.queue_visibility_timeout,
+            settings.queue_max_deliveries,
+            settings.queue_sqlite_synchronous,
+        )
+        released = queue.release_claims()
+        if released:
+            logger.warning(f"[{name}] Released {released} items claimed by workers of a previous run.")
+        return queue
+
+    def __getstate__(self):
+        # Connections can't cross processes, every process opens its own.
+        state = self.__dict__.copy()
+        state["_connection"] = None
+        state["_pid"] = None
+        return state
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        if self._connection is None or self._pid != os.getpid():
+            if self._connection is not None:
+                # Closing a connection inherited through fork can delete the WAL the parent is still using, so
+                # it is kept open and never touched.
+                _inherited_connections.append(self._connection)
+            # Transactions are managed explicitly, so the connection runs in autocommit mode.
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(f"PRAGMA synchronous={self.synchronous}")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS items ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, item BLOB NOT NULL, "
+                "visible_at REAL NOT NULL, deliveries INTEGER NOT NULL DEFAULT 0)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS items_visible ON items (visible_at, id)")
+            self._connection = connection
+            self._pid = os.getpid()
+        return self._connection
+
+    def release_claims(self) -> int:
+        """Make every claimed item visible again. Only safe when no workers are running."""
+        return self.db.execute("UPDATE items SET visible_at = 0 WHERE visible_at > ?", (time.time(),)).rowcount
+
+    def qsize(self) -> int:
+        """The number of items waiting to be claimed. Items being read don't count."""
+        return self.db.execute("SELECT COUNT(*) FROM items WHERE visible_at <= ?", (time.time(),)).fetchone()[0]
+
+    def put(self, item: Any, block: bool = True, timeout: float | None = None) -> None:
+        self.put_many([item], timeout if block else 0)
+
+    def put_many(self, items: List[Any], timeout: float | None = None) -> None:
+        """Insert items in a single transaction, waiting up to `timeout` for room if `maxsize` is set."""
+        if not items:
+            return
+        rows = [(pickle.dumps(item, protocol=pickle.HIGHEST_PROTOCOL), 0.0) for item in items]
+        deadline = time.monotonic() + (timeout or 0)
+        while self.maxsize and self.qsize() + len(rows) > self.maxsize:
+            if time.monotonic() >= deadline:
+                raise Full
+            time.sleep(POLL_INTERVAL)
+        db = self.db
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.executemany("INSERT INTO items (item, visible_at) VALUES (?, ?)", rows)
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    def _claim(self, count: int) -> List[Claim]:
+        current = time.time()
+        rows = self.db.execute(
+            "UPDATE items SET visible_at = ?, deliveries = deliveries + 1 WHERE id IN "
+            "(SELECT id FROM items WHERE visible_at <= ? ORDER BY id LIMIT ?) RETURNING id, item, deliveries",
+            (current + self.visibility_timeout, current, count),
+        ).fetchall()
+        claims = []
+        for rowid, item, deliveries in sorted(rows):
+            if deliveries > self.max_deliveries:
+                logger.warning(f"Dropping queue item {rowid} after {deliveries - 1} deliveries that never finished.")
+                self.ack(rowid)
+                continue
+            claims.append(Claim(pickle.loads(item), rowid))
+        return claims
+
+    def get_many(self, max_items: int, timeout: float | None = None) -> List[Any]:
+        """Claim up to `max_items` in one statement, waiting up to `timeout` for the first."""
+        deadline = time.monotonic() + (timeout or 0)
+        while True:
+            claims = self._claim(max_items)
+            if claims:
+                return claims
+            if time.monotonic() >= deadline:
+                raise Empty
+            time.sleep(POLL_INTERVAL)
+
+    def get(self, block: bool = True, timeout: float | None = None) -> Any:
+        return self.get_many(1, timeout if block else 0)[0]
+
+    def ack(self, receipt: Any) -> None:
+        self.db.execute("DELETE FROM items WHERE id = ?", (receipt,))
+
+    def close(self) -> None:
+        if self._connection is not None and self._pid == os.getpid():
+            self._connection.close()
+        self._connection = None
+
+
+BACKENDS: Dict[str, Type[QueueBackend]] = {"memory": MemoryQueue, "sqlite": SQLiteQueue}
+
+
+def create_queue(settings: Any, name: str, ctx: BaseContext) -> QueueBackend:
+    """Create the queue backend named by `queue_backend`, either a built in one or a `module:Class` path."""
+    backend = settings.queue_backend
+    backend_class: Type[QueueBackend] = BACKENDS[backend] if backend in BACKENDS else get_function_from_string(backend)  # type: ignore[assignment]
+    return backend_class.from_settings(settings, name, ctx)
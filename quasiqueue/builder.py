@@ -1,32 +1,58 @@
-import inspect
+import asyncio
+import math
+import random
 import time
 from logging import getLogger
 from queue import Full
+from typing import Any, Callable, Dict, List
+
+from .codecs import create_codec
+from .cursor import Cursor, CursorStore
+from .dedup import HashedHistory
+from .metrics import MetricsRegistry
+from .overflow import OverflowBuffer
+from .shards import WriterShard, build_shards
+from .tracing import TracedItem
 
 logger = getLogger(__name__)
 
 
 class Builder:
-    def __init__(self, queue, settings, writer):
+    def __init__(
+        self,
+        queue,
+        settings,
+        writer,
+        metrics: MetricsRegistry | None = None,
+        cursors: CursorStore | None = None,
+        dedup_key: Callable[[Any], Any] | None = None,
+    ):
         self.i = 0
         self.queue = queue
         self.settings = settings
-        self.last_queued = {}
+        self.last_queued: Dict[Any, float] | HashedHistory = HashedHistory() if settings.dedup_hash else {}
+        self.dedup_key = dedup_key
+        self.codec = create_codec(settings.queue_codec, settings.queue_compress_min_bytes)
         self.writer = writer
+        self.shards = build_shards(writer, settings)
+        self.cursors = cursors if cursors is not None else CursorStore()
         self.closed = False
         self.exhausted = False
         self.empty_count = 0
         self.full_consecutive = 0
-        self.writer_args = inspect.getfullargspec(self.writer).args
+        self.metrics = metrics
+        # Plain multiprocessing queues still work, they just don't get these features.
+        self.batch_puts = getattr(queue, "batch_puts", False)
+        self.durable = getattr(queue, "durable", False)
+        # Writers such as RemoteSource yield items another Builder already encoded and traced.
+        self.prepared = getattr(writer, "prepared", False)
+        self.overflow: OverflowBuffer | None = None
+        if settings.overflow_max_bytes:
+            self.overflow = OverflowBuffer(settings.overflow_max_bytes, settings.overflow_dir)
 
     async def populate(self, max=50):
         self.clean_history()
 
-        writer_kw_args = {}
-
-        if "settings" in self.writer_args:
-            writer_kw_args["settings"] = self.settings
-
         try:
             queue_size = self.queue.qsize()
         except NotImplementedError:
@@ -37,10 +63,12 @@ class Builder:
             return True
 
         count = min(int(self.settings.max_queue_size * 0.8) - queue_size, max)
-        blocksize = min(self.settings.lookup_block_size, count)
-
-        if "desired" in self.writer_args:
-            writer_kw_args["desired"] = blocksize
+        # With an overflow buffer the writer can return more than the queue has room for.
+        blocksize = (
+            self.settings.lookup_block_size
+            if self.overflow is not None
+            else min(self.settings.lookup_block_size, count)
+        )
 
         if count <= 0:
             logger.debug("Skipping queue population due to max queue size.")
@@ -50,25 +78,66 @@ class Builder:
             successful_adds = 0
 
             if self.closed:
-                for i in range(0, blocksize):
-                    self.queue.put("close", True, self.settings.queue_interaction_timeout)
+                if not self.durable:
+                    for i in range(0, min(blocksize, count)):
+                        self.queue.put("close", True, self.settings.queue_interaction_timeout)
                 return False
 
-            async for id in self.writer(**writer_kw_args):
-                if id is None or id is False:
-                    logger.debug(f"Returning False {id}")
-                    self.empty_count += 1
-                    self.full_consecutive += 1
-                    if self.empty_count >= self.settings.empty_queue_sleep_time:
-                        self.exhausted = True
-                    return False
-                if self.add_to_queue(id):
-                    logger.debug(f"Added {id} to queue.")
-                    successful_adds += 1
-                    self.empty_count = 0
-                    self.full_consecutive = 0
-                    if successful_adds >= max:
-                        return True
+            if self.overflow:
+                # Items kept from earlier writer calls go first, and the writer isn't called until they run out.
+                # They only leave the buffer once they are on the queue, so a full queue doesn't lose any.
+                items = self.overflow.peek_many(count)
+                peeked = len(items)
+                try:
+                    self.flush(items)
+                finally:
+                    self.overflow.discard(peeked - len(items))
+                self.empty_count = 0
+                self.full_consecutive = 0
+                return True
+
+            if len(self.shards) > 1:
+                return await self._populate_shards(count, blocksize)
+
+            # Backends that pay per write, such as SQLite transactions, get each block of items in one call.
+            pending: List[Any] = []
+            flush_size = blocksize if self.batch_puts else 1
+            shard = self.shards[0]
+            writer_started = time.monotonic()
+            try:
+                async for id in shard(blocksize, self.cursors.get(shard.key)):
+                    if type(id) is Cursor:
+                        self.save_cursor(shard, id, pending)
+                        continue
+                    if id is None or id is False:
+                        logger.debug(f"Returning False {id}")
+                        self.empty_count += 1
+                        self.full_consecutive += 1
+                        if self.empty_count >= self.settings.empty_queue_sleep_time:
+                            self.exhausted = True
+                        return False
+                    item = self.prepare_item(id)
+                    if item is not None and self.overflow is not None and successful_adds >= count:
+                        if not self.overflow.append(item):
+                            # Forget the item so it is queued when the writer returns it again.
+                            self.forget(id)
+                            return True
+                        continue
+                    if item is not None:
+                        pending.append(item)
+                        if len(pending) >= flush_size:
+                            self.flush(pending)
+                        logger.debug(f"Added {id} to queue.")
+                        successful_adds += 1
+                        self.empty_count = 0
+                        self.full_consecutive = 0
+                        if successful_adds >= max and self.overflow is None:
+                            return True
+            finally:
+                self.flush(pending)
+                if self.metrics:
+                    self.metrics.inc("writer_calls")
+                    self.metrics.observe("writer_latency", time.monotonic() - writer_started)
 
             if successful_adds == 0:
                 self.empty_count += 1
@@ -81,26 +150,152 @@ class Builder:
         except Full:
             logger.debug("Queue has reached max size.")
             self.full_consecutive += 1
+            if self.metrics:
+                self.metrics.inc("queue_full")
+            return False
+
+    async def _populate_shards(self, count: int, blocksize: int) -> bool:
+        """Run every shard that isn't backing off at once, each filling an equal share of the room in the queue.
+
+        Items are queued as they arrive, so a slow shard only holds up its own share.
+        """
+        shards = [shard for shard in self.shards if shard.ready()]
+        if not shards:
+            logger.debug("Every writer shard is backing off.")
+            self.full_consecutive += 1
             return False
+        share = math.ceil(count / len(shards))
+        desired = blocksize if self.overflow is not None else min(blocksize, share)
+        pending: List[Any] = []
+        flush_size = desired if self.batch_puts else 1
+        tasks = [asyncio.create_task(self._read_shard(shard, desired, share, pending, flush_size)) for shard in shards]
+        try:
+            added = sum(await asyncio.gather(*tasks))
+        finally:
+            # A shard that raised ends the populate, the same as a single writer raising.
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.flush(pending)
+
+        if added == 0:
+            self.empty_count += 1
+            self.full_consecutive += 1
+            self.exhausted = all(shard.exhausted for shard in self.shards)
+            return False
+        self.empty_count = 0
+        self.full_consecutive = 0
+        self.exhausted = False
+        return True
+
+    async def _read_shard(
+        self, shard: WriterShard, desired: int, share: int, pending: List[Any], flush_size: int
+    ) -> int:
+        """Queue the items of one shard until it has filled its share. Returns the number it added."""
+        added = 0
+        started = time.monotonic()
+        try:
+            async for id in shard(desired, self.cursors.get(shard.key)):
+                if type(id) is Cursor:
+                    self.save_cursor(shard, id, pending)
+                    continue
+                if id is None or id is False:
+                    break
+                item = self.prepare_item(id)
+                if item is None:
+                    continue
+                if added >= share:
+                    # Only reachable with an overflow buffer, which takes everything past the shard's share.
+                    if not self.overflow or not self.overflow.append(item):
+                        self.forget(id)
+                        break
+                    added += 1
+                    continue
+                pending.append(item)
+                if len(pending) >= flush_size:
+                    self.flush(pending)
+                added += 1
+                if added >= share and self.overflow is None:
+                    break
+        finally:
+            shard.record(added)
+            if self.metrics:
+                self.metrics.inc("writer_calls")
+                self.metrics.observe("writer_latency", time.monotonic() - started)
+        return added
+
+    def save_cursor(self, shard: WriterShard, cursor: Cursor, pending: List[Any]) -> None:
+        # The cursor covers the items yielded before it, so they are queued before it can be saved.
+        self.flush(pending)
+        self.cursors.set(shard.key, cursor.value)
 
     def add_to_queue(self, id):
-        if id in self.last_queued:
+        item = self.prepare_item(id)
+        if item is None:
+            return False
+        self.flush([item])
+        return True
+
+    def prepare_item(self, id):
+        """Return the item to queue for an id, or None if it was queued too recently."""
+        if self.prepared:
+            # The queue the item came from already checked its history, and the item may not be hashable.
+            return id
+        key = self.dedup_key(id) if self.dedup_key else id
+        if key in self.last_queued:
             logger.debug(f"ID {id} is in last_queued")
-            if self.last_queued[id] + self.settings.prevent_requeuing_time > time.time():
+            if self.last_queued[key] + self.settings.prevent_requeuing_time > time.time():
                 logger.debug(f"Skipping {id}: added too recently.")
-                return False
+                return None
         logger.debug(f"Adding {id} to queue.")
-        self.last_queued[id] = time.time()
-        self.queue.put(id, True, self.settings.queue_interaction_timeout)
-        return True
+        now = time.time()
+        self.last_queued[key] = now
+        item = self.codec.encode(id) if self.codec else id
+        if self.settings.trace_sample_rate and random.random() < self.settings.trace_sample_rate:
+            item = TracedItem(item, now)
+        return item
+
+    def flush(self, pending: List[Any]) -> None:
+        """Put the pending items on the queue and empty the list.
+
+        If the queue fills up partway through, the items that weren't queued are left in the list. Batched puts
+        are all or nothing.
+        """
+        if not pending:
+            return
+        queued = 0
+        try:
+            if self.batch_puts:
+                self.queue.put_many(pending, self.settings.queue_interaction_timeout)
+                queued = len(pending)
+            else:
+                for item in pending:
+                    self.queue.put(item, True, self.settings.queue_interaction_timeout)
+                    queued += 1
+        finally:
+            if self.metrics and queued:
+                self.metrics.inc("items_queued", queued)
+            del pending[:queued]
+
+    def forget(self, id) -> None:
+        """Remove an id from the history so the writer can queue it again."""
+        if self.prepared:
+            return
+        del self.last_queued[self.dedup_key(id) if self.dedup_key else id]
 
     def clean_history(self):
+        if isinstance(self.last_queued, HashedHistory):
+            self.last_queued.expire(time.time() - self.settings.prevent_requeuing_time)
+            return
         self.last_queued = {
             k: v for k, v in self.last_queued.items() if v + self.settings.prevent_requeuing_time > time.time()
         }
 
     def close(self):
         self.closed = True
+        if self.durable:
+            # Sentinels would outlive this run in a durable queue. Workers stop on the shutdown event instead.
+            return True
         blocksize = self.settings.lookup_block_size
         for _ in range(0, blocksize):
             try:
@@ -109,10 +304,34 @@ class Builder:
                 break
         return True
 
+    def apply_settings(self, settings) -> None:
+        """Switch to reloaded settings. Their sleeps, sizes and timeouts apply from the next populate."""
+        self.settings = settings
+        for shard in self.shards:
+            shard.settings = settings
+        self.cursors.interval = settings.cursor_save_interval
+
+    def release(self) -> None:
+        """Save the cursors and free the overflow file and writer threads once the queue has stopped."""
+        self.cursors.close()
+        self.close_overflow()
+        for shard in self.shards:
+            shard.close()
+
+    def close_overflow(self) -> None:
+        """Delete the overflow file. Items left in it are lost, like items left in a memory queue."""
+        if self.overflow is None:
+            return
+        if len(self.overflow):
+            logger.warning(f"Discarding {len(self.overflow)} items from the overflow buffer.")
+        self.overflow.close()
+        self.overflow = None
+
     def full_queue_sleep_time(self) -> float:
         if self.full_consecutive == 0:
             return self.settings.full_queue_sleep_min
+        # The exponent is capped so a queue that stays idle for a long time doesn't overflow the float.
         return min(
-            self.settings.full_queue_sleep_min * (2 ** (self.full_consecutive - 1)),
+            self.settings.full_queue_sleep_min * (2 ** min(self.full_consecutive - 1, 64)),
             self.settings.full_queue_sleep_max,
         )
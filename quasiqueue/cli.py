@@ -1,57 +1,202 @@
-import asyncio
-from importlib import import_module
 from logging import getLogger
-from typing import Annotated, Callable
+from typing import Annotated, Any, Callable, Dict, List
 
 import click
 import typer
 
 from . import __version__
-from .runner import QueueRunner
+from .imports import get_function_from_string
+
+# Each command imports the modules it needs when it runs, so `--help` and `version` don't load the runner,
+# pydantic or psutil.
 
 logger = getLogger(__name__)
 app = typer.Typer()
 
 
-def get_function_from_string(mod_path: str) -> Callable:
-    if ":" not in mod_path:
-        raise ValueError("Module paths require variable.")
-    try:
-        module_path, variable = mod_path.split(":")
-        module = import_module(module_path)
-    except:
-        logger.exception(f"Unable to load module from path: {mod_path}")
-        raise
-
-    return getattr(module, variable)
-
-
 @app.command()
 @click.option("--name", default="queue")
 def run(
-    reader: Annotated[str, typer.Argument()],
-    writer: Annotated[str, typer.Argument()],
+    reader: Annotated[str | None, typer.Argument()] = None,
+    writer: Annotated[str | None, typer.Argument()] = None,
     context: Annotated[str, typer.Argument()] = "",
     name: Annotated[str, typer.Argument()] = "queue",
+    config: Annotated[str | None, typer.Option(help="A TOML or YAML file describing the queues to run.")] = None,
+    setting: Annotated[
+        List[str] | None, typer.Option("--set", help="Override a setting of every queue, as key=value.")
+    ] = None,
 ):
-    params = {
-        "name": name,
-        "reader": get_function_from_string(reader),
-        "writer": get_function_from_string(writer),
-    }
+    """Run a queue from import paths, or every queue in a config file."""
+    from .config import build_runners, load_config, parse_overrides
 
-    if len(context) > 0:
-        params["context"] = get_function_from_string(context)
+    overrides = parse_overrides(setting or [])
+
+    if config:
+        if reader or writer:
+            raise typer.BadParameter("Pass either a config file or a reader and writer, not both.")
+        from .runner import run_queues
+
+        run_config = load_config(config)
+        runners = build_runners(run_config, overrides, config)
+        if run_config.pool:
+            run_queues(
+                *runners,
+                pool_processes=run_config.pool.processes,
+                pool_tasks_per_process=run_config.pool.tasks_per_process,
+                pool_max_jobs_per_process=run_config.pool.max_jobs_per_process,
+            )
+        else:
+            run_queues(*runners)
+        return
+
+    if not reader or not writer:
+        raise typer.BadParameter("A reader and writer are required unless a config file is given.")
+
+    import asyncio
+    from functools import partial
+
+    from .runner import QueueRunner
+    from .settings import get_named_settings
 
     runner = QueueRunner(
         name=name,
         reader=get_function_from_string(reader),
         writer=get_function_from_string(writer),
         context=get_function_from_string(context) if context else None,
+        settings=get_named_settings(name, overrides=overrides),
+        settings_loader=partial(get_named_settings, name, overrides=overrides),
+    )
+    asyncio.run(runner.main())
+
+
+@app.command()
+def worker(
+    address: Annotated[str, typer.Argument(help="The host:port of a queue with remote_port set.")],
+    reader: Annotated[str, typer.Argument()],
+    context: Annotated[str, typer.Argument()] = "",
+    name: Annotated[str, typer.Option(help="Queue name whose environment settings this node uses.")] = "queue",
+    setting: Annotated[
+        List[str] | None, typer.Option("--set", help="Override a setting of this node, as key=value.")
+    ] = None,
+):
+    """Run reader processes on this host for a queue served by another host."""
+    import asyncio
+
+    from .config import parse_overrides
+    from .remote import remote_worker
+    from .settings import get_named_settings
+
+    runner = remote_worker(
+        address,
+        reader=get_function_from_string(reader),
+        context=get_function_from_string(context) if context else None,
+        name=name,
+        settings=get_named_settings(name, overrides=parse_overrides(setting or [])),
     )
     asyncio.run(runner.main())
 
 
+@app.command()
+def timeline(directory: Annotated[str, typer.Argument()]):
+    """Merge the per-process traces in a timeline_dir into a single Chrome trace."""
+    from .timeline import merge_traces
+
+    typer.echo(merge_traces(directory))
+
+
+@app.command()
+def top(
+    directory: Annotated[str, typer.Argument(help="The status_dir the queues publish into.")],
+    interval: Annotated[float, typer.Option(help="Seconds between refreshes.")] = 1.0,
+    once: Annotated[bool, typer.Option("--once", help="Print the status once and exit.")] = False,
+    workers: Annotated[bool, typer.Option(help="List every worker below the queues.")] = True,
+):
+    """Show a live view of the queues publishing status into a directory."""
+    import time
+
+    from .status import read_status, render_status
+
+    if once:
+        typer.echo(render_status(read_status(directory), workers))
+        return
+    try:
+        while True:
+            # Move the cursor home and clear the screen before redrawing.
+            typer.echo("\x1b[H\x1b[2J" + render_status(read_status(directory), workers))
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+
+
+def parse_grid_values(value: str, cast: Callable) -> List[Any]:
+    return [cast(x) for x in value.split(",") if x.strip()]
+
+
+@app.command()
+def tune(
+    reader_latency: Annotated[str, typer.Option(help="Reader latency distribution, such as exp:0.05.")],
+    writer_latency: Annotated[str, typer.Option(help="Writer latency distribution per call.")] = "0.01",
+    name: Annotated[str, typer.Option(help="Queue name whose environment settings are the baseline.")] = "queue",
+    sync: Annotated[bool, typer.Option("--sync", help="The reader is a regular function.")] = False,
+    processes: Annotated[int | None, typer.Option(help="Override num_processes.")] = None,
+    arrival_rate: Annotated[float | None, typer.Option(help="New items per second. Defaults to a backlog.")] = None,
+    item_bytes: Annotated[int, typer.Option(help="Pickled size of an item.")] = 1024,
+    max_memory_mb: Annotated[float | None, typer.Option(help="Memory limit for a full queue.")] = None,
+    max_latency_p99: Annotated[float | None, typer.Option(help="p99 latency limit in seconds.")] = None,
+    duration: Annotated[float, typer.Option(help="Simulated seconds per configuration.")] = 30.0,
+    top: Annotated[int, typer.Option(help="How many configurations to show.")] = 5,
+    max_queue_size: Annotated[str | None, typer.Option(help="Comma separated values to try.")] = None,
+    lookup_block_size: Annotated[str | None, typer.Option(help="Comma separated values to try.")] = None,
+    empty_queue_sleep_time: Annotated[str | None, typer.Option(help="Comma separated values to try.")] = None,
+    concurrent_tasks_per_process: Annotated[str | None, typer.Option(help="Comma separated values to try.")] = None,
+):
+    """Simulate the queue under a range of settings and recommend the fastest that fits the limits."""
+    from .settings import get_named_settings
+    from .tuner import DEFAULT_GRID, Distribution
+    from .tuner import tune as run_tuner
+
+    base = get_named_settings(name)
+    if processes:
+        base = base.model_copy(update={"num_processes": processes})
+
+    grid: Dict[str, List[Any]] = dict(DEFAULT_GRID)
+    for key, value, cast in (
+        ("max_queue_size", max_queue_size, int),
+        ("lookup_block_size", lookup_block_size, int),
+        ("empty_queue_sleep_time", empty_queue_sleep_time, float),
+        ("concurrent_tasks_per_process", concurrent_tasks_per_process, int),
+    ):
+        if value:
+            grid[key] = parse_grid_values(value, cast)
+
+    candidates = run_tuner(
+        Distribution.parse(reader_latency, "reader_latency"),
+        Distribution.parse(writer_latency, "writer_latency"),
+        base=base,
+        grid=grid,
+        is_async=not sync,
+        arrival_rate=arrival_rate,
+        item_bytes=item_bytes,
+        max_memory_mb=max_memory_mb,
+        max_latency_p99=max_latency_p99,
+        duration=duration,
+    )
+    if not candidates:
+        typer.echo("No configuration fits within the limits.")
+        raise typer.Exit(1)
+
+    for candidate in candidates[:top]:
+        settings = " ".join(f"{key}={value}" for key, value in candidate["settings"].items())
+        typer.echo(
+            f"{candidate['throughput']:9.1f} items/s  p50 {candidate['latency_p50'] * 1000:8.1f} ms  "
+            f"p99 {candidate['latency_p99'] * 1000:8.1f} ms  queue {candidate['queue_memory_mb']:7.1f} MB  {settings}"
+        )
+
+    typer.echo("\nRecommended settings:")
+    for key, value in candidates[0]["settings"].items():
+        typer.echo(f"QUASIQUEUE_{name.upper()}_{key.upper()}={value}")
+
+
 @app.command()
 def version():
     typer.echo(__version__)
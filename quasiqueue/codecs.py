@@ -0,0 +1,119 @@
+import pickle
+import zlib
+from typing import Any, Dict, Type
+
+from .imports import get_function_from_string
+
+# The first byte of every payload from a compressing codec says whether the rest is compressed.
+_PLAIN = b"\x00"
+_ZLIB = b"\x01"
+
+
+class Codec:
+    """Turns queue items into bytes in the main process and back into items in the workers.
+
+    Without a codec the queue pickles every item itself. A codec takes that over so the format, its speed
+    and its size can be picked per queue. Workers decode with the codec from their own settings, so every
+    process reading a queue, remote nodes included, has to use the same one.
+    """
+
+    def encode(self, item: Any) -> bytes:
+        raise NotImplementedError
+
+    def decode(self, data: bytes) -> Any:
+        raise NotImplementedError
+
+
+class PickleCodec(Codec):
+    """Pickle with the newest protocol, which handles large bytes and arrays without extra copies."""
+
+    def encode(self, item: Any) -> bytes:
+        return pickle.dumps(item, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def decode(self, data: bytes) -> Any:
+        return pickle.loads(data)
+
+
+class MsgpackCodec(Codec):
+    """MessagePack, which is faster and smaller than pickle for dicts, lists, strings and numbers.
+
+    It can't carry arbitrary objects, and tuples come back as lists. Needs the `quasiqueue[msgpack]` extra.
+    """
+
+    def __init__(self) -> None:
+        try:
+            import msgpack  # type: ignore[import]
+        except ImportError as e:
+            raise ImportError(
+                "The msgpack codec needs msgpack. Install it with `pip install quasiqueue[msgpack]`."
+            ) from e
+        self.packer = msgpack.Packer(use_bin_type=True)
+        self.unpackb = msgpack.unpackb
+
+    def encode(self, item: Any) -> bytes:
+        return self.packer.pack(item)
+
+    def decode(self, data: bytes) -> Any:
+        return self.unpackb(data, raw=False, strict_map_key=False)
+
+
+class BytesCodec(Codec):
+    """Pass bytes through untouched, for writers that already serialize their own items."""
+
+    def encode(self, item: Any) -> bytes:
+        if type(item) is bytes:
+            return item
+        if isinstance(item, (bytearray, memoryview)):
+            return bytes(item)
+        raise TypeError(f"The bytes codec only takes bytes items, not {type(item).__name__}.")
+
+    def decode(self, data: bytes) -> Any:
+        return data
+
+
+class CompressedCodec(Codec):
+    """Compress the payloads of another codec with zlib once they reach `min_bytes`.
+
+    Smaller payloads aren't worth the time, and payloads that don't shrink are sent as they are.
+    """
+
+    def __init__(self, codec: Codec, min_bytes: int, level: int = 1) -> None:
+        self.codec = codec
+        self.min_bytes = min_bytes
+        self.level = level
+
+    def encode(self, item: Any) -> bytes:
+        data = self.codec.encode(item)
+        if len(data) >= self.min_bytes:
+            compressed = zlib.compress(data, self.level)
+            if len(compressed) < len(data):
+                return _ZLIB + compressed
+        return _PLAIN + data
+
+    def decode(self, data: bytes) -> Any:
+        payload = memoryview(data)[1:]
+        if data[:1] == _ZLIB:
+            return self.codec.decode(zlib.decompress(payload))
+        return self.codec.decode(bytes(payload))
+
+
+CODECS: Dict[str, Type[Codec]] = {"pickle": PickleCodec, "msgpack": MsgpackCodec, "bytes": BytesCodec}
+
+
+def create_codec(name: str, compress_min_bytes: int = 0) -> Codec | None:
+    """Create the codec named by `queue_codec`, either a built in one or a `module:Class` path.
+
+    Returns None for `none`, which leaves items to the queue's own pickling.
+
+    Raises:
+        ValueError: Compression was asked for without a codec to compress.
+    """
+    if name == "none":
+        if compress_min_bytes:
+            raise ValueError("queue_compress_min_bytes needs a queue_codec other than none.")
+        return None
+    codec_class: Type[Codec] = CODECS[name] if name in CODECS else get_function_from_string(name)  # type: ignore[assignment]
+    codec = codec_class()
+    if compress_min_bytes:
+        return CompressedCodec(codec, compress_min_bytes)
+    return codec
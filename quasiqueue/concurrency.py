@@ -0,0 +1,77 @@
+import logging
+import time
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+
+class AIMDController:
+    """Adjust a worker's in-flight task limit from observed reader latency and failures.
+
+    The limit grows by `increase` every time a full window of tasks finishes under the latency
+    target, and is multiplied by `decrease_factor` when a task is slow or fails. Tasks that were
+    already running when the limit was cut are not allowed to cut it again, so a single slow
+    period shrinks the limit once instead of once per in-flight task.
+    """
+
+    def __init__(
+        self,
+        initial: int,
+        minimum: int,
+        maximum: int,
+        latency_target: float,
+        decrease_factor: float = 0.5,
+        increase: float = 1.0,
+        gauge: Any = None,
+    ) -> None:
+        """
+        Args:
+            initial (int): The starting limit, clamped to the min and max.
+            minimum (int): The lowest the limit can drop to.
+            maximum (int): The highest the limit can grow to.
+            latency_target (float): Reader latency in seconds above which a task counts as congested.
+            decrease_factor (float, optional): The multiplier applied on congestion. Defaults to 0.5.
+            increase (float, optional): How much the limit grows per window of healthy tasks. Defaults to 1.0.
+            gauge (Any, optional): A shared value (such as `multiprocessing.RawValue`) that mirrors the current limit.
+        """
+        if minimum < 1 or maximum < minimum:
+            raise ValueError("Adaptive concurrency requires 1 <= minimum <= maximum.")
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_target = latency_target
+        self.decrease_factor = decrease_factor
+        self.increase = increase
+        self.gauge = gauge
+        self._limit = float(min(max(initial, minimum), maximum))
+        self._last_decrease = 0.0
+        self._publish()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def record(self, started: float, latency: float, failed: bool = False) -> None:
+        """Feed the result of one reader task back into the controller.
+
+        Args:
+            started (float): The `time.monotonic()` timestamp when the task started.
+            latency (float): How long the task took in seconds.
+            failed (bool, optional): Whether the task raised or timed out. Defaults to False.
+        """
+        previous = self.limit
+        if failed or latency > self.latency_target:
+            if started < self._last_decrease:
+                return
+            self._limit = max(self._limit * self.decrease_factor, self.minimum)
+            self._last_decrease = time.monotonic()
+        else:
+            # Spreading the increase over the current window gives +increase per round of tasks.
+            self._limit = min(self._limit + self.increase / self._limit, self.maximum)
+
+        if self.limit != previous:
+            logger.debug(f"Adaptive concurrency limit changed from {previous} to {self.limit}.")
+            self._publish()
+
+    def _publish(self) -> None:
+        if self.gauge is not None:
+            self.gauge.value = self.limit
@@ -0,0 +1,130 @@
+import sys
+from functools import partial
+from pathlib import Path
+from typing import Any, Dict, List, Type
+
+from pydantic import BaseModel, ConfigDict, Field
+
+from .imports import get_function_from_string
+from .runner import QueueRunner
+from .settings import Settings, get_named_settings
+
+if sys.version_info >= (3, 11):
+    import tomllib
+else:
+    import tomli as tomllib
+
+
+class QueueConfig(BaseModel):
+    """One queue in a config file."""
+
+    model_config = ConfigDict(extra="forbid")
+
+    reader: str = Field(description="Import path of the reader, such as `myapp.images:reader`.")
+    writer: str | List[str] = Field(description="Import path of the writer, or a list of them to run as shards.")
+    context: str | None = Field(default=None, description="Import path of the context function.")
+    timeout_handler: str | None = Field(default=None, description="Import path of the reader timeout handler.")
+    dedup_key: str | None = Field(
+        default=None, description="Import path of the function that turns items into dedup keys."
+    )
+    settings_class: str | None = Field(
+        default=None, description="Import path of a Settings subclass, for queues with their own settings fields."
+    )
+    settings: Dict[str, Any] = Field(default={}, description="Settings that override the environment for this queue.")
+
+
+class PoolConfig(BaseModel):
+    """The optional shared worker pool that reads from every queue."""
+
+    model_config = ConfigDict(extra="forbid")
+
+    processes: int = Field(gt=0, description="The size of the shared worker pool.")
+    tasks_per_process: int | None = Field(default=None, description="Async task slots per pool worker.")
+    max_jobs_per_process: int | None = Field(default=200, description="Jobs a pool worker runs before it is replaced.")
+
+
+class RunConfig(BaseModel):
+    """A config file describing queues that run together in one process with `run_queues`."""
+
+    model_config = ConfigDict(extra="forbid")
+
+    queues: Dict[str, QueueConfig] = Field(min_length=1)
+    pool: PoolConfig | None = None
+
+
+def load_config(path: str | Path) -> RunConfig:
+    """Read a TOML or YAML config file.
+
+    YAML files need PyYAML, which is installed with the `quasiqueue[yaml]` extra.
+    """
+    path = Path(path)
+    if path.suffix in (".yaml", ".yml"):
+        try:
+            import yaml
+        except ImportError as e:
+            raise ImportError("YAML config files need PyYAML. Install it with `pip install quasiqueue[yaml]`.") from e
+        with open(path) as f:
+            data = yaml.safe_load(f)
+    elif path.suffix == ".toml":
+        with open(path, "rb") as f:
+            data = tomllib.load(f)
+    else:
+        raise ValueError(f"Config files must be TOML or YAML, not {path.suffix or path.name}.")
+    return RunConfig.model_validate(data or {})
+
+
+def parse_overrides(values: List[str]) -> Dict[str, str]:
+    """Turn `key=value` strings into a settings dict. Pydantic converts the values to the right types."""
+    overrides = {}
+    for value in values:
+        key, separator, setting = value.partition("=")
+        if not separator or not key:
+            raise ValueError(f"Settings overrides look like key=value, not {value!r}.")
+        overrides[key.strip()] = setting.strip()
+    return overrides
+
+
+def queue_settings(name: str, queue: QueueConfig, overrides: Dict[str, Any] | None = None) -> Settings:
+    """Build the settings of a queue from its environment, then the config file, then any overrides."""
+    values = {**queue.settings, **(overrides or {})}
+    settings_class: Type[Settings] = Settings
+    if queue.settings_class:
+        settings_class = get_function_from_string(queue.settings_class)  # type: ignore[assignment]
+    return get_named_settings(name, settings_class, values)
+
+
+def reload_queue_settings(path: str | Path, name: str, overrides: Dict[str, Any] | None = None) -> Settings:
+    """Read the config file again and build the current settings of one of its queues."""
+    config = load_config(path)
+    if name not in config.queues:
+        raise KeyError(f"The queue {name} is no longer in {path}.")
+    return queue_settings(name, config.queues[name], overrides)
+
+
+def build_runners(
+    config: RunConfig, overrides: Dict[str, Any] | None = None, path: str | Path | None = None
+) -> List[QueueRunner]:
+    """Create a QueueRunner for every queue in the config.
+
+    Args:
+        config (RunConfig): The loaded config file.
+        overrides (Dict[str, Any] | None, optional): Settings applied to every queue on top of the file. Defaults to None.
+        path (str | Path | None, optional): The file the config came from. Queues re-read it when they reload their settings. Defaults to None.
+    """
+    return [
+        QueueRunner(
+            name=name,
+            reader=get_function_from_string(queue.reader),
+            writer=(
+                [get_function_from_string(writer) for writer in queue.writer]
+                if isinstance(queue.writer, list)
+                else get_function_from_string(queue.writer)
+            ),
+            context=get_function_from_string(queue.context) if queue.context else None,
+            timeout_handler=get_function_from_string(queue.timeout_handler) if queue.timeout_handler else None,
+            dedup_key=get_function_from_string(queue.dedup_key) if queue.dedup_key else None,
+            settings=queue_settings(name, queue, overrides),
+            settings_loader=partial(reload_queue_settings, path, name, overrides) if path else None,
+        )
+        for name, queue in config.queues.items()
+    ]
@@ -0,0 +1,140 @@
+import json
+import os
+import time
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Dict
+
+# Every queue keeps its cursors in its own file, so several queues can share one directory.
+CURSOR_SUFFIX = ".cursor.json"
+
+
+def encode_cursor(value: Any) -> Any:
+    """Turn a cursor value into JSON, tagging the types JSON can't represent so they come back unchanged.
+
+    Cursors can be None, strings, numbers, booleans, datetimes, dates, and lists, tuples and string keyed
+    dicts of those.
+    """
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, date):
+        return {"__date__": value.isoformat()}
+    if isinstance(value, tuple):
+        return {"__tuple__": [encode_cursor(item) for item in value]}
+    if isinstance(value, list):
+        return [encode_cursor(item) for item in value]
+    if isinstance(value, dict) and all(type(key) is str for key in value):
+        return {key: encode_cursor(item) for key, item in value.items()}
+    raise TypeError(
+        f"Can't save the cursor {value!r}. Saved cursors can be None, strings, numbers, booleans, datetimes, "
+        "dates, and lists, tuples or string keyed dicts of those."
+    )
+
+
+def _decode_cursor(value: Dict[str, Any]) -> Any:
+    if "__datetime__" in value:
+        return datetime.fromisoformat(value["__datetime__"])
+    if "__date__" in value:
+        return date.fromisoformat(value["__date__"])
+    if "__tuple__" in value:
+        return tuple(value["__tuple__"])
+    return value
+
+
+class Cursor:
+    """Yielded by a writer to record how far it has read.
+
+    The writer gets the value back through its `cursor` argument on the next call, so it can fetch only new
+    work instead of scanning from the start. A cursor covers every item the writer yielded before it.
+    """
+
+    __slots__ = ("value",)
+
+    def __init__(self, value: Any) -> None:
+        self.value = value
+
+    def __repr__(self) -> str:
+        return f"Cursor({self.value!r})"
+
+
+class CursorStore:
+    """Keep the cursor of every writer shard, saving them to a file.
+
+    Saves are batched: a new cursor is written at most every `interval` seconds and once more when the
+    queue stops. Each save writes a temporary file, syncs it to disk and renames it over the old one, so a
+    crash leaves either the previous cursors or the new ones, never a partial file. Without a path the
+    cursors only last as long as the process.
+    """
+
+    def __init__(self, path: str | Path | None = None, interval: float = 1.0) -> None:
+        self.path = Path(path) if path else None
+        self.interval = interval
+        self.values: Dict[str, Any] = {}
+        self.dirty = False
+        self.last_save = 0.0
+        if self.path and self.path.exists():
+            self.values = json.loads(self.path.read_text(), object_hook=_decode_cursor)
+
+    @classmethod
+    def for_queue(cls, settings: Any, name: str, durable: bool = False) -> "CursorStore":
+        """Build the cursor store of a queue, saving to `cursor_dir` when it is set.
+
+        A saved cursor covers items that may still be waiting on the queue, so saving is only allowed when
+        they outlive the process: the backend has to be durable and there can't be an overflow buffer.
+
+        Args:
+            settings (Settings): The queue's settings.
+            name (str): The queue name, used for the file name.
+            durable (bool, optional): Whether the queue backend keeps items across restarts. Defaults to False.
+        """
+        if not settings.cursor_dir:
+            return cls()
+        if not durable:
+            raise ValueError(
+                "cursor_dir needs a durable queue_backend such as sqlite, since items in a memory queue are "
+                "dropped whenever the queue stops and a saved cursor would skip them."
+            )
+        if settings.overflow_max_bytes:
+            raise ValueError(
+                "cursor_dir can't be combined with overflow_max_bytes, since the overflow buffer is dropped "
+                "whenever the queue stops and a saved cursor would skip its items."
+            )
+        directory = Path(settings.cursor_dir)
+        directory.mkdir(parents=True, exist_ok=True)
+        return cls(directory / f"{name}{CURSOR_SUFFIX}", settings.cursor_save_interval)
+
+    def get(self, key: str) -> Any:
+        return self.values.get(key)
+
+    def set(self, key: str, value: Any) -> None:
+        if self.path:
+            # Fail on the Cursor the writer yielded, rather than on a later save.
+            encode_cursor(value)
+        self.values[key] = value
+        self.dirty = True
+        if time.monotonic() >= self.last_save + self.interval:
+            self.save()
+
+    def save(self) -> None:
+        """Write the cursors to disk if they changed since the last save."""
+        self.last_save = time.monotonic()
+        if not self.dirty or not self.path:
+            return
+        temporary = self.path.with_name(f".{self.path.name}.{os.getpid()}")
+        with open(temporary, "w") as f:
+            json.dump(encode_cursor(self.values), f)
+            f.flush()
+            os.fsync(f.fileno())
+        temporary.replace(self.path)
+        # Sync the directory too, so the rename itself survives a power loss.
+        directory = os.open(self.path.parent, os.O_RDONLY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+        self.dirty = False
+
+    def close(self) -> None:
+        self.save()
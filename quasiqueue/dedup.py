@@ -0,0 +1,119 @@
+from array import array
+from hashlib import blake2b
+from typing import Any
+
+_MASK = 0xFFFFFFFFFFFFFFFF
+# Multiplying by 2**64 divided by the golden ratio spreads the small hashes Python gives numbers across the
+# top bits, which pick the slot.
+_SPREAD = 0x9E3779B97F4A7C15
+# Queue times are always positive, so a zero time marks an empty slot.
+_EMPTY = 0.0
+# Deleted entries keep their slot, so the probe chains through them stay intact, but never match.
+_DELETED = float("-inf")
+_MIN_CAPACITY = 1024
+
+
+def _digest(data: bytes) -> int:
+    return int.from_bytes(blake2b(data, digest_size=8).digest(), "little")
+
+
+class HashedHistory:
+    """A compact replacement for the `last_queued` dict that stores a 64 bit hash of each key.
+
+    The hashes and queue times live in two flat arrays used as an open addressing table, which costs 16
+    bytes per slot instead of a dict entry plus the key itself. Two keys sharing a hash would make the
+    second look recently queued, but with 64 bits that takes billions of live keys to become likely.
+    Strings, bytes, integers and tuples of them get a 64 bit BLAKE2 digest. Other keys fall back to
+    Python's own hash, which is 64 bits for most objects but only 61 bits for numbers.
+    Expired entries stay in place until the table fills up and is rebuilt without them.
+    """
+
+    def __init__(self, capacity: int = _MIN_CAPACITY) -> None:
+        self._allocate(capacity)
+
+    def _allocate(self, capacity: int) -> None:
+        self.capacity = capacity
+        self.shift = 64 - (capacity.bit_length() - 1)
+        self.hashes = array("Q", bytes(8 * capacity))
+        self.times = array("d", bytes(8 * capacity))
+        self.used = 0
+
+    @staticmethod
+    def _hash(key: Any) -> int:
+        # Python's own hash reduces integers modulo 2**61 - 1 and maps -1 and -2 together, so distinct ids
+        # would collide.
+        if isinstance(key, str):
+            return _digest(b"s" + key.encode("utf-8", "surrogatepass"))
+        if isinstance(key, bytes):
+            return _digest(b"b" + key)
+        if isinstance(key, int):
+            return _digest(b"i" + key.to_bytes(key.bit_length() // 8 + 1, "little", signed=True))
+        if isinstance(key, tuple):
+            return _digest(b"t" + b"".join(HashedHistory._hash(item).to_bytes(8, "little") for item in key))
+        return (hash(key) * _SPREAD) & _MASK
+
+    def _slot(self, hashed: int) -> int:
+        mask = self.capacity - 1
+        slot = hashed >> self.shift
+        while True:
+            if self.times[slot] == _EMPTY or self.hashes[slot] == hashed:
+                return slot
+            slot = (slot + 1) & mask
+
+    def __contains__(self, key: Any) -> bool:
+        hashed = self._hash(key)
+        slot = self._slot(hashed)
+        return self.times[slot] not in (_EMPTY, _DELETED)
+
+    def __getitem__(self, key: Any) -> float:
+        hashed = self._hash(key)
+        slot = self._slot(hashed)
+        if self.times[slot] in (_EMPTY, _DELETED):
+            raise KeyError(key)
+        return self.times[slot]
+
+    def __setitem__(self, key: Any, queued: float) -> None:
+        self._insert(self._hash(key), queued)
+        # Keep at most three quarters of the slots in use so probe chains stay short.
+        if self.used * 4 >= self.capacity * 3:
+            self._rebuild(float("-inf"), 2)
+
+    def __delitem__(self, key: Any) -> None:
+        hashed = self._hash(key)
+        slot = self._slot(hashed)
+        if self.times[slot] in (_EMPTY, _DELETED):
+            raise KeyError(key)
+        self.times[slot] = _DELETED
+
+    def __len__(self) -> int:
+        return sum(1 for queued in self.times if queued not in (_EMPTY, _DELETED))
+
+    def _insert(self, hashed: int, queued: float) -> None:
+        slot = self._slot(hashed)
+        if self.times[slot] == _EMPTY:
+            self.used += 1
+            self.hashes[slot] = hashed
+        self.times[slot] = queued
+
+    def _rebuild(self, cutoff: float, headroom: int) -> None:
+        entries = [
+            (hashed, queued)
+            for hashed, queued in zip(self.hashes, self.times)
+            if queued != _EMPTY and queued != _DELETED and queued > cutoff
+        ]
+        capacity = _MIN_CAPACITY
+        while len(entries) * headroom > capacity:
+            capacity *= 2
+        self._allocate(capacity)
+        for hashed, queued in entries:
+            self._insert(hashed, queued)
+
+    def expire(self, cutoff: float) -> None:
+        """Drop entries queued before the cutoff, once enough slots are in use for it to be worth a rebuild."""
+        if self.used * 2 >= self.capacity:
+            # Leave the table at most a quarter full, so the live entries alone don't trigger the next rebuild.
+            self._rebuild(cutoff, 4)
+
+    @property
+    def nbytes(self) -> int:
+        return self.hashes.itemsize * len(self.hashes) + self.times.itemsize * len(self.times)
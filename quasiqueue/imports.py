@@ -0,0 +1,30 @@
+from importlib import import_module
+from logging import getLogger
+from typing import Any, Callable
+
+logger = getLogger(__name__)
+
+
+def get_function_from_string(mod_path: str) -> Callable:
+    """Load a function from a `module.path:function` string."""
+    if ":" not in mod_path:
+        raise ValueError("Module paths require variable.")
+    try:
+        module_path, variable = mod_path.split(":")
+        module = import_module(module_path)
+    except:
+        logger.exception(f"Unable to load module from path: {mod_path}")
+        raise
+
+    return getattr(module, variable)
+
+
+def resolve(target: Any) -> Any:
+    """Return the function an import path points to, or the target itself if it is already loaded.
+
+    Workers started with spawn or forkserver can't receive closures, so readers, contexts and timeout handlers
+    may be passed as `module.path:function` strings and loaded inside the worker.
+    """
+    if isinstance(target, str):
+        return get_function_from_string(target)
+    return target
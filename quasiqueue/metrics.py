@@ -0,0 +1,279 @@
+import json
+import logging
+import multiprocessing as mp
+import threading
+from bisect import bisect_left
+from multiprocessing.context import BaseContext
+from typing import Any, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds in seconds. A final +Inf bucket is implied.
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Metrics recorded inside worker processes.
+WORKER_COUNTERS = ("items_processed", "reader_errors", "reader_timeouts")
+WORKER_HISTOGRAMS = ("reader_latency", "queue_wait", "service_time")
+
+# Metrics recorded by the parent process.
+PARENT_COUNTERS = (
+    "writer_calls",
+    "items_queued",
+    "queue_full",
+    "worker_starts",
+    "worker_exits",
+    "remote_items_sent",
+)
+PARENT_GAUGES = (
+    "queue_depth",
+    "overflow_depth",
+    "workers",
+    "concurrency_limit",
+    "backoff_consecutive",
+    "backoff_sleep_seconds",
+    "writer_exhausted",
+    "remote_connections",
+)
+PARENT_HISTOGRAMS = ("writer_latency",)
+
+# Each histogram is stored as one count per bucket (including +Inf) followed by the sum of observations.
+_HISTOGRAM_SIZE = len(LATENCY_BUCKETS) + 2
+_COUNTER_OFFSETS = {name: i for i, name in enumerate(WORKER_COUNTERS)}
+_HISTOGRAM_OFFSETS = {name: len(WORKER_COUNTERS) + i * _HISTOGRAM_SIZE for i, name in enumerate(WORKER_HISTOGRAMS)}
+ROW_SIZE = len(WORKER_COUNTERS) + len(WORKER_HISTOGRAMS) * _HISTOGRAM_SIZE
+
+
+def _observe(row: Any, offset: int, value: float) -> None:
+    row[offset + bisect_left(LATENCY_BUCKETS, value)] += 1
+    row[offset + _HISTOGRAM_SIZE - 1] += value
+
+
+def _histogram_snapshot(values: List[float]) -> Dict[str, Any]:
+    buckets = []
+    cumulative = 0.0
+    for bound, count in zip(LATENCY_BUCKETS + (float("inf"),), values[:-1]):
+        cumulative += count
+        buckets.append(("+Inf" if bound == float("inf") else bound, int(cumulative)))
+    return {"buckets": buckets, "sum": values[-1], "count": int(cumulative)}
+
+
+class WorkerMetrics:
+    """A worker's private row of the shared metrics array.
+
+    Only the owning worker writes to its row, so recording a metric is a plain memory write
+    without any locking.
+    """
+
+    def __init__(self, array: Any, slot: int) -> None:
+        self.array = array
+        self.slot = slot
+        self.offset = slot * ROW_SIZE
+
+    def inc(self, name: str, amount: float = 1.0) -> None:
+        self.array[self.offset + _COUNTER_OFFSETS[name]] += amount
+
+    def observe(self, name: str, value: float) -> None:
+        _observe(self.array, self.offset + _HISTOGRAM_OFFSETS[name], value)
+
+    def value(self, name: str) -> float:
+        """Read one of the worker's counters, such as how many items it has processed."""
+        return self.array[self.offset + _COUNTER_OFFSETS[name]]
+
+
+class Histogram:
+    """A histogram that lives in the parent process."""
+
+    def __init__(self) -> None:
+        self.values = [0.0] * _HISTOGRAM_SIZE
+
+    def observe(self, value: float) -> None:
+        _observe(self.values, 0, value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return _histogram_snapshot(self.values)
+
+
+class MetricsRegistry:
+    """Collect the metrics of one queue, aggregating worker rows in the parent process."""
+
+    def __init__(self, name: str, slots: int = 32, mp_context: BaseContext | None = None) -> None:
+        """
+        Args:
+            name (str): The name of the queue, used as a label.
+            slots (int, optional): How many workers can record metrics at once. Defaults to 32.
+            mp_context (BaseContext | None, optional): The multiprocessing context to allocate shared memory from.
+        """
+        self.name = name
+        self._mp_context = mp_context if mp_context else mp.get_context("fork")
+        # Growing adds another array, since running workers hold on to the one their row is in.
+        self._arrays: List[Any] = []
+        # Totals from workers that have exited, so their counts survive the slot being reused.
+        self._retired = [0.0] * ROW_SIZE
+        self._free: List[Tuple[Any, int]] = []
+        self.grow(slots)
+        self.counters: Dict[str, float] = {name: 0.0 for name in PARENT_COUNTERS}
+        self.gauges: Dict[str, float] = {name: 0.0 for name in PARENT_GAUGES}
+        self.histograms = {name: Histogram() for name in PARENT_HISTOGRAMS}
+
+    @property
+    def slots(self) -> int:
+        """How many workers can record metrics at once."""
+        return sum(len(array) for array in self._arrays) // ROW_SIZE
+
+    def grow(self, slots: int) -> None:
+        """Make room for at least `slots` workers. Rows in use stay where they are, so their workers keep recording."""
+        extra = slots - self.slots
+        if extra <= 0:
+            return
+        array = self._mp_context.RawArray("d", extra * ROW_SIZE)
+        self._arrays.append(array)
+        self._free.extend((array, slot) for slot in range(extra))
+
+    def worker(self) -> WorkerMetrics | None:
+        """Reserve a row for a new worker. Returns None if every row is in use."""
+        if not self._free:
+            logger.warning(f"[{self.name}] No free metrics slots, a worker will run without metrics.")
+            return None
+        return WorkerMetrics(*self._free.pop(0))
+
+    def release(self, worker: WorkerMetrics | None) -> None:
+        """Fold an exited worker's row into the totals and free it for the next worker."""
+        if worker is None:
+            return
+        for i in range(ROW_SIZE):
+            self._retired[i] += worker.array[worker.offset + i]
+            worker.array[worker.offset + i] = 0.0
+        self._free.append((worker.array, worker.slot))
+
+    def inc(self, name: str, amount: float = 1.0) -> None:
+        self.counters[name] += amount
+
+    def set(self, name: str, value: float) -> None:
+        self.gauges[name] = value
+
+    def observe(self, name: str, value: float) -> None:
+        self.histograms[name].observe(value)
+
+    def _worker_totals(self) -> List[float]:
+        totals = list(self._retired)
+        for array in self._arrays:
+            for offset in range(0, len(array), ROW_SIZE):
+                for i in range(ROW_SIZE):
+                    totals[i] += array[offset + i]
+        return totals
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return every metric of the queue as a JSON serializable dict."""
+        totals = self._worker_totals()
+        counters = dict(self.counters)
+        for name, offset in _COUNTER_OFFSETS.items():
+            counters[name] = totals[offset]
+        histograms = {name: histogram.snapshot() for name, histogram in self.histograms.items()}
+        for name, offset in _HISTOGRAM_OFFSETS.items():
+            histograms[name] = _histogram_snapshot(totals[offset : offset + _HISTOGRAM_SIZE])
+        return {
+            "queue": self.name,
+            "counters": counters,
+            "gauges": dict(self.gauges),
+            "histograms": histograms,
+        }
+
+
+def render_prometheus(snapshots: List[Dict[str, Any]]) -> str:
+    """Render metric snapshots in the Prometheus text exposition format."""
+    lines: List[str] = []
+    counters = sorted({name for snapshot in snapshots for name in snapshot["counters"]})
+    gauges = sorted({name for snapshot in snapshots for name in snapshot["gauges"]})
+    histograms = sorted({name for snapshot in snapshots for name in snapshot["histograms"]})
+
+    for name in counters:
+        lines.append(f"# TYPE quasiqueue_{name}_total counter")
+        for snapshot in snapshots:
+            if name in snapshot["counters"]:
+                lines.append(f'quasiqueue_{name}_total{{queue="{snapshot["queue"]}"}} {snapshot["counters"][name]}')
+    for name in gauges:
+        lines.append(f"# TYPE quasiqueue_{name} gauge")
+        for snapshot in snapshots:
+            if name in snapshot["gauges"]:
+                lines.append(f'quasiqueue_{name}{{queue="{snapshot["queue"]}"}} {snapshot["gauges"][name]}')
+    for name in histograms:
+        lines.append(f"# TYPE quasiqueue_{name}_seconds histogram")
+        for snapshot in snapshots:
+            if name not in snapshot["histograms"]:
+                continue
+            histogram = snapshot["histograms"][name]
+            label = f'queue="{snapshot["queue"]}"'
+            for bound, count in histogram["buckets"]:
+                lines.append(f'quasiqueue_{name}_seconds_bucket{{{label},le="{bound}"}} {count}')
+            lines.append(f"quasiqueue_{name}_seconds_sum{{{label}}} {histogram['sum']}")
+            lines.append(f"quasiqueue_{name}_seconds_count{{{label}}} {histogram['count']}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """A small HTTP server exposing the metrics of every registered queue.
+
+    `/metrics` returns the Prometheus text format and `/metrics.json` returns the raw snapshots.
+    """
+
+    def __init__(self, host: str, port: int) -> None:
+        # Workers import this module for WorkerMetrics, so the HTTP server is only loaded by the parent.
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        self.registries: List[MetricsRegistry] = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                snapshots = [registry.snapshot() for registry in list(server.registries)]
+                if self.path == "/metrics":
+                    body = render_prometheus(snapshots).encode()
+                    content_type = "text/plain; version=0.0.4"
+                elif self.path == "/metrics.json":
+                    body = json.dumps(snapshots).encode()
+                    content_type = "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                logger.debug(format % args)
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="quasiqueue-metrics", daemon=True)
+        self.thread.start()
+        logger.info(f"Serving QuasiQueue metrics on http://{host}:{self.httpd.server_port}/metrics")
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+_servers: Dict[Tuple[str, int], MetricsServer] = {}
+
+
+def register_endpoint(registry: MetricsRegistry, host: str, port: int) -> MetricsServer:
+    """Expose a registry over HTTP, sharing one server between queues that use the same address."""
+    key = (host, port)
+    if key not in _servers:
+        _servers[key] = MetricsServer(host, port)
+    _servers[key].registries.append(registry)
+    return _servers[key]
+
+
+def unregister_endpoint(registry: MetricsRegistry, host: str, port: int) -> None:
+    """Stop exposing a registry, shutting the server down once it has no queues left."""
+    server = _servers.get((host, port))
+    if server is None:
+        return
+    if registry in server.registries:
+        server.registries.remove(registry)
+    if not server.registries:
+        server.stop()
+        del _servers[(host, port)]
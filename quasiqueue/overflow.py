@@ -0,0 +1,88 @@
+import mmap
+import os
+import pickle
+import struct
+import tempfile
+from typing import Any, List
+
+# Every record is a pickled item prefixed with its length.
+_RECORD = struct.Struct("!I")
+
+
+class OverflowBuffer:
+    """Keep writer output that doesn't fit in the queue in a memory mapped file.
+
+    Records are appended at the end of the file and read from the front, first in first out. The pages are
+    backed by the file rather than the parent's heap, so the kernel can write them out under memory pressure
+    and a large page of writer results doesn't grow the parent. Once every record has been read the file is
+    reused from the start, and when the end is reached the unread records are moved to the front.
+    """
+
+    def __init__(self, max_bytes: int, directory: str | None = None, name: str = "queue") -> None:
+        self.max_bytes = max_bytes
+        fd, self.path = tempfile.mkstemp(prefix=f"quasiqueue-{name}-", suffix=".overflow", dir=directory)
+        try:
+            os.ftruncate(fd, max_bytes)
+            self.map = mmap.mmap(fd, max_bytes)
+        finally:
+            # The mapping keeps the file open.
+            os.close(fd)
+        self.start = 0
+        self.end = 0
+        self.count = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def append(self, item: Any) -> bool:
+        """Add an item to the end of the buffer. Returns False if there is no room for it."""
+        payload = pickle.dumps(item, protocol=pickle.HIGHEST_PROTOCOL)
+        size = _RECORD.size + len(payload)
+        if self.end + size > self.max_bytes:
+            if self.start == 0 or self.end - self.start + size > self.max_bytes:
+                return False
+            self._compact()
+        _RECORD.pack_into(self.map, self.end, len(payload))
+        self.map[self.end + _RECORD.size : self.end + size] = payload
+        self.end += size
+        self.count += 1
+        return True
+
+    def peek_many(self, max_items: int) -> List[Any]:
+        """Return up to `max_items` items from the front of the buffer without removing them."""
+        items: List[Any] = []
+        position = self.start
+        while len(items) < min(max_items, self.count):
+            (length,) = _RECORD.unpack_from(self.map, position)
+            payload_start = position + _RECORD.size
+            items.append(pickle.loads(self.map[payload_start : payload_start + length]))
+            position = payload_start + length
+        return items
+
+    def discard(self, count: int) -> None:
+        """Remove up to `count` items from the front of the buffer."""
+        for _ in range(min(count, self.count)):
+            (length,) = _RECORD.unpack_from(self.map, self.start)
+            self.start += _RECORD.size + length
+            self.count -= 1
+        if not self.count:
+            self.start = self.end = 0
+
+    def pop_many(self, max_items: int) -> List[Any]:
+        """Remove and return up to `max_items` items from the front of the buffer."""
+        items = self.peek_many(max_items)
+        self.discard(len(items))
+        return items
+
+    def _compact(self) -> None:
+        self.map.move(0, self.start, self.end - self.start)
+        self.end -= self.start
+        self.start = 0
+
+    def close(self) -> None:
+        """Unmap and delete the file. Items still in the buffer are lost."""
+        self.map.close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
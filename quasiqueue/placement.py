@@ -0,0 +1,97 @@
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Set
+
+logger = logging.getLogger(__name__)
+
+# Linux lists every NUMA node here, each with a `cpulist` file of the CPUs it holds.
+NODE_DIR = Path("/sys/devices/system/node")
+
+
+def parse_cpu_list(value: str) -> List[int]:
+    """Parse a Linux CPU list such as `0-3,8,10-11`."""
+    cpus: Set[int] = set()
+    for part in value.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        start, _, end = part.partition("-")
+        cpus.update(range(int(start), int(end or start) + 1))
+    return sorted(cpus)
+
+
+def numa_nodes(node_dir: Path = NODE_DIR) -> Dict[int, List[int]]:
+    """Map each NUMA node to its CPUs. Empty when the topology isn't available, such as outside of Linux."""
+    nodes = {}
+    for path in node_dir.glob("node[0-9]*"):
+        try:
+            cpus = parse_cpu_list((path / "cpulist").read_text())
+        except (OSError, ValueError):
+            continue
+        if cpus:
+            nodes[int(path.name[4:])] = cpus
+    return dict(sorted(nodes.items()))
+
+
+class CpuPlacement:
+    """Decide which CPUs each worker of a queue runs on.
+
+    The CPUs in `cpu_affinity` are split into slots by `cpu_pinning`: one slot holding the whole set, one per
+    CPU, or one per NUMA node. Every new worker takes the slot with the fewest live workers, so replacements
+    fill the gaps left by workers that exited and the workers stay spread evenly.
+    """
+
+    def __init__(self, settings: Any, node_dir: Path = NODE_DIR) -> None:
+        available = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else []
+        allowed = parse_cpu_list(settings.cpu_affinity) if settings.cpu_affinity else available
+        if available:
+            missing = sorted(set(allowed) - set(available))
+            if missing:
+                logger.warning(f"Skipping CPUs {missing} from cpu_affinity, this process can't run on them.")
+                allowed = [cpu for cpu in allowed if cpu in available]
+            if not allowed:
+                raise ValueError(f"None of the cpu_affinity CPUs ({settings.cpu_affinity}) are available.")
+
+        self.slots: List[List[int]] = []
+        if settings.cpu_pinning == "cpu":
+            self.slots = [[cpu] for cpu in allowed]
+        elif settings.cpu_pinning == "numa":
+            nodes = [[cpu for cpu in cpus if cpu in allowed] for cpus in numa_nodes(node_dir).values()]
+            self.slots = [cpus for cpus in nodes if cpus] or [allowed]
+        elif settings.cpu_affinity:
+            self.slots = [allowed]
+        self.assigned: Dict[str, int] = {}
+
+    def assign(self, worker: str) -> List[int] | None:
+        """Pick the CPUs of a new worker, or None to leave it on the CPUs of the main process."""
+        if not self.slots:
+            return None
+        load = [0] * len(self.slots)
+        for slot in self.assigned.values():
+            load[slot] += 1
+        slot = load.index(min(load))
+        self.assigned[worker] = slot
+        return self.slots[slot]
+
+    def release(self, worker: str) -> None:
+        self.assigned.pop(worker, None)
+
+
+def apply_placement(cpus: List[int] | None, nice: int | None) -> None:
+    """Pin the current process to `cpus` and set its nice level.
+
+    Workers call this before loading anything, so the memory they allocate lands on their own NUMA node.
+    """
+    if cpus:
+        if hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, cpus)
+        else:
+            logger.warning("CPU affinity isn't supported on this platform, workers run on any CPU.")
+    if nice is not None:
+        try:
+            os.setpriority(os.PRIO_PROCESS, 0, nice)
+        except PermissionError:
+            logger.warning(
+                f"Setting the nice level to {nice} needs more privileges, keeping {os.getpriority(os.PRIO_PROCESS, 0)}."
+            )
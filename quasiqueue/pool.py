@@ -0,0 +1,320 @@
+import asyncio
+import logging
+import math
+import multiprocessing as mp
+from multiprocessing.synchronize import Event
+from queue import Empty
+from typing import TYPE_CHECKING, Any, Dict, List
+
+from .metrics import WorkerMetrics
+from .placement import CpuPlacement, apply_placement
+from .profiling import WorkerProfiler
+from .reader import QueueConsumer, preload
+from .supervision import SHUTDOWN_POLL_INTERVAL, ExitWatcher
+from .timeline import get_recorder, now
+
+if TYPE_CHECKING:
+    from .runner import QueueRunner
+
+logger = logging.getLogger(__name__)
+
+
+class Lane:
+    """One queue served by a shared pool worker, along with its fair share bookkeeping."""
+
+    def __init__(
+        self,
+        name: str,
+        consumer: QueueConsumer,
+        weight: float = 1.0,
+        min_share: float = 0.0,
+        max_share: float = 1.0,
+    ) -> None:
+        if weight <= 0:
+            raise ValueError("Pool weights must be greater than zero.")
+        self.name = name
+        self.consumer = consumer
+        self.weight = weight
+        self.min_share = min_share
+        self.max_share = max_share
+        self.virtual_time = 0.0
+        self.closed = False
+
+    def in_flight(self) -> int:
+        return self.consumer.in_flight() if self.consumer.is_async else 0
+
+
+class WeightedFairScheduler:
+    """Pick which queue a shared worker should pull from next.
+
+    This is start-time fair queuing: every dispatch advances the lane's virtual time by
+    `1 / weight`, and lanes are served lowest virtual time first. Lanes below their minimum share
+    of the worker's task slots jump the line, and lanes at their maximum share are skipped.
+    """
+
+    def __init__(self, lanes: List[Lane], capacity: int) -> None:
+        self.lanes = lanes
+        self.capacity = capacity
+        self.virtual_clock = 0.0
+
+    def cap(self, lane: Lane) -> int:
+        """The most task slots a lane may hold in this worker."""
+        return max(1, math.floor(lane.max_share * self.capacity))
+
+    def candidates(self) -> List[Lane]:
+        """Return the lanes that may receive an item right now, in the order they should be tried."""
+        in_flight = {lane.name: lane.in_flight() for lane in self.lanes}
+        if sum(in_flight.values()) >= self.capacity:
+            return []
+
+        # Lanes waiting on their rate limit are passed over, so they don't hold up the other queues.
+        eligible = [
+            lane
+            for lane in self.lanes
+            if not lane.closed
+            and in_flight[lane.name] < self.cap(lane)
+            and (not lane.consumer.is_async or in_flight[lane.name] < lane.consumer.limit)
+            and (not lane.consumer.rate_limiter or lane.consumer.rate_limiter.ready())
+        ]
+        # Idle lanes rejoin at the current virtual time rather than cashing in credit they built up while idle.
+        ordered = sorted(eligible, key=lambda lane: max(lane.virtual_time, self.virtual_clock))
+        reserved = [lane for lane in ordered if in_flight[lane.name] < lane.min_share * self.capacity]
+        return reserved + [lane for lane in ordered if lane not in reserved]
+
+    def charge(self, lane: Lane) -> None:
+        """Account for an item dispatched from the lane."""
+        start = max(lane.virtual_time, self.virtual_clock)
+        self.virtual_clock = start
+        lane.virtual_time = start + 1.0 / lane.weight
+
+    @property
+    def open(self) -> bool:
+        return any(not lane.closed for lane in self.lanes)
+
+
+def pool_process(
+    lane_configs: List[Dict[str, Any]],
+    shutdown_event: Event,
+    pool_settings: Dict[str, Any],
+    cpus: List[int] | None = None,
+) -> None:
+    # Ensure child workers can emit logs before starting the async loop.
+    if not logging.getLogger().handlers:
+        logging.basicConfig()
+    apply_placement(cpus, pool_settings.get("worker_nice"))
+    preload(pool_settings)
+    asyncio.run(pool_runner(lane_configs, shutdown_event, pool_settings))
+
+
+async def pool_runner(
+    lane_configs: List[Dict[str, Any]],
+    shutdown_event: Event,
+    pool_settings: Dict[str, Any],
+) -> None:
+    """Serve several queues from one worker process using weighted fair queuing.
+
+    Args:
+        lane_configs (List[Dict[str, Any]]): One dict per queue with the `name`, `weight`, `min_share` and
+            `max_share` of the lane plus the keyword arguments for its QueueConsumer.
+        shutdown_event (Event): Event that signals the worker to exit.
+        pool_settings (Dict[str, Any]): The `tasks_per_process`, `max_jobs_per_process` and `empty_queue_sleep_time`
+            of the pool.
+    """
+    PROCESS_NAME = mp.current_process().name
+    jobs_run = 0
+
+    parent_process = mp.parent_process()
+    # This entrypoint is only valid inside a child process.
+    if parent_process is None:
+        raise ValueError("Function should be called as a child process.")
+
+    lanes = []
+    for config in lane_configs:
+        config = dict(config)
+        name = config.pop("name")
+        weight = config.pop("weight")
+        min_share = config.pop("min_share")
+        max_share = config.pop("max_share")
+        lanes.append(Lane(name, QueueConsumer(**config), weight, min_share, max_share))
+    scheduler = WeightedFairScheduler(lanes, pool_settings["tasks_per_process"])
+
+    profiler = WorkerProfiler(pool_settings)
+    profiler.install()
+    timeline = get_recorder(pool_settings)
+
+    try:
+        while not shutdown_event.is_set() and parent_process.is_alive() and scheduler.open:
+            profiler.tick()
+            candidates = scheduler.candidates()
+            dispatched = False
+            for lane in candidates:
+                try:
+                    item = lane.consumer.queue.get(False)
+                except Empty:
+                    continue
+
+                if item == "close":
+                    lane.closed = True
+                    continue
+
+                # Contexts are built on first use so queues that stay quiet don't cost the worker anything.
+                await lane.consumer.setup()
+                scheduler.charge(lane)
+                await lane.consumer.dispatch(item, scheduler.cap(lane))
+                profiler.item_dispatched()
+                dispatched = True
+                break
+
+            if dispatched:
+                jobs_run += 1
+                if pool_settings.get("max_jobs_per_process", None):
+                    if jobs_run >= pool_settings["max_jobs_per_process"]:
+                        logger.info(f"{PROCESS_NAME} has reached max_jobs_per_process, exiting.")
+                        if timeline:
+                            timeline.instant("recycle", "loop", {"reason": "max_jobs_per_process"})
+                        break
+            elif candidates:
+                logger.debug(f"{PROCESS_NAME} has no jobs to process, sleeping.")
+                sleeping = now()
+                await asyncio.sleep(pool_settings["empty_queue_sleep_time"])
+                if timeline:
+                    timeline.complete("idle", "loop", sleeping, now())
+            else:
+                # No lane has a free task slot, wait for one to open up.
+                await asyncio.sleep(0.01)
+
+        # Finish accepted async work before the worker exits.
+        await asyncio.gather(*[lane.consumer.drain() for lane in lanes])
+    finally:
+        # Write out a profile cut short by the worker exiting.
+        profiler.stop()
+        if timeline:
+            timeline.dump()
+
+
+class SharedPool:
+    """A single set of worker processes that serves the queues of several QueueRunners."""
+
+    def __init__(
+        self,
+        runners: List["QueueRunner"],
+        num_processes: int,
+        tasks_per_process: int | None = None,
+        max_jobs_per_process: int | None = 200,
+    ) -> None:
+        """
+        Args:
+            runners (List[QueueRunner]): The runners whose queues the pool serves.
+            num_processes (int): The number of pool worker processes.
+            tasks_per_process (int | None, optional): The async task slots each worker splits between the queues.
+                Defaults to the largest concurrent_tasks_per_process of the runners.
+            max_jobs_per_process (int | None, optional): Jobs a pool worker runs before it is replaced. Defaults to 200.
+        """
+        if len({runner.settings.start_method for runner in runners}) > 1:
+            raise ValueError("Every queue in a shared pool needs the same start_method.")
+        self.runners = runners
+        self.num_processes = num_processes
+        self.tasks_per_process = tasks_per_process or max(
+            runner.settings.concurrent_tasks_per_process for runner in runners
+        )
+        self.max_jobs_per_process = max_jobs_per_process
+        self.worker_launches = 0
+        self.worker_metrics: Dict[str, List[WorkerMetrics | None]] = {}
+        self.placement = CpuPlacement(runners[0].settings)
+
+    def pool_settings(self) -> Dict[str, Any]:
+        return {
+            "tasks_per_process": self.tasks_per_process,
+            "max_jobs_per_process": self.max_jobs_per_process,
+            "empty_queue_sleep_time": min(runner.settings.empty_queue_sleep_time for runner in self.runners),
+            # Profiling, timelines, preloads and placement are configured by the first queue since pool workers serve every queue at once.
+            **self.runners[0].settings.model_dump(
+                include={
+                    "profile_mode",
+                    "profile_duration",
+                    "profile_items",
+                    "profile_dir",
+                    "profile_on_start",
+                    "timeline_dir",
+                    "timeline_buffer_size",
+                    "preload_modules",
+                    "worker_nice",
+                }
+            ),
+        }
+
+    def lane_configs(self, worker_metrics: List[WorkerMetrics | None]) -> List[Dict[str, Any]]:
+        return [
+            {
+                "name": runner.name,
+                "weight": runner.settings.pool_weight,
+                "min_share": runner.settings.pool_min_share,
+                "max_share": runner.settings.pool_max_share,
+                "queue": runner.import_queue,
+                "reader": runner.reader,
+                "context": runner.context,
+                "settings": runner.settings.model_dump(),
+                "timeout_handler": runner.timeout_handler,
+                "rate_limiter": runner.rate_limiter,
+                "metrics": metrics,
+            }
+            for runner, metrics in zip(self.runners, worker_metrics)
+        ]
+
+    async def _run_loop(self, shutdown_event: Event) -> None:
+        """Keep the pool at full size until shutdown.
+
+        Args:
+            shutdown_event: Event that signals the loop to exit.
+        """
+        timeline = get_recorder(self.runners[0].settings.model_dump())
+        watcher = ExitWatcher()
+        processes: List[mp.process.BaseProcess] = []
+        try:
+            while not shutdown_event.is_set():
+                if any(runner.import_queue is None for runner in self.runners):
+                    # A runner has stopped and closed its queue, so there is nothing left to launch workers for.
+                    break
+                for process in processes:
+                    if not process.is_alive():
+                        self._reap(process)
+                processes = [x for x in processes if x.is_alive()]
+                while len(processes) < self.num_processes:
+                    process = self.launch_process(shutdown_event)
+                    processes.append(process)
+                    process.start()
+                    watcher.watch(process)
+                    if timeline and process.pid:
+                        timeline.name_process(process.pid, process.name)
+                        timeline.instant("spawn", "pool", {"worker": process.name, "pid": process.pid})
+                # Wakes as soon as a worker exits so it is replaced right away.
+                await watcher.wait(SHUTDOWN_POLL_INTERVAL)
+        finally:
+            watcher.close()
+
+    def _reap(self, process: mp.process.BaseProcess) -> None:
+        """Release the metrics rows and CPUs a pool worker held."""
+        self.placement.release(process.name)
+        for runner, metrics in zip(self.runners, self.worker_metrics.pop(process.name, [])):
+            if runner.metrics:
+                runner.metrics.release(metrics)
+                runner.metrics.inc("worker_exits")
+
+    def launch_process(self, shutdown_event: Event) -> mp.process.BaseProcess:
+        """Create one pool worker process that serves every queue in the pool."""
+        ctx = self.runners[0].mp_context()
+        worker_metrics = [runner.metrics.worker() if runner.metrics else None for runner in self.runners]
+        name = f"pool_worker_{self.worker_launches:03d}"
+        process = ctx.Process(  # type: ignore[attr-defined]
+            target=pool_process,
+            args=(self.lane_configs(worker_metrics), shutdown_event, self.pool_settings(), self.placement.assign(name)),
+        )
+        process.name = name
+        self.worker_metrics[process.name] = worker_metrics
+        for runner in self.runners:
+            if runner.metrics:
+                runner.metrics.inc("worker_starts")
+        self.worker_launches += 1
+        logger.debug(f"Launching pool worker {process.name}")
+        process.daemon = True
+        return process
@@ -0,0 +1,101 @@
+import cProfile
+import logging
+import multiprocessing as mp
+import os
+import signal
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerProfiler:
+    """Profile a worker process on demand and write the results to a file.
+
+    A profiling window is requested with SIGUSR1 (or `profile_on_start`) and runs until
+    `profile_duration` seconds have passed or `profile_items` items have been dispatched. The
+    signal handler only sets a flag; the worker loop starts and stops the profiler between items.
+    """
+
+    def __init__(self, settings: Dict[str, Any]) -> None:
+        self.mode = settings.get("profile_mode", "cprofile")
+        self.duration = settings.get("profile_duration", 30.0)
+        self.max_items = settings.get("profile_items")
+        self.output_dir = Path(settings.get("profile_dir") or tempfile.gettempdir())
+        self.requested = bool(settings.get("profile_on_start"))
+        self.started: float | None = None
+        self.items = 0
+        self._profile: cProfile.Profile | None = None
+        self._baseline: tracemalloc.Snapshot | None = None
+
+    def install(self) -> None:
+        """Start profiling when the worker receives SIGUSR1."""
+        signal.signal(signal.SIGUSR1, self.request)
+
+    def request(self, signum: Any = None, frame: Any = None) -> None:
+        self.requested = True
+
+    @property
+    def active(self) -> bool:
+        return self.started is not None
+
+    def tick(self) -> None:
+        """Start or finish a profiling window. Called by the worker loop between items."""
+        if self.requested and not self.active:
+            self.requested = False
+            self.start()
+        elif self.active and self.started is not None:
+            if time.monotonic() >= self.started + self.duration:
+                self.stop()
+            elif self.max_items and self.items >= self.max_items:
+                self.stop()
+
+    def item_dispatched(self) -> None:
+        if self.active:
+            self.items += 1
+
+    def start(self) -> None:
+        logger.info(f"{mp.current_process().name} starting {self.mode} profile.")
+        self.started = time.monotonic()
+        self.items = 0
+        if self.mode == "tracemalloc":
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(25)
+            self._baseline = tracemalloc.take_snapshot()
+        else:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+
+    def stop(self) -> Path | None:
+        """Finish the current profiling window and return the path of the output file."""
+        if not self.active:
+            return None
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        stem = f"{mp.current_process().name}-{os.getpid()}-{int(time.time())}"
+
+        if self.mode == "tracemalloc":
+            path = self.output_dir / f"{stem}.tracemalloc.txt"
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            with open(path, "w") as f:
+                f.write(f"# Memory growth over {self.items} items\n")
+                if self._baseline is not None:
+                    for growth in snapshot.compare_to(self._baseline, "lineno")[:50]:
+                        f.write(f"{growth}\n")
+                f.write("\n# Largest allocations\n")
+                for stat in snapshot.statistics("lineno")[:50]:
+                    f.write(f"{stat}\n")
+            self._baseline = None
+        else:
+            path = self.output_dir / f"{stem}.prof"
+            if self._profile is not None:
+                self._profile.disable()
+                self._profile.dump_stats(path)
+            self._profile = None
+
+        logger.info(f"{mp.current_process().name} wrote {self.mode} profile of {self.items} items to {path}.")
+        self.started = None
+        return path
@@ -0,0 +1,40 @@
+import multiprocessing as mp
+import time
+from multiprocessing.context import BaseContext
+
+
+class RateLimiter:
+    """A token bucket shared between every worker process of a queue.
+
+    Rather than letting workers poll for free tokens, each call to `reserve` claims the next
+    available slot in the schedule and returns how long the caller has to wait for it. Bursts
+    are spread out evenly and each item costs a single lock acquisition.
+    """
+
+    def __init__(self, rate: float, burst: int = 1, mp_context: BaseContext | None = None) -> None:
+        """
+        Args:
+            rate (float): The number of items per second allowed across all processes.
+            burst (int, optional): How many items can be dispatched back to back after an idle period. Defaults to 1.
+            mp_context (BaseContext | None, optional): The multiprocessing context to allocate shared memory from.
+        """
+        if rate <= 0:
+            raise ValueError("Rate limits must be greater than zero.")
+        ctx = mp_context if mp_context else mp.get_context("fork")
+        self.interval = 1.0 / rate
+        self.tolerance = self.interval * max(burst - 1, 0)
+        # The theoretical arrival time of the next item, shared across processes.
+        self._next_slot = ctx.RawValue("d", 0.0)
+        self._lock = ctx.Lock()
+
+    def reserve(self) -> float:
+        """Claim the next dispatch slot and return the seconds to wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            next_slot = max(self._next_slot.value, now)
+            self._next_slot.value = next_slot + self.interval
+        return max(next_slot - self.tolerance - now, 0.0)
+
+    def ready(self) -> bool:
+        """Whether a reservation made now could be used right away. Nothing is claimed."""
+        return self._next_slot.value - self.tolerance <= time.monotonic()
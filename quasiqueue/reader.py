@@ -2,36 +2,382 @@ import asyncio
 import inspect
 import logging
 import multiprocessing as mp
+import os
+import signal
+import sys
+import time
+from importlib import import_module
 from multiprocessing.synchronize import Event
 from queue import Empty
-from typing import Any, Callable, Dict, List
+from typing import Any, Awaitable, Callable, Dict, List
+
+from .backends import QueueBackend, split_claim
+from .codecs import create_codec
+from .concurrency import AIMDController
+from .imports import resolve
+from .metrics import WorkerMetrics
+from .placement import apply_placement
+from .profiling import WorkerProfiler
+from .ratelimit import RateLimiter
+from .timeline import get_recorder, now
+from .tracing import unwrap
 
 logger = logging.getLogger(__name__)
 
+# Exit code used when a worker is recycled because a sync reader overran reader_timeout.
+TIMEOUT_EXIT_CODE = 75
+
 
 def reader_process(
-    queue: mp.Queue,
+    queue: QueueBackend,
     shutdown_event: Event,
     reader: Callable[[str | int], None],
     context: Callable[[], Dict[str, Any]] | None,
     settings: Dict[str, Any],
+    timeout_handler: Callable[..., None] | None = None,
+    rate_limiter: RateLimiter | None = None,
+    concurrency_gauge: Any = None,
+    metrics: WorkerMetrics | None = None,
+    retire_flag: Any = None,
+    cpus: List[int] | None = None,
 ) -> None:
     # Ensure child workers can emit logs before starting the async loop.
     if not logging.getLogger().handlers:
         logging.basicConfig()
-    asyncio.run(reader_runner(queue, shutdown_event, reader, context, settings))
+    apply_placement(cpus, settings.get("worker_nice"))
+    preload(settings)
+    asyncio.run(
+        reader_runner(
+            queue,
+            shutdown_event,
+            reader,
+            context,
+            settings,
+            timeout_handler,
+            rate_limiter,
+            concurrency_gauge,
+            metrics,
+            retire_flag,
+        )
+    )
 
 
 def _prune_tasks(tasks: List[asyncio.Task]) -> List[asyncio.Task]:
     return [task for task in tasks if not task.done()]
 
 
+def _report_timeout(
+    item: Any,
+    timeout_handler: Callable[..., None] | None,
+    settings: Dict[str, Any],
+    ctx: Any,
+) -> None:
+    """Log a timed out item and pass it to the optional timeout handler."""
+    logger.warning(
+        f"{mp.current_process().name} reader timed out after {settings['reader_timeout']}s on item {item!r}."
+    )
+    if not timeout_handler:
+        return
+
+    handler_args = inspect.getfullargspec(timeout_handler).args
+    handler_kw_args: Dict[str, Any] = {"item": item}
+    if ctx and "ctx" in handler_args:
+        handler_kw_args["ctx"] = ctx
+    if "settings" in handler_args:
+        handler_kw_args["settings"] = settings
+
+    try:
+        timeout_handler(**handler_kw_args)
+    except Exception:
+        logger.exception(f"Timeout handler failed for item {item!r}.")
+
+
+def preload(settings: Dict[str, Any]) -> None:
+    """Import `preload_modules` in a new worker. They are already loaded under fork and forkserver."""
+    for module in settings.get("preload_modules") or []:
+        import_module(module)
+
+
+async def _wait_for_rate_limit(rate_limiter: RateLimiter) -> None:
+    delay = rate_limiter.reserve()
+    if delay > 0:
+        await asyncio.sleep(delay)
+
+
+class _ReaderTimeoutError(Exception):
+    """Carries a TimeoutError raised by the reader itself past `asyncio.wait_for`."""
+
+    def __init__(self, error: BaseException) -> None:
+        self.error = error
+
+
+async def _within_timeout(reader: Awaitable[Any], timeout: float) -> bool:
+    """Await a reader for at most `timeout` seconds, returning False if it ran out of time and was cancelled.
+
+    Only the deadline counts as a timeout. A TimeoutError the reader raises itself, such as from an HTTP
+    client, is raised like any other reader error.
+    """
+    if sys.version_info >= (3, 11):
+        try:
+            async with asyncio.timeout(timeout) as deadline:
+                await reader
+        except TimeoutError:
+            if deadline.expired():
+                return False
+            raise
+        return True
+
+    # Python 3.10 has no asyncio.timeout, so the reader's own timeouts are wrapped to get past wait_for.
+    async def guarded() -> None:
+        try:
+            await reader
+        except asyncio.TimeoutError as e:
+            raise _ReaderTimeoutError(e)
+
+    try:
+        await asyncio.wait_for(guarded(), timeout)
+    except asyncio.TimeoutError:
+        return False
+    except _ReaderTimeoutError as e:
+        raise e.error
+    return True
+
+
+class QueueConsumer:
+    """Hand items from one queue to its reader inside a worker process.
+
+    This holds the per-queue state a worker needs (reader context, in-flight tasks, rate limiter
+    and concurrency controller) so the same dispatch logic serves dedicated workers and workers
+    shared between several queues.
+    """
+
+    def __init__(
+        self,
+        queue: QueueBackend,
+        reader: Callable[[str | int], None],
+        context: Callable[[], Dict[str, Any]] | None,
+        settings: Dict[str, Any],
+        timeout_handler: Callable[..., None] | None = None,
+        rate_limiter: RateLimiter | None = None,
+        concurrency_gauge: Any = None,
+        metrics: WorkerMetrics | None = None,
+    ) -> None:
+        self.queue = queue
+        self.reader = resolve(reader)
+        self.context = resolve(context)
+        self.settings = settings
+        self.timeout_handler = resolve(timeout_handler)
+        self.rate_limiter = rate_limiter
+        self.concurrency_gauge = concurrency_gauge
+        self.metrics = metrics
+        self.ctx: Any = None
+        self.ready = False
+        self.running_tasks: List[asyncio.Task] = []
+        self.reader_args = inspect.getfullargspec(self.reader).args
+        self.is_async = inspect.iscoroutinefunction(self.reader)
+        self.timeline = get_recorder(settings)
+        self.codec = create_codec(settings.get("queue_codec", "none"), settings.get("queue_compress_min_bytes", 0))
+
+        self.controller = None
+        if settings.get("adaptive_concurrency"):
+            self.controller = AIMDController(
+                initial=settings["concurrent_tasks_per_process"],
+                minimum=settings["adaptive_concurrency_min"],
+                maximum=settings["adaptive_concurrency_max"],
+                latency_target=settings["adaptive_latency_target"],
+                decrease_factor=settings["adaptive_decrease_factor"],
+                gauge=concurrency_gauge,
+            )
+        elif concurrency_gauge is not None:
+            concurrency_gauge.value = settings["concurrent_tasks_per_process"]
+
+    async def setup(self) -> None:
+        """Build the reader context. Safe to call more than once."""
+        if self.ready:
+            return
+        self.ready = True
+        if not self.context:
+            return
+
+        # Let context providers opt into settings without changing older call signatures.
+        context_args = inspect.getfullargspec(self.context).args
+        context_kw_args = {}
+        if "settings" in context_args:
+            context_kw_args["settings"] = self.settings
+
+        if inspect.iscoroutinefunction(self.context):
+            self.ctx = await self.context(**context_kw_args)
+        else:
+            self.ctx = self.context(**context_kw_args)
+
+    @property
+    def limit(self) -> int:
+        """The number of async reader tasks this consumer may run at once."""
+        if self.controller:
+            return self.controller.limit
+        if self.concurrency_gauge is not None:
+            # The parent rewrites the gauge when its settings are reloaded.
+            return self.concurrency_gauge.value
+        return self.settings["concurrent_tasks_per_process"]
+
+    def in_flight(self) -> int:
+        self.running_tasks = _prune_tasks(self.running_tasks)
+        return len(self.running_tasks)
+
+    async def dispatch(self, item: Any, limit: int | None = None) -> None:
+        """Run the reader on an item, waiting for a free task slot first for async readers.
+
+        Args:
+            item (Any): The item taken off of the queue.
+            limit (int | None, optional): A tighter task limit than the consumer's own. Defaults to None.
+        """
+        item, receipt = split_claim(item)
+        item, enqueued = unwrap(item)
+        if self.codec:
+            item = self.codec.decode(item)
+        dequeued = None
+        if enqueued is not None:
+            dequeued = time.time()
+            if self.metrics:
+                self.metrics.observe("queue_wait", dequeued - enqueued)
+
+        # Adapt kwargs to the reader's supported signature.
+        reader_kw_args = {"item": item}
+
+        if self.ctx:
+            if "ctx" in self.reader_args:
+                reader_kw_args["ctx"] = self.ctx
+
+        if "settings" in self.reader_args:
+            reader_kw_args["settings"] = self.settings
+
+        throttled = now() if self.timeline else 0
+        if self.is_async:
+            # Bound async fan-out per worker process.
+            while self.in_flight() >= min(self.limit, limit or self.limit):
+                await asyncio.sleep(0.01)
+            if self.rate_limiter:
+                await _wait_for_rate_limit(self.rate_limiter)
+            self._record_throttle(throttled)
+            self.running_tasks.append(asyncio.create_task(self._run_async(reader_kw_args, dequeued, receipt)))
+            await asyncio.sleep(0)
+        else:
+            if self.rate_limiter:
+                await _wait_for_rate_limit(self.rate_limiter)
+            self._record_throttle(throttled)
+            self._run_sync(reader_kw_args, dequeued, receipt)
+
+    def _record_throttle(self, started: int) -> None:
+        # Only waits long enough to show up on a timeline are worth an event.
+        if self.timeline and now() - started >= 1000:
+            self.timeline.complete("throttled", "loop", started, now())
+
+    async def _run_async(
+        self, reader_kw_args: Dict[str, Any], dequeued: float | None = None, receipt: Any = None
+    ) -> None:
+        timeout = self.settings.get("reader_timeout")
+        started = time.monotonic()
+        lane = self.timeline.acquire_lane() if self.timeline else ""
+        span_start = now()
+        failed = True
+        try:
+            if not timeout:
+                await self.reader(**reader_kw_args)  # type: ignore
+            elif not await _within_timeout(self.reader(**reader_kw_args), timeout):  # type: ignore
+                # The reader has already been cancelled, so its concurrency slot is free again.
+                self._timed_out(reader_kw_args["item"])
+                return
+            failed = False
+        except Exception:
+            if self.metrics:
+                self.metrics.inc("reader_errors")
+            raise
+        finally:
+            self._ack(receipt)
+            self._finished(started, failed, dequeued)
+            if self.timeline:
+                self._record_reader(lane, span_start, reader_kw_args["item"], failed)
+                self.timeline.release_lane(lane)
+
+    def _run_sync(self, reader_kw_args: Dict[str, Any], dequeued: float | None = None, receipt: Any = None) -> None:
+        timeout = self.settings.get("reader_timeout")
+        started = time.monotonic()
+        span_start = now()
+        failed = True
+
+        # A blocking reader can't be cancelled safely, so the worker exits and the parent replaces it. The item
+        # is left unacknowledged, so a durable backend delivers it again once its visibility timeout passes.
+        def recycle(signum, frame):
+            self._timed_out(reader_kw_args["item"])
+            logger.warning(f"{mp.current_process().name} is exiting so it can be replaced.")
+            if self.timeline:
+                self._record_reader("reader", span_start, reader_kw_args["item"], True)
+                self.timeline.instant("recycle", "loop", {"reason": "reader_timeout"})
+                self.timeline.dump()
+            os._exit(TIMEOUT_EXIT_CODE)
+
+        if timeout:
+            previous = signal.signal(signal.SIGALRM, recycle)
+            signal.setitimer(signal.ITIMER_REAL, timeout)
+        try:
+            self.reader(**reader_kw_args)  # type: ignore
+            failed = False
+        except Exception:
+            if self.metrics:
+                self.metrics.inc("reader_errors")
+            raise
+        finally:
+            if timeout:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+                signal.signal(signal.SIGALRM, previous)
+            self._ack(receipt)
+            if self.timeline:
+                self._record_reader("reader", span_start, reader_kw_args["item"], failed)
+        self._finished(started, False, dequeued)
+
+    def _record_reader(self, thread: str, started: int, item: Any, failed: bool) -> None:
+        if self.timeline:
+            # Items are truncated so a large payload can't bloat the trace.
+            self.timeline.complete("reader", thread, started, now(), {"item": repr(item)[:80], "failed": failed})
+
+    def _timed_out(self, item: Any) -> None:
+        if self.metrics:
+            self.metrics.inc("reader_timeouts")
+        _report_timeout(item, self.timeout_handler, self.settings, self.ctx)
+
+    def _ack(self, receipt: Any) -> None:
+        # Failed items are acknowledged too. Only items whose worker died are delivered again.
+        if receipt is not None:
+            self.queue.ack(receipt)
+
+    def _finished(self, started: float, failed: bool, dequeued: float | None = None) -> None:
+        latency = time.monotonic() - started
+        if self.controller:
+            self.controller.record(started, latency, failed)
+        if self.metrics:
+            self.metrics.inc("items_processed")
+            self.metrics.observe("reader_latency", latency)
+            if dequeued is not None:
+                # Service time covers everything after the dequeue, including waits for a task slot.
+                self.metrics.observe("service_time", time.time() - dequeued)
+
+    async def drain(self) -> None:
+        """Wait for accepted async work to finish."""
+        if self.running_tasks:
+            await asyncio.gather(*self.running_tasks, return_exceptions=True)
+
+
 async def reader_runner(
-    queue: mp.Queue,
+    queue: QueueBackend,
     shutdown_event: Event,
     reader: Callable[[str | int], None],
     context: Callable[[], Dict[str, Any]] | None,
     settings: dict,
+    timeout_handler: Callable[..., None] | None = None,
+    rate_limiter: RateLimiter | None = None,
+    concurrency_gauge: Any = None,
+    metrics: WorkerMetrics | None = None,
+    retire_flag: Any = None,
 ) -> None:
     PROCESS_NAME = mp.current_process().name
     jobs_run = 0
@@ -41,63 +387,56 @@ async def reader_runner(
     if parent_process is None:
         raise ValueError("Function should be called as a child process.")
 
-    ctx = None
-    if context:
-        # Let context providers opt into settings without changing older call signatures.
-        context_args = inspect.getfullargspec(context).args
-        context_kw_args = {}
-        if "settings" in context_args:
-            context_kw_args["settings"] = settings
-
-        if inspect.iscoroutinefunction(context):
-            ctx = await context(**context_kw_args)
-        else:
-            ctx = context(**context_kw_args)
+    consumer = QueueConsumer(
+        queue, reader, context, settings, timeout_handler, rate_limiter, concurrency_gauge, metrics
+    )
+    await consumer.setup()
 
-    running_tasks: List[asyncio.Task] = []
-    reader_args = inspect.getfullargspec(reader).args
+    profiler = WorkerProfiler(settings)
+    profiler.install()
+    timeline = get_recorder(settings)
 
-    # The loop condition is the primary shutdown path.
-    while not shutdown_event.is_set() and parent_process.is_alive():
-        try:
-            item = queue.get(True, settings["queue_interaction_timeout"])
-            if item == "close":
-                # Also honor queue-level shutdown sentinels.
+    try:
+        # The loop condition is the primary shutdown path.
+        while not shutdown_event.is_set() and parent_process.is_alive():
+            if retire_flag is not None and retire_flag.value:
+                # The parent lowered num_processes and picked this worker to go.
+                logger.info(f"{PROCESS_NAME} was retired, exiting.")
                 break
+            profiler.tick()
+            try:
+                waiting = now()
+                item = queue.get(True, settings["queue_interaction_timeout"])
+                if timeline:
+                    timeline.complete("get", "loop", waiting, now())
+                if item == "close":
+                    # Also honor queue-level shutdown sentinels.
+                    break
+
+                await consumer.dispatch(item)
+                profiler.item_dispatched()
+
+                jobs_run += 1
+                if settings.get("max_jobs_per_process", None):
+                    if jobs_run >= settings["max_jobs_per_process"]:
+                        logger.info(f"{PROCESS_NAME} has reached max_jobs_per_process, exiting.")
+                        if timeline:
+                            timeline.instant("recycle", "loop", {"reason": "max_jobs_per_process"})
+                        break
+
+            except Empty:
+                logger.debug(f"{PROCESS_NAME} has no jobs to process, sleeping.")
+                # Back off without blocking in-flight async tasks.
+                await asyncio.sleep(settings["empty_queue_sleep_time"])
+                if timeline:
+                    # Idle covers the empty get as well as the sleep after it.
+                    timeline.complete("idle", "loop", waiting, now())
+                continue
 
-            # Adapt kwargs to the reader's supported signature.
-            reader_kw_args = {"item": item}
-
-            if ctx:
-                if "ctx" in reader_args:
-                    reader_kw_args["ctx"] = ctx
-
-            if "settings" in reader_args:
-                reader_kw_args["settings"] = settings
-
-            if inspect.iscoroutinefunction(reader):
-                # Bound async fan-out per worker process.
-                running_tasks = _prune_tasks(running_tasks)
-                while len(running_tasks) >= settings["concurrent_tasks_per_process"]:
-                    await asyncio.sleep(0.01)
-                    running_tasks = _prune_tasks(running_tasks)
-                running_tasks.append(asyncio.create_task(reader(**reader_kw_args)))  # type: ignore
-                await asyncio.sleep(0)
-            else:
-                reader(**reader_kw_args)  # type: ignore
-
-            jobs_run += 1
-            if settings.get("max_jobs_per_process", None):
-                if jobs_run >= settings["max_jobs_per_process"]:
-                    logger.info(f"{PROCESS_NAME} has reached max_jobs_per_process, exiting.")
-                    return
-
-        except Empty:
-            logger.debug(f"{PROCESS_NAME} has no jobs to process, sleeping.")
-            # Back off without blocking in-flight async tasks.
-            await asyncio.sleep(settings["empty_queue_sleep_time"])
-            continue
-
-    if running_tasks:
         # Finish accepted async work before the worker exits.
-        await asyncio.gather(*running_tasks, return_exceptions=True)
+        await consumer.drain()
+    finally:
+        # Write out a profile cut short by the worker exiting.
+        profiler.stop()
+        if timeline:
+            timeline.dump()
@@ -0,0 +1,287 @@
+import asyncio
+import hmac
+import logging
+import os
+import pickle
+import struct
+from collections import deque
+from queue import Empty, Full
+from typing import Any, Deque, Dict, List, Tuple
+
+from .backends import split_claim
+from .metrics import MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+# Every message is a pickled tuple prefixed with its length.
+_FRAME = struct.Struct("!I")
+_NONCE_SIZE = 32
+# How long the broker holds a request open waiting for the queue to have items, and how often it checks.
+BROKER_WAIT = 0.5
+BROKER_POLL_INTERVAL = 0.01
+
+
+class AuthenticationError(Exception):
+    pass
+
+
+async def _send(writer: asyncio.StreamWriter, message: Tuple[Any, ...]) -> None:
+    payload = pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)
+    writer.write(_FRAME.pack(len(payload)) + payload)
+    await writer.drain()
+
+
+async def _receive(reader: asyncio.StreamReader) -> Tuple[Any, ...]:
+    (size,) = _FRAME.unpack(await reader.readexactly(_FRAME.size))
+    return pickle.loads(await reader.readexactly(size))
+
+
+def _digest(authkey: str, nonce: bytes) -> bytes:
+    return hmac.new(authkey.encode(), nonce, "sha256").digest()
+
+
+async def _authenticate(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, authkey: str) -> None:
+    """Prove to the other side that both know the authkey, before anything is unpickled.
+
+    Each side sends a random challenge and checks the HMAC of it that comes back, the same handshake
+    `multiprocessing.connection` uses. Only raw bytes cross the socket until both sides have passed.
+    """
+    challenge = os.urandom(_NONCE_SIZE)
+    writer.write(challenge)
+    await writer.drain()
+    theirs = await reader.readexactly(_NONCE_SIZE)
+    writer.write(_digest(authkey, theirs))
+    await writer.drain()
+    response = await reader.readexactly(len(_digest(authkey, challenge)))
+    if not hmac.compare_digest(response, _digest(authkey, challenge)):
+        raise AuthenticationError("The other side of the connection has a different remote_authkey.")
+
+
+class QueueBroker:
+    """Serve a queue over TCP to worker nodes on other hosts.
+
+    Worker nodes ask for items with a credit, the number of items they have room for, and the broker
+    replies with one batch of at most that many. Nothing is sent without credit, so a slow node never
+    builds up a backlog. A batch counts as delivered once the node asks for more. If the node
+    disconnects first, its last batch goes back on the queue for another worker.
+    """
+
+    def __init__(self, queue: Any, settings: Any, name: str = "queue", metrics: MetricsRegistry | None = None) -> None:
+        self.queue = queue
+        self.name = name
+        self.host = settings.remote_host
+        self.port = settings.remote_port
+        self.authkey = settings.remote_authkey
+        self.batch_size = settings.remote_batch_size
+        self.metrics = metrics
+        # Items returned by disconnected nodes that didn't fit back on the queue. They are sent first.
+        self.returned: Deque[Any] = deque()
+        self.connections: Dict[asyncio.StreamWriter, List[Any]] = {}
+        self.server: asyncio.Server | None = None
+
+    async def start(self) -> None:
+        if not self.authkey:
+            # Frames are unpickled, so a broker anyone can authenticate with runs anyone's code.
+            raise ValueError(f"[{self.name}] Set remote_authkey before serving the queue to remote workers.")
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        # Record the real port when the OS picked one.
+        self.port = self.server.sockets[0].getsockname()[1]
+        logger.info(f"[{self.name}] Serving the queue to remote workers on {self.host}:{self.port}.")
+
+    async def close(self) -> None:
+        if self.server:
+            self.server.close()
+        for writer in list(self.connections):
+            writer.close()
+        if self.server:
+            await self.server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        peer = writer.get_extra_info("peername")
+        try:
+            await _authenticate(reader, writer, self.authkey)
+        except (AuthenticationError, asyncio.IncompleteReadError, ConnectionError) as e:
+            logger.warning(f"[{self.name}] Rejected remote worker {peer}: {e}")
+            writer.close()
+            return
+
+        self.connections[writer] = []
+        self._update_gauge()
+        logger.info(f"[{self.name}] Remote worker {peer} connected.")
+        try:
+            while True:
+                request = await _receive(reader)
+                # Asking for more acknowledges the previous batch.
+                self._ack(self.connections[writer])
+                self.connections[writer] = []
+                if request[0] != "get":
+                    raise ValueError(f"Unknown request {request[0]!r}.")
+                batch = await self._take(min(int(request[1]), self.batch_size))
+                self.connections[writer] = batch
+                await _send(writer, ("items", [split_claim(item)[0] for item in batch]))
+                if self.metrics:
+                    self.metrics.inc("remote_items_sent", len(batch))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception:
+            logger.exception(f"[{self.name}] Remote worker {peer} failed.")
+        finally:
+            self._requeue(self.connections.pop(writer, []))
+            self._update_gauge()
+            writer.close()
+            logger.info(f"[{self.name}] Remote worker {peer} disconnected.")
+
+    async def _take(self, credit: int) -> List[Any]:
+        """Take up to `credit` items, waiting up to BROKER_WAIT seconds for the first one."""
+        batch: List[Any] = []
+        waited = 0.0
+        while len(batch) < credit:
+            if self.returned:
+                batch.append(self.returned.popleft())
+                continue
+            try:
+                item = self.queue.get_nowait()
+            except Empty:
+                if batch or waited >= BROKER_WAIT:
+                    break
+                await asyncio.sleep(BROKER_POLL_INTERVAL)
+                waited += BROKER_POLL_INTERVAL
+                continue
+            if item == "close":
+                # Shutdown sentinels are meant for local workers.
+                self.queue.put_nowait(item)
+                break
+            batch.append(item)
+        return batch
+
+    def _ack(self, items: List[Any]) -> None:
+        for item in items:
+            receipt = split_claim(item)[1]
+            if receipt is not None:
+                self.queue.ack(receipt)
+
+    def _requeue(self, items: List[Any]) -> None:
+        if items:
+            logger.warning(f"[{self.name}] Returning {len(items)} undelivered items to the queue.")
+        for item in items:
+            try:
+                self.queue.put_nowait(split_claim(item)[0])
+            except Full:
+                self.returned.append(item)
+                continue
+            # The item went back as a new one, so a durable queue must not also redeliver the old claim.
+            self._ack([item])
+
+    def _update_gauge(self) -> None:
+        if self.metrics:
+            self.metrics.set("remote_connections", len(self.connections))
+
+
+class RemoteSource:
+    """The writer of a worker node, pulling batches of items from a QueueBroker.
+
+    The Builder of the node's own QueueRunner decides how many items it has room for, which becomes the
+    credit of each request, so the usual queue sizing settings control the flow on the node too.
+    """
+
+    # The broker forwards items as the queue holds them, already encoded with its `queue_codec` and traced.
+    # The node's Builder queues them as they are, and its workers decode them with the same codec.
+    prepared = True
+
+    def __init__(self, host: str, port: int, authkey: str) -> None:
+        if not authkey:
+            raise ValueError("Set remote_authkey to the broker's key before connecting to it.")
+        self.host = host
+        self.port = port
+        self.authkey = authkey
+        self.reader: asyncio.StreamReader | None = None
+        self.writer: asyncio.StreamWriter | None = None
+
+    async def connect(self) -> None:
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            await _authenticate(self.reader, self.writer, self.authkey)
+        except Exception:
+            self.close()
+            raise
+        logger.info(f"Connected to the broker at {self.host}:{self.port}.")
+
+    def close(self) -> None:
+        if self.writer:
+            self.writer.close()
+        self.reader = self.writer = None
+
+    async def fetch(self, credit: int) -> List[Any]:
+        """Ask the broker for up to `credit` items. Returns an empty list when it has none."""
+        if not self.writer:
+            await self.connect()
+        assert self.reader and self.writer
+        try:
+            await _send(self.writer, ("get", credit))
+            response = await _receive(self.reader)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            self.close()
+            raise
+        return response[1]
+
+    async def __call__(self, desired: int):
+        """Yield the next batch. An unreachable broker yields None so the node backs off and retries."""
+        try:
+            batch = await self.fetch(max(desired, 1))
+        except (OSError, asyncio.IncompleteReadError, AuthenticationError) as e:
+            logger.warning(f"Unable to reach the broker at {self.host}:{self.port}: {e!r}")
+            yield None
+            return
+        if not batch:
+            yield None
+            return
+        for item in batch:
+            yield item
+
+
+def parse_address(address: str) -> Tuple[str, int]:
+    """Split a `host:port` broker address."""
+    host, separator, port = address.rpartition(":")
+    if not separator or not port.isdigit():
+        raise ValueError(f"Broker addresses look like host:port, not {address!r}.")
+    return host or "127.0.0.1", int(port)
+
+
+def remote_worker(
+    address: str,
+    reader: Any,
+    context: Any = None,
+    name: str = "queue",
+    settings: Any = None,
+    timeout_handler: Any = None,
+) -> Any:
+    """Build a QueueRunner that runs `num_processes` local workers on items from a remote broker.
+
+    Args:
+        address (str): The broker's `host:port`.
+        reader (Any): The reader function, or its import path.
+        context (Any, optional): The context function, or its import path. Defaults to None.
+        name (str, optional): The queue name, used for the `QUASIQUEUE_{NAME}_` settings. Defaults to "queue".
+        settings (Settings | None, optional): Settings for the node. Defaults to the named environment settings.
+        timeout_handler (Any, optional): The reader timeout handler, or its import path. Defaults to None.
+
+    Returns:
+        QueueRunner: Run it with `main()` like any other queue.
+    """
+    from .runner import QueueRunner
+    from .settings import get_named_settings
+
+    settings = settings if settings else get_named_settings(name)
+    # The parent already filtered out recently queued items, and a batch returned by a disconnected node
+    # has to be accepted again.
+    settings = settings.model_copy(update={"prevent_requeuing_time": 0, "remote_port": None})
+    host, port = parse_address(address)
+    source = RemoteSource(host, port, settings.remote_authkey)
+    return QueueRunner(
+        name,
+        reader=reader,
+        writer=source,  # type: ignore[arg-type]
+        context=context,
+        settings=settings,
+        timeout_handler=timeout_handler,
+    )
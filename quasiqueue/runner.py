@@ -1,45 +1,112 @@
 import asyncio
 import logging
 import multiprocessing as mp
+import os
+import pickle
 import signal
 import time
+from functools import partial
+from multiprocessing.context import BaseContext
 from typing import Any, Callable, Dict, List
 
-import psutil
-
+from .backends import QueueBackend, create_queue
 from .builder import Builder
+from .cursor import CursorStore
+from .imports import resolve
+from .metrics import MetricsRegistry, WorkerMetrics, register_endpoint, unregister_endpoint
+from .placement import CpuPlacement
+from .pool import SharedPool
+from .ratelimit import RateLimiter
 from .reader import reader_process
+from .remote import QueueBroker
 from .settings import Settings, get_named_settings
+from .status import StatusPublisher
+from .supervision import SHUTDOWN_POLL_INTERVAL, ExitWatcher, sleep_unless_shutdown, wait_for_children
+from .timeline import get_recorder, merge_traces, now
 
 logger = logging.getLogger(__name__)
 
+# Metrics rows per worker, leaving headroom for replacement workers starting before exited ones are reaped.
+METRICS_SLOTS_PER_WORKER = 4
+
+# Settings a running queue picks up when it reloads. The rest shape the queue, its backend or its servers when it
+# starts, so changing them takes a restart. Fields added by Settings subclasses are always reloaded.
+RELOADABLE_SETTINGS = frozenset(
+    {
+        "num_processes",
+        "concurrent_tasks_per_process",
+        "max_jobs_per_process",
+        "reader_timeout",
+        "prevent_requeuing_time",
+        "lookup_block_size",
+        "empty_queue_sleep_time",
+        "full_queue_sleep_time",
+        "full_queue_sleep_min",
+        "full_queue_sleep_max",
+        "queue_interaction_timeout",
+        "graceful_shutdown_timeout",
+        "cursor_save_interval",
+        "metrics_interval",
+        "trace_sample_rate",
+    }
+)
+
 
 class QueueRunner(object):
     """Coordinate queue creation, worker supervision, and shutdown behavior."""
 
+    # Bumped by SIGHUP. Every queue running in the process reloads its settings when it changes.
+    reload_generation = 0
+
     def __init__(
         self,
         name: str,
-        reader: Callable[[str | int], None],
-        writer: Callable[[], int | str | None],
-        context: Callable[[], Dict[str, Any]] | None = None,
+        reader: Callable[[str | int], None] | str,
+        writer: Callable[[], int | str | None] | str | List[Callable[[], int | str | None] | str],
+        context: Callable[[], Dict[str, Any]] | str | None = None,
         settings: Settings | None = None,
+        timeout_handler: Callable[..., None] | str | None = None,
+        metrics_callback: Callable[[Dict[str, Any]], None] | None = None,
+        dedup_key: Callable[[Any], Any] | str | None = None,
+        settings_loader: Callable[[], Settings] | None = None,
     ) -> None:
         """The QueueRunner orchestrates the various components of the queue systems.
 
         Args:
             name (str): The name of the queue, used for logging and custom environment variable settings.
-            reader (Callable[[str  |  int], None]): A function that reads items off of the queue for processing.
-            writer (Callable[[], int  |  str  |  None]): The function responsible for adding new items to the queue.
-            context (Callable[[], Dict[str, Any]] | None): A function used to provide context to the Reader function when it is called. This is useful for reusing database connections or http connection pooling. The return value is a dict with any arbitrary keys defined. Defaults to None.
+            reader (Callable[[str  |  int], None] | str): A function that reads items off of the queue for processing, or its `module:function` import path.
+            writer (Callable[[], int  |  str  |  None] | str | List): The function responsible for adding new items to the queue, or its import path. A list of writers runs them concurrently as shards.
+            context (Callable[[], Dict[str, Any]] | str | None): A function (or import path) used to provide context to the Reader function when it is called. This is useful for reusing database connections or http connection pooling. The return value is a dict with any arbitrary keys defined. Defaults to None.
             settings (Settings | None, optional): A custom already initialized Settings object. Defaults to None.
+            timeout_handler (Callable[..., None] | str | None, optional): Called in the worker with the item when a reader exceeds reader_timeout. Defaults to None.
+            metrics_callback (Callable[[Dict[str, Any]], None] | None, optional): Called in the parent with a metrics snapshot every metrics_interval seconds. Defaults to None.
+            dedup_key (Callable[[Any], Any] | str | None, optional): Turns an item into the hashable key used to skip recently queued items, or its import path. Lets writers yield dicts and other unhashable payloads. Defaults to None, which uses the item itself.
+            settings_loader (Callable[[], Settings] | None, optional): Builds fresh settings when the queue reloads. Defaults to None, which re-reads the environment for queues without explicit settings and leaves queues with explicit settings unable to reload.
         """
         self.name = name
         self.settings = settings if settings else get_named_settings(name)
+        if settings_loader is None and settings is None:
+            settings_loader = partial(get_named_settings, name)
+        self.settings_loader = settings_loader
+        self.reload_pending = False
+        # Workers load the reader, context and timeout handler themselves so import paths reach them untouched.
         self.reader = reader
-        self.writer = writer
+        self.writer = [resolve(shard) for shard in writer] if isinstance(writer, (list, tuple)) else resolve(writer)
         self.context = context
+        self.timeout_handler = timeout_handler
+        self.metrics_callback = metrics_callback
+        self.dedup_key = resolve(dedup_key)
+        self.import_queue: QueueBackend | None = None
+        self.rate_limiter: RateLimiter | None = None
+        self.metrics: MetricsRegistry | None = None
+        self.concurrency_gauges: Dict[str, Any] = {}
+        self.worker_metrics: Dict[str, WorkerMetrics | None] = {}
+        self.worker_started: Dict[str, float] = {}
+        self.retire_flags: Dict[str, Any] = {}
+        self.placement: CpuPlacement | None = None
         self.worker_launches = 0
+        self.processes: List[mp.process.BaseProcess] = []
+        self._mp_context: BaseContext | None = None
 
     def setup_signals(self, shutdown_event: mp.synchronize.Event) -> None:
         """Register signal handlers on the given event.
@@ -51,6 +118,9 @@ class QueueRunner(object):
         Args:
             shutdown_event: A multiprocessing Event that will be set when
                 SIGINT or SIGTERM is received.
+
+        SIGUSR1 is forwarded to every worker process, which starts a profiling window in each worker. SIGHUP
+        reloads the settings of every queue in the process.
         """
 
         def shutdown(a=None, b=None):
@@ -61,55 +131,186 @@ class QueueRunner(object):
 
             if a == 15 or a is None:
                 logger.debug("Gracefully shutting down child processes.")
-                shutdown_start = time.time()
-                while len(psutil.Process().children()) > 0:
-                    if time.time() > (shutdown_start + self.settings.graceful_shutdown_timeout):
-                        break
-                    time.sleep(0.05)
+                wait_for_children(self.settings.graceful_shutdown_timeout)
 
-            remaining_processes = psutil.Process().children()
+            # Only processes started through multiprocessing are workers. Under forkserver and spawn the other
+            # children are the forkserver and the resource tracker, which have to outlive the queue.
+            remaining_processes = mp.active_children()
             if len(remaining_processes) > 0:
                 logger.debug("Terminating remaining child processes.")
+                # Signal every child before waiting so they all shut down in parallel.
                 for process in remaining_processes:
                     process.terminate()
+                wait_for_children(1)
+
+        def profile(a=None, b=None):
+            logger.info(f"[{self.name}] Signal {a} caught, profiling workers.")
+            for process in mp.active_children():
+                if process.pid is not None:
+                    try:
+                        os.kill(process.pid, signal.SIGUSR1)
+                    except ProcessLookupError:
+                        pass
+
+        def reload(a=None, b=None):
+            logger.info(f"[{self.name}] Signal {a} caught, reloading settings.")
+            QueueRunner.reload_generation += 1
 
         signal.signal(signal.SIGINT, shutdown)
         signal.signal(signal.SIGTERM, shutdown)
+        signal.signal(signal.SIGUSR1, profile)
+        signal.signal(signal.SIGHUP, reload)
+
+    def _prepare(self, worker_slots: int = 0) -> QueueBackend:
+        """Create the queue and shared state workers need, if they don't exist yet.
+
+        This runs before any worker is forked, including workers of a SharedPool.
 
-    async def _run_loop(self, shutdown_event: mp.synchronize.Event) -> None:
+        Args:
+            worker_slots: The number of workers outside of this runner (such as a SharedPool) that will read the queue.
+        """
+        if self.import_queue is None:
+            ctx = self.mp_context()
+            self.import_queue = create_queue(self.settings, self.name, ctx)
+            slots = max(self.settings.num_processes, worker_slots, 1) * METRICS_SLOTS_PER_WORKER
+            self.metrics = MetricsRegistry(self.name, slots, ctx)
+            self.placement = CpuPlacement(self.settings)
+            if self.settings.rate_limit:
+                # One bucket per queue so the limit holds no matter how many workers are running.
+                self.rate_limiter = RateLimiter(self.settings.rate_limit, self.settings.rate_limit_burst, ctx)
+        return self.import_queue
+
+    def mp_context(self) -> BaseContext:
+        """Return the multiprocessing context for the configured `start_method`.
+
+        Raises:
+            ValueError: The reader, context or timeout handler can't be sent to spawn or forkserver workers.
+        """
+        if self._mp_context is not None:
+            return self._mp_context
+        method = self.settings.start_method
+        if method != "fork":
+            for label, target in (
+                ("reader", self.reader),
+                ("context", self.context),
+                ("timeout_handler", self.timeout_handler),
+            ):
+                if target is None or isinstance(target, str):
+                    continue
+                try:
+                    pickle.dumps(target)
+                except Exception as e:
+                    raise ValueError(
+                        f"[{self.name}] The {label} can't be sent to {method} workers. "
+                        "Use a module level function or a 'module.path:function' string."
+                    ) from e
+        ctx = mp.get_context(method)
+        if method == "forkserver" and self.settings.preload_modules:
+            ctx.set_forkserver_preload(self.settings.preload_modules)
+        self._mp_context = ctx
+        return ctx
+
+    async def _run_loop(self, shutdown_event: mp.synchronize.Event, launch_workers: bool = True) -> None:
         """Per-queue async loop: spawn workers, populate queue, prune dead processes.
 
         Args:
             shutdown_event: Event that signals the loop to exit.
+            launch_workers: Whether to run this queue's own workers. Disabled when a SharedPool reads the queue.
         """
-        ctx = mp.get_context("fork")
-        import_queue: mp.Queue = ctx.Queue(self.settings.max_queue_size)
-        queue_builder = Builder(import_queue, self.settings, self.writer)
-
+        import_queue = self._prepare()
+        metrics = self.metrics
+        queue_builder = Builder(
+            import_queue,
+            self.settings,
+            self.writer,
+            metrics,
+            CursorStore.for_queue(self.settings, self.name, getattr(import_queue, "durable", False)),
+            self.dedup_key,
+        )
+        serve_metrics = metrics is not None and self.settings.metrics_port is not None
+        if serve_metrics:
+            register_endpoint(metrics, self.settings.metrics_host, self.settings.metrics_port)  # type: ignore
+        last_report = time.monotonic()
+        timeline = get_recorder(self.settings.model_dump())
+        started = time.time()
+        broker = None
+        if self.settings.remote_port is not None:
+            broker = QueueBroker(import_queue, self.settings, self.name, metrics)
+            await broker.start()
+        status = None
+        if self.settings.status_dir:
+            status = StatusPublisher(self.settings.status_dir, self.name, self.settings.status_interval)
+
+        self.processes = []
+        watcher = ExitWatcher()
+        supervisor = None
+        publisher = None
+        reload_seen = QueueRunner.reload_generation
         try:
-            processes: List[mp.process.BaseProcess] = []
-            while not shutdown_event.is_set():
-                processes = [x for x in processes if x.is_alive()]
-
-                new_processes = 0
-                while len(processes) < self.settings.num_processes:
-                    process = self.launch_process(import_queue, shutdown_event)
-                    processes.append(process)
-                    process.start()
-                    new_processes += 1
+            if launch_workers:
+                self._replace_workers(import_queue, shutdown_event, watcher, timeline)
+                # Give the first workers a moment to start before filling the queue.
+                spawn_sleep = now()
+                await asyncio.sleep(0.1)
+                if timeline:
+                    timeline.complete("spawn_sleep", self.name, spawn_sleep, now())
+                supervisor = asyncio.create_task(self._supervise(import_queue, shutdown_event, watcher, timeline))
+            if status:
+                publisher = asyncio.create_task(self._publish_status(status, shutdown_event))
 
-                if new_processes:
-                    await asyncio.sleep(0.1)
-
-                if not await queue_builder.populate():
+            while not shutdown_event.is_set():
+                if supervisor and supervisor.done():
+                    # Surface errors from launching workers.
+                    supervisor.result()
+
+                if self._reload_due(reload_seen):
+                    self.reload_pending = False
+                    reload_seen = QueueRunner.reload_generation
+                    if self.reload_settings(queue_builder) and launch_workers:
+                        self._replace_workers(import_queue, shutdown_event, watcher, timeline)
+
+                populating = now()
+                populated = await queue_builder.populate()
+                if timeline:
+                    timeline.complete("populate", self.name, populating, now(), {"populated": populated})
+                self._update_gauges(queue_builder, populated)
+                if self.metrics_callback and time.monotonic() >= last_report + self.settings.metrics_interval:
+                    last_report = time.monotonic()
+                    self._report_metrics()
+
+                if not populated:
                     logger.debug(f"[{self.name}] Queue unable to populate: sleeping scheduler.")
-                    await asyncio.sleep(queue_builder.full_queue_sleep_time())
+                    backoff = now()
+                    await sleep_unless_shutdown(
+                        shutdown_event, queue_builder.full_queue_sleep_time(), lambda: self._reload_due(reload_seen)
+                    )
+                    if timeline:
+                        timeline.complete("backoff", self.name, backoff, now())
                 else:
                     await asyncio.sleep(0.05)
         finally:
             logger.warning(f"[{self.name}] Shutting down all processes.")
+            if supervisor:
+                supervisor.cancel()
+            if publisher:
+                publisher.cancel()
+            watcher.close()
+            if broker:
+                await broker.close()
+            if serve_metrics:
+                unregister_endpoint(metrics, self.settings.metrics_host, self.settings.metrics_port)  # type: ignore
+            if self.metrics_callback:
+                self._report_metrics()
+            if status:
+                status.close()
+            queue_builder.release()
             import_queue.close()
             import_queue.join_thread()
+            self.import_queue = None
+            if timeline:
+                timeline.dump()
+                # Only workers that have exited by now have written their events.
+                merge_traces(timeline.directory, since=started)
             logger.warning(f"[{self.name}] All processes shut down.")
 
     async def main(self) -> None:
@@ -117,8 +318,7 @@ class QueueRunner(object):
 
         Backward-compatible entry point — sets up signals and runs the loop.
         """
-        ctx = mp.get_context("fork")
-        shutdown_event = ctx.Event()
+        shutdown_event = self.mp_context().Event()
         self.setup_signals(shutdown_event)
 
         try:
@@ -126,10 +326,219 @@ class QueueRunner(object):
         finally:
             shutdown_event.set()
 
+    def _reload_due(self, seen: int) -> bool:
+        return self.reload_pending or seen != QueueRunner.reload_generation
+
+    def request_reload(self) -> None:
+        """Reload the settings at the next pass of the queue loop, the same as sending SIGHUP."""
+        self.reload_pending = True
+
+    def reload_settings(self, queue_builder: Builder | None = None) -> bool:
+        """Load fresh settings and apply them to the running queue without restarting its workers.
+
+        Settings in RELOADABLE_SETTINGS (and fields of Settings subclasses) take effect right away: the writer
+        loop uses them from its next populate, running workers get the new `concurrent_tasks_per_process`, and
+        `num_processes` starts new workers or retires the oldest ones once they finish the items they hold.
+        Other worker settings reach workers started after the reload. Changes to any other setting are logged
+        and ignored until the queue restarts.
+
+        Args:
+            queue_builder (Builder | None, optional): The Builder filling the queue. Defaults to None.
+
+        Returns:
+            bool: Whether the settings changed.
+        """
+        if self.settings_loader is None:
+            logger.warning(f"[{self.name}] This queue was given explicit settings and no settings_loader to reload.")
+            return False
+        try:
+            loaded = self.settings_loader()
+        except Exception:
+            logger.exception(f"[{self.name}] Reloading settings failed, keeping the current ones.")
+            return False
+
+        current = self.settings.model_dump()
+        changed = {key for key, value in loaded.model_dump().items() if current.get(key, value) != value}
+        fixed = {key for key in changed if key in Settings.model_fields and key not in RELOADABLE_SETTINGS}
+        if fixed:
+            logger.warning(f"[{self.name}] Restart the queue to change {', '.join(sorted(fixed))}.")
+        if changed == fixed:
+            logger.info(f"[{self.name}] Reloaded settings, nothing to change.")
+            return False
+
+        self.settings = loaded.model_copy(update={key: current[key] for key in fixed})
+        logger.info(f"[{self.name}] Reloaded settings, changed {', '.join(sorted(changed - fixed))}.")
+        if queue_builder is not None:
+            queue_builder.apply_settings(self.settings)
+        if self.metrics:
+            self.metrics.grow(self.settings.num_processes * METRICS_SLOTS_PER_WORKER)
+        if not self.settings.adaptive_concurrency:
+            # Adaptive workers move their own limit, so the setting is only their starting point.
+            for gauge in self.concurrency_gauges.values():
+                gauge.value = self.settings.concurrent_tasks_per_process
+        self._retire_workers()
+        return True
+
+    def _retire_workers(self) -> None:
+        """Ask the oldest workers to exit until no more than num_processes are left."""
+        active = [process for process in self.processes if not self._is_retiring(process)]
+        for process in active[: max(len(active) - self.settings.num_processes, 0)]:
+            logger.info(f"[{self.name}] Retiring {process.name}.")
+            self.retire_flags[process.name].value = 1
+
+    def _is_retiring(self, process: mp.process.BaseProcess) -> bool:
+        flag = self.retire_flags.get(process.name)
+        return flag is not None and bool(flag.value)
+
+    async def _publish_status(self, status: StatusPublisher, shutdown_event: mp.synchronize.Event) -> None:
+        """Publish the status every status_interval, including while the queue loop is backing off."""
+        while not shutdown_event.is_set():
+            if status.due():
+                status.publish(self.status_snapshot())
+            await sleep_unless_shutdown(shutdown_event, status.interval)
+
+    async def _supervise(
+        self, import_queue: QueueBackend, shutdown_event: mp.synchronize.Event, watcher: ExitWatcher, timeline: Any
+    ) -> None:
+        """Replace workers the moment they exit, independently of how long the scheduler is sleeping."""
+        while not shutdown_event.is_set():
+            if await watcher.wait(SHUTDOWN_POLL_INTERVAL) and not shutdown_event.is_set():
+                self._replace_workers(import_queue, shutdown_event, watcher, timeline)
+
+    def _replace_workers(
+        self, import_queue: QueueBackend, shutdown_event: mp.synchronize.Event, watcher: ExitWatcher, timeline: Any
+    ) -> None:
+        """Reap exited workers and launch new ones until the queue has num_processes workers."""
+        for process in self.processes:
+            if not process.is_alive():
+                self._reap(process)
+                if timeline:
+                    timeline.instant("worker_exit", self.name, {"worker": process.name, "exitcode": process.exitcode})
+        self.processes = [x for x in self.processes if x.is_alive()]
+
+        # Retired workers are still finishing their last items, and don't count towards num_processes.
+        active = len([process for process in self.processes if not self._is_retiring(process)])
+        for _ in range(self.settings.num_processes - active):
+            process = self.launch_process(import_queue, shutdown_event)
+            self.processes.append(process)
+            process.start()
+            watcher.watch(process)
+            if timeline and process.pid:
+                timeline.name_process(process.pid, f"{self.name} {process.name}")
+                timeline.instant("spawn", self.name, {"worker": process.name, "pid": process.pid})
+
+        if self.metrics:
+            self.metrics.set("workers", len(self.processes))
+
+    def _reap(self, process: mp.process.BaseProcess) -> None:
+        """Release the shared state held by a worker that has exited."""
+        self.concurrency_gauges.pop(process.name, None)
+        self.worker_started.pop(process.name, None)
+        self.retire_flags.pop(process.name, None)
+        if self.placement:
+            self.placement.release(process.name)
+        if self.metrics:
+            self.metrics.release(self.worker_metrics.pop(process.name, None))
+            self.metrics.inc("worker_exits")
+
+    def _update_gauges(self, queue_builder: Builder, populated: bool) -> None:
+        if not self.metrics:
+            return
+        try:
+            self.metrics.set("queue_depth", queue_builder.queue.qsize())
+        except NotImplementedError:
+            pass
+        self.metrics.set("overflow_depth", len(queue_builder.overflow) if queue_builder.overflow else 0)
+        self.metrics.set("concurrency_limit", sum(self.concurrency_limits().values()))
+        self.metrics.set("backoff_consecutive", queue_builder.full_consecutive)
+        self.metrics.set("backoff_sleep_seconds", 0 if populated else queue_builder.full_queue_sleep_time())
+        self.metrics.set("writer_exhausted", 1 if queue_builder.exhausted else 0)
+
+    def _report_metrics(self) -> None:
+        if not self.metrics_callback:
+            return
+        try:
+            self.metrics_callback(self.metrics_snapshot())
+        except Exception:
+            logger.exception(f"[{self.name}] Metrics callback failed.")
+
+    def profile_workers(self) -> int:
+        """Ask every live worker of this queue to start a profiling window.
+
+        Each worker writes its profile to `profile_dir` once `profile_duration` seconds have passed or
+        `profile_items` items have been dispatched.
+
+        Returns:
+            int: The number of workers signalled.
+        """
+        signalled = 0
+        for process in self.processes:
+            if process.is_alive() and process.pid is not None:
+                try:
+                    os.kill(process.pid, signal.SIGUSR1)
+                    signalled += 1
+                except ProcessLookupError:
+                    pass
+        return signalled
+
+    def metrics_snapshot(self) -> Dict[str, Any]:
+        """Return the current metrics of the queue, aggregated across every worker.
+
+        The snapshot has `counters`, `gauges` and `histograms` sections. Histograms list cumulative
+        bucket counts keyed by their upper bound in seconds.
+        """
+        if not self.metrics:
+            return {"queue": self.name, "counters": {}, "gauges": {}, "histograms": {}}
+        return self.metrics.snapshot()
+
+    def status_snapshot(self) -> Dict[str, Any]:
+        """Return the compact status of the queue and each of its workers that `quasiqueue top` shows."""
+        metrics = self.metrics_snapshot()
+        counters, gauges = metrics["counters"], metrics["gauges"]
+        workers = []
+        for process in self.processes:
+            worker_metrics = self.worker_metrics.get(process.name)
+            gauge = self.concurrency_gauges.get(process.name)
+            workers.append(
+                {
+                    "name": process.name,
+                    "pid": process.pid,
+                    "started": self.worker_started.get(process.name, 0.0),
+                    "jobs": worker_metrics.value("items_processed") if worker_metrics else 0,
+                    "tasks": gauge.value if gauge is not None else 0,
+                }
+            )
+        return {
+            "queue": self.name,
+            "pid": os.getpid(),
+            "depth": gauges.get("queue_depth", 0),
+            "max_queue_size": self.settings.max_queue_size,
+            "items_queued": counters.get("items_queued", 0),
+            "items_processed": counters.get("items_processed", 0),
+            "reader_errors": counters.get("reader_errors", 0),
+            "backoff_consecutive": gauges.get("backoff_consecutive", 0),
+            "backoff_sleep_seconds": gauges.get("backoff_sleep_seconds", 0),
+            "writer_exhausted": bool(gauges.get("writer_exhausted", 0)),
+            "workers": workers,
+        }
+
+    def concurrency_limits(self) -> Dict[str, int]:
+        """Return the current async task limit of each live worker, keyed by process name.
+
+        With `adaptive_concurrency` enabled these move as the workers react to reader latency,
+        otherwise they match `concurrent_tasks_per_process`.
+        """
+        return {name: gauge.value for name, gauge in self.concurrency_gauges.items()}
+
     def launch_process(self, import_queue, shutdown_event) -> mp.process.BaseProcess:
         """Create one worker process with the queue contract it will consume."""
-        ctx = mp.get_context("fork")
-        process = ctx.Process(
+        ctx = self.mp_context()
+        concurrency_gauge = ctx.RawValue("i", self.settings.concurrent_tasks_per_process)
+        retire_flag = ctx.RawValue("b", 0)
+        name = f"worker_{self.worker_launches:03d}"
+        cpus = self.placement.assign(name) if self.placement else None
+        worker_metrics = self.metrics.worker() if self.metrics else None
+        process = ctx.Process(  # type: ignore[attr-defined]
             target=reader_process,
             args=(
                 import_queue,
@@ -137,32 +546,70 @@ class QueueRunner(object):
                 self.reader,
                 self.context,
                 self.settings.model_dump(),
+                self.timeout_handler,
+                self.rate_limiter,
+                concurrency_gauge,
+                worker_metrics,
+                retire_flag,
+                cpus,
             ),
         )
-        process.name = f"worker_{self.worker_launches:03d}"
+        process.name = name
+        self.concurrency_gauges[process.name] = concurrency_gauge
+        self.retire_flags[process.name] = retire_flag
+        self.worker_metrics[process.name] = worker_metrics
+        self.worker_started[process.name] = time.time()
+        if self.metrics:
+            self.metrics.inc("worker_starts")
         self.worker_launches += 1
         logger.debug(f"Launching worker {process.name}")
         process.daemon = True
         return process
 
 
-def run_queues(*runners: QueueRunner) -> None:
+def run_queues(
+    *runners: QueueRunner,
+    pool_processes: int | None = None,
+    pool_tasks_per_process: int | None = None,
+    pool_max_jobs_per_process: int | None = 200,
+) -> None:
     """Run multiple QueueRunner instances in a single event loop.
 
     All runners share a single shutdown event and signal handler. When
     SIGINT or SIGTERM is received, every queue loop exits together.
 
+    By default every runner launches its own `num_processes` workers. When
+    `pool_processes` is set the runners only fill their queues, and a single
+    SharedPool of workers reads from all of them using weighted fair queuing
+    (see the `pool_weight`, `pool_min_share` and `pool_max_share` settings).
+
     Args:
         *runners: Two or more QueueRunner instances to run concurrently.
+        pool_processes: The size of the shared worker pool. Defaults to None, which disables the pool.
+        pool_tasks_per_process: The async task slots each pool worker splits between the queues.
+        pool_max_jobs_per_process: Jobs a pool worker runs before it is replaced.
     """
-    ctx = mp.get_context("fork")
-    shutdown_event = ctx.Event()
+    # Locks made by a fork context can't be handed to spawned workers, but the reverse works, so the shared
+    # shutdown event comes from a spawn or forkserver context whenever any runner uses one.
+    methods = [runner.settings.start_method for runner in runners]
+    method = next((method for method in methods if method != "fork"), "fork")
+    shutdown_event = mp.get_context(method).Event()
 
     runners[0].setup_signals(shutdown_event)
 
     async def _run_all():
         try:
-            await asyncio.gather(*[runner._run_loop(shutdown_event) for runner in runners])
+            if pool_processes:
+                # Queues have to exist before the pool forks its workers.
+                for runner in runners:
+                    runner._prepare(pool_processes)
+                pool = SharedPool(list(runners), pool_processes, pool_tasks_per_process, pool_max_jobs_per_process)
+                await asyncio.gather(
+                    pool._run_loop(shutdown_event),
+                    *[runner._run_loop(shutdown_event, launch_workers=False) for runner in runners],
+                )
+            else:
+                await asyncio.gather(*[runner._run_loop(shutdown_event) for runner in runners])
         finally:
             shutdown_event.set()
 
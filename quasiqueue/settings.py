@@ -1,3 +1,5 @@
+from typing import Any, Dict, List, Literal, Type
+
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -11,6 +13,10 @@ class Settings(BaseSettings):
         default=300,
         description="The time in seconds that an item will be prevented from being readded to the queue.",
     )
+    dedup_hash: bool = Field(
+        default=False,
+        description="Remember a 64 bit hash of each recently queued key instead of the key itself, to save memory.",
+    )
     empty_queue_sleep_time: float = Field(
         default=1.00,
         description="The time in seconds that QuasiQueue will sleep the writer process when it returns no results.",
@@ -31,6 +37,45 @@ class Settings(BaseSettings):
         default=0.01,
         description="The time QuasiQueue will wait for the Queue to be unlocked before throwing an error.",
     )
+    overflow_max_bytes: int = Field(
+        default=0,
+        ge=0,
+        description="The size of a memory mapped file that keeps writer items the queue has no room for. 0 disables it.",
+    )
+    overflow_dir: str | None = Field(
+        default=None,
+        description="The directory of the overflow file. Defaults to the system temp directory.",
+    )
+    queue_backend: str = Field(
+        default="memory",
+        description="Where queued items are kept: `memory`, `sqlite`, or the import path of a QueueBackend subclass.",
+    )
+    queue_path: str | None = Field(
+        default=None,
+        description="The database file of the sqlite queue backend.",
+    )
+    queue_visibility_timeout: float = Field(
+        default=300,
+        gt=0,
+        description="Seconds a durable backend hides a claimed item before delivering it again to another worker.",
+    )
+    queue_max_deliveries: int = Field(
+        default=3,
+        ge=1,
+        description="The number of times a durable backend delivers an item that is never finished before dropping it.",
+    )
+    queue_sqlite_synchronous: Literal["OFF", "NORMAL", "FULL"] = Field(
+        default="NORMAL",
+        description="The SQLite synchronous mode. FULL also survives power loss, NORMAL only process crashes.",
+    )
+    queue_codec: str = Field(
+        default="none",
+        description="How items are serialized on the queue: `none`, `pickle`, `msgpack`, `bytes`, or the import path of a Codec subclass.",
+    )
+    queue_compress_min_bytes: int = Field(
+        default=0,
+        description="Compress encoded items of at least this many bytes with zlib. 0 turns compression off.",
+    )
     graceful_shutdown_timeout: float = Field(
         default=30,
         description="The time in seconds that QuasiQueue will wait for readers to finish when it is asked to gracefully shutdown.",
@@ -39,6 +84,20 @@ class Settings(BaseSettings):
         default=10,
         description="The default desired_items passed to the writer function. This will be adjusted lower depending on queue dynamics.",
     )
+    cursor_dir: str | None = Field(
+        default=None,
+        description="Save writer cursors in this directory to survive restarts. Needs a durable backend and no overflow buffer.",
+    )
+    cursor_save_interval: float = Field(
+        default=1.0,
+        ge=0,
+        description="The most often, in seconds, that changed cursors are written to disk.",
+    )
+    writer_shards: int = Field(
+        default=1,
+        ge=1,
+        description="The number of shards a writer with a `shard` argument is called for concurrently.",
+    )
     max_jobs_per_process: int | None = Field(
         default=200,
         description="The number of jobs a reader process will run before it is replaced by a new process.",
@@ -47,10 +106,159 @@ class Settings(BaseSettings):
         default=4,
         description="The number of async tasks a reader process will run concurrently.",
     )
+    adaptive_concurrency: bool = Field(
+        default=False,
+        description="Adjust the async task limit of each process based on reader latency and errors, starting from concurrent_tasks_per_process.",
+    )
+    adaptive_concurrency_min: int = Field(
+        default=1,
+        description="The lowest task limit adaptive concurrency will use.",
+    )
+    adaptive_concurrency_max: int = Field(
+        default=64,
+        description="The highest task limit adaptive concurrency will use.",
+    )
+    adaptive_latency_target: float = Field(
+        default=1.0,
+        description="Reader latency in seconds above which adaptive concurrency reduces the task limit.",
+    )
+    adaptive_decrease_factor: float = Field(
+        default=0.5,
+        description="The multiplier applied to the task limit when readers are slow or failing.",
+    )
+    pool_weight: float = Field(
+        default=1.0,
+        description="The relative share of a shared worker pool this queue receives when run_queues uses pool_processes.",
+    )
+    pool_min_share: float = Field(
+        default=0.0,
+        description="The fraction of each shared pool worker's task slots this queue is served ahead of its weight.",
+    )
+    pool_max_share: float = Field(
+        default=1.0,
+        description="The largest fraction of each shared pool worker's task slots this queue may hold.",
+    )
+    metrics_port: int | None = Field(
+        default=None,
+        description="Serve Prometheus (/metrics) and JSON (/metrics.json) metrics over HTTP on this port.",
+    )
+    metrics_host: str = Field(
+        default="127.0.0.1",
+        description="The address the metrics endpoint listens on.",
+    )
+    metrics_interval: float = Field(
+        default=10.0,
+        description="The time in seconds between calls to the metrics_callback.",
+    )
+    trace_sample_rate: float = Field(
+        default=0.0,
+        ge=0.0,
+        le=1.0,
+        description="The fraction of items stamped with their enqueue time to measure queue wait and service time.",
+    )
+    remote_port: int | None = Field(
+        default=None,
+        description="Serve the queue over TCP on this port to `quasiqueue worker` nodes on other hosts.",
+    )
+    remote_host: str = Field(
+        default="127.0.0.1",
+        description="The address the remote worker broker listens on.",
+    )
+    remote_authkey: str = Field(
+        default="",
+        description="The shared secret the broker and remote worker nodes use to authenticate each other. Required to use either.",
+    )
+    remote_batch_size: int = Field(
+        default=50,
+        gt=0,
+        description="The most items the broker sends to a remote worker node in one message.",
+    )
+    status_dir: str | None = Field(
+        default=None,
+        description="Publish a status snapshot of the queue into this directory for `quasiqueue top`.",
+    )
+    status_interval: float = Field(
+        default=1.0,
+        gt=0,
+        description="The time in seconds between status snapshots.",
+    )
+    start_method: Literal["fork", "spawn", "forkserver"] = Field(
+        default="fork",
+        description="How worker processes are started. Spawn and forkserver need readers that can be imported by the worker.",
+    )
+    preload_modules: List[str] = Field(
+        default=[],
+        description="Modules imported by the forkserver before it starts workers, or by spawned workers before they load the reader.",
+    )
+    cpu_affinity: str | None = Field(
+        default=None,
+        description="The CPUs the workers of the queue run on, as a Linux CPU list such as `0-7,16-23`. Defaults to the CPUs of the main process.",
+    )
+    cpu_pinning: Literal["none", "cpu", "numa"] = Field(
+        default="none",
+        description="Spread workers over the CPUs: `none` gives each the whole set, `cpu` pins each to one CPU and `numa` to the CPUs of one NUMA node.",
+    )
+    worker_nice: int | None = Field(
+        default=None,
+        ge=-20,
+        le=19,
+        description="The nice level of the worker processes. Defaults to the nice level of the main process.",
+    )
+    profile_mode: Literal["cprofile", "tracemalloc"] = Field(
+        default="cprofile",
+        description="The profiler workers run when asked to profile with SIGUSR1 or profile_on_start.",
+    )
+    profile_duration: float = Field(
+        default=30.0,
+        description="The time in seconds a worker profiling window lasts.",
+    )
+    profile_items: int | None = Field(
+        default=None,
+        description="End a worker profiling window early once this many items have been dispatched.",
+    )
+    profile_dir: str | None = Field(
+        default=None,
+        description="The directory worker profiles are written to. Defaults to the system temp directory.",
+    )
+    profile_on_start: bool = Field(
+        default=False,
+        description="Profile every worker as soon as it starts.",
+    )
+    timeline_dir: str | None = Field(
+        default=None,
+        description="Record a Chrome trace timeline of the scheduler and every worker into this directory.",
+    )
+    timeline_buffer_size: int = Field(
+        default=100000,
+        gt=0,
+        description="The number of timeline events each process keeps. Older events are dropped once it fills up.",
+    )
+    reader_timeout: float | None = Field(
+        default=None,
+        description="The time in seconds a reader may spend on a single item. Async readers are cancelled, sync readers have their process replaced.",
+    )
+    rate_limit: float | None = Field(
+        default=None,
+        description="The max number of items per second dispatched to readers across all processes of the queue.",
+    )
+    rate_limit_burst: int = Field(
+        default=1,
+        description="The number of items that can be dispatched back to back when the queue has been under its rate_limit.",
+    )
+
+
+def get_named_settings(
+    name: str, settings_class: Type[Settings] = Settings, overrides: Dict[str, Any] | None = None
+) -> Settings:
+    """Load settings from the `QUASIQUEUE_{NAME}_` environment variables of a queue.
 
+    Args:
+        name (str): The queue name used in the environment variable prefix.
+        settings_class (Type[Settings], optional): A Settings subclass with extra fields. Defaults to Settings.
+        overrides (Dict[str, Any] | None, optional): Values that take priority over the environment. Defaults to None.
+    """
 
-def get_named_settings(name: str) -> Settings:
-    class QueueSettings(Settings):
+    class QueueSettings(settings_class):  # type: ignore[valid-type,misc]
         model_config = SettingsConfigDict(env_prefix=f"QUASIQUEUE_{name.upper()}_")
 
-    return QueueSettings()
+    return QueueSettings(**(overrides or {}))
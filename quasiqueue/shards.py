@@ -0,0 +1,126 @@
+import asyncio
+import inspect
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Sequence
+
+
+def is_sync_writer(writer: Callable[..., Any]) -> bool:
+    """Whether a writer is a plain generator function, or an object whose `__call__` is one."""
+    return inspect.isgeneratorfunction(writer) or inspect.isgeneratorfunction(getattr(writer, "__call__", None))
+
+
+def _next_chunk(iterator: Iterator[Any], size: int) -> List[Any]:
+    return list(islice(iterator, size))
+
+
+async def iterate_in_thread(
+    start: Callable[[], Iterable[Any]], executor: ThreadPoolExecutor, chunk_size: int
+) -> AsyncIterator[Any]:
+    """Run a blocking iterable in a thread, handing its items to the event loop a chunk at a time.
+
+    The loop keeps running while the thread waits on a slow query, and the items of a chunk cost a single
+    hop between threads.
+    """
+    loop = asyncio.get_running_loop()
+    iterator: Iterator[Any] = await loop.run_in_executor(executor, lambda: iter(start()))
+    try:
+        while True:
+            chunk = await loop.run_in_executor(executor, _next_chunk, iterator, chunk_size)
+            for item in chunk:
+                yield item
+            if len(chunk) < chunk_size:
+                return
+    finally:
+        close = getattr(iterator, "close", None)
+        if close:
+            # Generators have to be closed by the thread running them, and the loop doesn't wait for it.
+            try:
+                executor.submit(close)
+            except RuntimeError:
+                # The queue has shut down and the thread is gone.
+                pass
+
+
+class WriterShard:
+    """One writer, or one shard of a sharded writer, with its own exhaustion and backoff state.
+
+    A shard that returns nothing sits out of the next populates until its backoff passes, while the other
+    shards keep filling the queue.
+    """
+
+    def __init__(self, writer: Callable[..., Any], index: int, settings: Any) -> None:
+        self.writer = writer
+        self.index = index
+        self.settings = settings
+        self.args = inspect.getfullargspec(writer).args
+        self.executor: ThreadPoolExecutor | None = None
+        if is_sync_writer(writer):
+            # One thread per shard, so drivers that tie connections to the thread that made them keep working.
+            self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"quasiqueue-writer-{index}")
+        self.empty_count = 0
+        self.exhausted = False
+        self.retry_at = 0.0
+
+    @property
+    def key(self) -> str:
+        """The name the shard's cursor is saved under."""
+        return str(self.index)
+
+    def __call__(self, desired: int, cursor: Any = None) -> Any:
+        """Start the writer, passing only the arguments it asks for. Sync generators run in the shard's thread."""
+        kw_args: Dict[str, Any] = {}
+        if "settings" in self.args:
+            kw_args["settings"] = self.settings
+        if "desired" in self.args:
+            kw_args["desired"] = desired
+        if "shard" in self.args:
+            kw_args["shard"] = self.index
+        if "cursor" in self.args:
+            kw_args["cursor"] = cursor
+        if self.executor:
+            return iterate_in_thread(lambda: self.writer(**kw_args), self.executor, max(desired, 1))
+        return self.writer(**kw_args)
+
+    def close(self) -> None:
+        """Stop the writer thread without waiting for a query that is still running."""
+        if self.executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def ready(self) -> bool:
+        return time.monotonic() >= self.retry_at
+
+    def record(self, yielded: int) -> None:
+        """Update the backoff state after a call that yielded this many items."""
+        if yielded:
+            self.empty_count = 0
+            self.exhausted = False
+            self.retry_at = 0.0
+            return
+        self.empty_count += 1
+        if self.empty_count >= self.settings.empty_queue_sleep_time:
+            self.exhausted = True
+        self.retry_at = time.monotonic() + self.backoff()
+
+    def backoff(self) -> float:
+        if not self.empty_count:
+            return 0.0
+        return min(
+            self.settings.full_queue_sleep_min * (2 ** min(self.empty_count - 1, 64)),
+            self.settings.full_queue_sleep_max,
+        )
+
+
+def build_shards(writers: Callable[..., Any] | Sequence[Callable[..., Any]], settings: Any) -> List[WriterShard]:
+    """Turn the writer argument of a queue into shards.
+
+    A list of writers gives one shard each. A single writer that takes a `shard` argument is called
+    `writer_shards` times with the shard numbers 0 up to `writer_shards - 1`.
+    """
+    if callable(writers):
+        writer = writers
+        if "shard" in inspect.getfullargspec(writer).args:
+            return [WriterShard(writer, index, settings) for index in range(settings.writer_shards)]
+        return [WriterShard(writer, 0, settings)]
+    return [WriterShard(writer, index, settings) for index, writer in enumerate(writers)]
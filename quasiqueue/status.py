@@ -0,0 +1,110 @@
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+# Every queue writes its own file into the status directory, so several parents can share one directory.
+STATUS_SUFFIX = ".status.json"
+
+# A status file that hasn't been rewritten for this many intervals belongs to a parent that stopped or hung.
+STALE_INTERVALS = 5
+
+
+class StatusPublisher:
+    """Publish a small status snapshot of a queue to a file that `quasiqueue top` reads.
+
+    The file is rewritten every `status_interval` seconds by renaming a temporary file over it, so readers
+    never see a partial write and the queue never waits on them.
+    """
+
+    def __init__(self, directory: str | Path, name: str, interval: float) -> None:
+        self.path = Path(directory) / f"{name}{STATUS_SUFFIX}"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.interval = interval
+        self.last_publish = 0.0
+        self.last_counters: Dict[str, float] = {}
+
+    def due(self) -> bool:
+        return time.monotonic() >= self.last_publish + self.interval
+
+    def publish(self, status: Dict[str, Any]) -> None:
+        """Write a status snapshot, adding per second rates of the counters since the previous one."""
+        published = time.monotonic()
+        elapsed = published - self.last_publish
+        counters = {key: status[key] for key in ("items_queued", "items_processed")}
+        for key, value in counters.items():
+            previous = self.last_counters.get(key)
+            status[f"{key}_per_sec"] = (value - previous) / elapsed if previous is not None else None
+        self.last_publish = published
+        self.last_counters = counters
+
+        status["time"] = time.time()
+        status["interval"] = self.interval
+        temporary = self.path.with_name(f".{self.path.name}.{os.getpid()}")
+        temporary.write_text(json.dumps(status))
+        temporary.replace(self.path)
+
+    def close(self) -> None:
+        """Remove the status file once the queue has shut down."""
+        self.path.unlink(missing_ok=True)
+
+
+def read_status(directory: str | Path) -> List[Dict[str, Any]]:
+    """Load the status of every queue publishing into a directory."""
+    statuses = []
+    for path in sorted(Path(directory).glob(f"*{STATUS_SUFFIX}")):
+        try:
+            statuses.append(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            # The queue removed its file while shutting down.
+            continue
+    return statuses
+
+
+def _rate(value: float | None) -> str:
+    return "-" if value is None else f"{value:.1f}"
+
+
+def _duration(seconds: float) -> str:
+    if seconds < 60:
+        return f"{seconds:.0f}s"
+    if seconds < 3600:
+        return f"{seconds // 60:.0f}m{seconds % 60:02.0f}s"
+    return f"{seconds // 3600:.0f}h{seconds % 3600 // 60:02.0f}m"
+
+
+def render_status(statuses: List[Dict[str, Any]], workers: bool = True) -> str:
+    """Render queue statuses as the text table shown by `quasiqueue top`."""
+    if not statuses:
+        return "No queues are publishing status."
+    current = time.time()
+    lines = [
+        f"{'QUEUE':20} {'PID':>7} {'DEPTH':>11} {'QUEUED/S':>9} {'DONE/S':>9} {'DONE':>9} {'ERRORS':>7} "
+        f"{'WORKERS':>7} {'BACKOFF':>9} STATE"
+    ]
+    for status in statuses:
+        state = []
+        if current - status["time"] > status["interval"] * STALE_INTERVALS:
+            state.append(f"stale {_duration(current - status['time'])}")
+        if status["writer_exhausted"]:
+            state.append("writer exhausted")
+        if status["backoff_consecutive"]:
+            state.append(f"backoff x{status['backoff_consecutive']:.0f}")
+        depth = f"{status['depth']:.0f}/{status['max_queue_size']}"
+        lines.append(
+            f"{status['queue'][:20]:20} {status['pid']:>7} {depth:>11} {_rate(status['items_queued_per_sec']):>9} "
+            f"{_rate(status['items_processed_per_sec']):>9} {status['items_processed']:>9.0f} "
+            f"{status['reader_errors']:>7.0f} {len(status['workers']):>7} {status['backoff_sleep_seconds']:>8.1f}s "
+            f"{', '.join(state) or 'ok'}"
+        )
+    if workers:
+        lines.append("")
+        lines.append(f"{'QUEUE':20} {'WORKER':12} {'PID':>7} {'AGE':>8} {'JOBS':>7} {'TASKS':>5}")
+        for status in statuses:
+            for worker in status["workers"]:
+                lines.append(
+                    f"{status['queue'][:20]:20} {worker['name']:12} {worker['pid'] or '-':>7} "
+                    f"{_duration(current - worker['started']):>8} {worker['jobs']:>7.0f} {worker['tasks']:>5}"
+                )
+    return "\n".join(lines)
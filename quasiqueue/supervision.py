@@ -0,0 +1,89 @@
+import asyncio
+import multiprocessing as mp
+import time
+from multiprocessing.connection import wait
+from multiprocessing.synchronize import Event
+from typing import Callable, Dict, List
+
+# How often supervisors and long sleeps check the shutdown event, since a multiprocessing Event can't be awaited.
+SHUTDOWN_POLL_INTERVAL = 0.1
+
+
+class ExitWatcher:
+    """Wake the event loop as soon as a watched worker process exits.
+
+    Every process has a sentinel file descriptor that becomes readable when it exits, so the event loop
+    can watch them directly instead of polling `is_alive()`.
+    """
+
+    def __init__(self) -> None:
+        self.loop = asyncio.get_running_loop()
+        self.exited = asyncio.Event()
+        self.sentinels: Dict[int, mp.process.BaseProcess] = {}
+        self.finished: List[mp.process.BaseProcess] = []
+
+    def watch(self, process: mp.process.BaseProcess) -> None:
+        """Start watching a process. It must have been started already."""
+        self.sentinels[process.sentinel] = process
+        self.loop.add_reader(process.sentinel, self._on_exit, process.sentinel)
+
+    def _on_exit(self, sentinel: int) -> None:
+        self.loop.remove_reader(sentinel)
+        process = self.sentinels.pop(sentinel, None)
+        if process is not None:
+            self.finished.append(process)
+        self.exited.set()
+
+    async def wait(self, timeout: float) -> List[mp.process.BaseProcess]:
+        """Wait until a watched process exits or the timeout passes.
+
+        The sentinel closes a moment before the exited process can be reaped, so the processes are joined
+        before they are returned. Otherwise `is_alive()` could still report them as running.
+
+        Returns:
+            List[mp.process.BaseProcess]: The processes that exited.
+        """
+        try:
+            await asyncio.wait_for(self.exited.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        self.exited.clear()
+        finished, self.finished = self.finished, []
+        for process in finished:
+            process.join()
+        return finished
+
+    def close(self) -> None:
+        """Stop watching every process."""
+        for sentinel in self.sentinels:
+            self.loop.remove_reader(sentinel)
+        self.sentinels.clear()
+
+
+async def sleep_unless_shutdown(shutdown_event: Event, seconds: float, wake: Callable[[], bool] | None = None) -> None:
+    """Sleep for the given time, returning early if the shutdown event is set or `wake` returns True.
+
+    Long sleeps, such as backoff after failing to populate the queue, would otherwise hold up shutdown.
+    """
+    deadline = time.monotonic() + seconds
+    while not shutdown_event.is_set():
+        if wake and wake():
+            return
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        await asyncio.sleep(min(remaining, SHUTDOWN_POLL_INTERVAL))
+
+
+def wait_for_children(timeout: float) -> None:
+    """Block until every child process has exited, or the timeout passes.
+
+    This waits on the process sentinels so it returns the moment the last child exits.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        children = mp.active_children()
+        remaining = deadline - time.monotonic()
+        if not children or remaining <= 0:
+            return
+        wait([child.sentinel for child in children], remaining)
@@ -0,0 +1,147 @@
+import json
+import multiprocessing as mp
+import os
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Tuple
+
+# The merged trace of every process, written next to the per-process files.
+MERGED_TRACE = "timeline.json"
+
+_recorder: "EventRecorder | None" = None
+
+
+def now() -> int:
+    """The current time in microseconds, the unit of Chrome trace timestamps.
+
+    The monotonic clock is shared by every process on the machine, so the parent and its workers line up.
+    """
+    return time.monotonic_ns() // 1000
+
+
+class EventRecorder:
+    """Record spans and instant events of one process into a ring buffer.
+
+    Events are stored as plain tuples and only turned into Chrome trace JSON when the buffer is dumped,
+    so recording stays cheap enough to leave on in the worker loop. Once the buffer is full the oldest
+    events are dropped.
+    """
+
+    def __init__(self, directory: str | Path, capacity: int = 100000) -> None:
+        self.directory = Path(directory)
+        self.pid = os.getpid()
+        self.events: Deque[Tuple[str, str, int, int, int, Dict[str, Any] | None]] = deque(maxlen=capacity)
+        self.threads: Dict[str, int] = {}
+        self.process_names: Dict[int, str] = {self.pid: mp.current_process().name}
+        self.free_lanes: List[int] = []
+        self.lanes = 0
+
+    def thread(self, name: str) -> int:
+        """Return the trace thread id used for a named row of the timeline."""
+        if name not in self.threads:
+            self.threads[name] = len(self.threads)
+        return self.threads[name]
+
+    def complete(self, name: str, thread: str, start: int, end: int, args: Dict[str, Any] | None = None) -> None:
+        """Record a span that started and ended at the given `now()` timestamps."""
+        self.events.append(("X", name, self.thread(thread), start, end - start, args))
+
+    def instant(self, name: str, thread: str, args: Dict[str, Any] | None = None) -> None:
+        self.events.append(("i", name, self.thread(thread), now(), 0, args))
+
+    def name_process(self, pid: int, name: str) -> None:
+        """Label another process, such as a worker this process launched."""
+        self.process_names[pid] = name
+
+    def acquire_lane(self) -> str:
+        """Reserve a timeline row for an async task so concurrent tasks don't overlap on one row."""
+        lane = self.free_lanes.pop() if self.free_lanes else self.lanes
+        if lane == self.lanes:
+            self.lanes += 1
+        return f"task {lane}"
+
+    def release_lane(self, lane: str) -> None:
+        self.free_lanes.append(int(lane.split(" ")[1]))
+        # Hand out the lowest free rows first to keep the timeline compact.
+        self.free_lanes.sort(reverse=True)
+
+    def to_chrome(self) -> List[Dict[str, Any]]:
+        trace: List[Dict[str, Any]] = []
+        for pid, name in self.process_names.items():
+            trace.append({"ph": "M", "name": "process_name", "pid": pid, "tid": 0, "args": {"name": name}})
+        for name, tid in self.threads.items():
+            trace.append({"ph": "M", "name": "thread_name", "pid": self.pid, "tid": tid, "args": {"name": name}})
+        for phase, name, tid, ts, duration, args in self.events:
+            event: Dict[str, Any] = {"ph": phase, "name": name, "pid": self.pid, "tid": tid, "ts": ts}
+            if phase == "X":
+                event["dur"] = duration
+            else:
+                event["s"] = "t"
+            if args:
+                event["args"] = args
+            trace.append(event)
+        return trace
+
+    def dump(self) -> Path:
+        """Write the buffered events to `<pid>.trace.json` in the timeline directory."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"{self.pid}.trace.json"
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"traceEvents": self.to_chrome()}, f)
+        os.replace(tmp_path, path)
+        return path
+
+
+def get_recorder(settings: Dict[str, Any]) -> EventRecorder | None:
+    """Return the event recorder of the current process, or None when `timeline_dir` isn't set.
+
+    Every process gets its own recorder. A forked worker starts with an empty buffer rather than the one
+    it inherited from its parent.
+    """
+    global _recorder
+    if not settings.get("timeline_dir"):
+        return None
+    if _recorder is None or _recorder.pid != os.getpid():
+        _recorder = EventRecorder(settings["timeline_dir"], settings.get("timeline_buffer_size", 100000))
+    return _recorder
+
+
+def merge_traces(directory: str | Path, since: float = 0) -> Path:
+    """Combine the per-process trace files of a directory into a single Chrome trace.
+
+    The result can be opened with `chrome://tracing` or https://ui.perfetto.dev.
+
+    Args:
+        directory (str | Path): The `timeline_dir` the processes wrote to.
+        since (float, optional): Skip files last written before this Unix timestamp, such as ones left by
+            an earlier run. Defaults to 0.
+
+    Returns:
+        Path: The path of the merged trace.
+    """
+    directory = Path(directory)
+    events: List[Dict[str, Any]] = []
+    process_names: Dict[int, str] = {}
+    for path in sorted(directory.glob("*.trace.json")):
+        if path.stat().st_mtime < since:
+            continue
+        own_pid = int(path.name.split(".")[0])
+        with open(path) as f:
+            for event in json.load(f)["traceEvents"]:
+                if event["ph"] == "M" and event["name"] == "process_name":
+                    # The label a parent gives its workers wins over the worker's own process name.
+                    if event["pid"] != own_pid:
+                        process_names[event["pid"]] = event["args"]["name"]
+                    else:
+                        process_names.setdefault(own_pid, event["args"]["name"])
+                else:
+                    events.append(event)
+
+    for pid, name in process_names.items():
+        events.append({"ph": "M", "name": "process_name", "pid": pid, "tid": 0, "args": {"name": name}})
+    output = directory / MERGED_TRACE
+    with open(output, "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+    return output
@@ -0,0 +1,26 @@
+from typing import Any, Tuple
+
+
+class TracedItem:
+    """An item stamped with the time it was put on the queue.
+
+    The Builder wraps a sample of items in this envelope when `trace_sample_rate` is set, and
+    workers unwrap them before calling the reader, so readers always see the original item.
+    """
+
+    __slots__ = ("item", "enqueued")
+
+    def __init__(self, item: Any, enqueued: float) -> None:
+        self.item = item
+        self.enqueued = enqueued
+
+    def __reduce__(self):
+        # Plain tuples keep the pickled envelope small.
+        return (TracedItem, (self.item, self.enqueued))
+
+
+def unwrap(item: Any) -> Tuple[Any, float | None]:
+    """Return the original item and its enqueue time, or None if the item wasn't traced."""
+    if type(item) is TracedItem:
+        return item.item, item.enqueued
+    return item, None
@@ -0,0 +1,379 @@
+import heapq
+import itertools
+import json
+import math
+import random
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, List, Tuple
+
+from .settings import Settings
+
+# Timings hard coded in QueueRunner._run_loop and reader_runner that the simulation has to match.
+POPULATE_SLEEP = 0.05
+SPAWN_SLEEP = 0.1
+POPULATE_MAX = 50
+SLOT_POLL = 0.01
+
+# The settings the tuner sweeps by default.
+DEFAULT_GRID: Dict[str, List[Any]] = {
+    "max_queue_size": [100, 300, 1000],
+    "lookup_block_size": [10, 25, 50],
+    "full_queue_sleep": [(0.05, 1.0), (0.25, 5.0), (1.0, 90.0)],
+    "empty_queue_sleep_time": [0.05, 0.25, 1.0],
+    "concurrent_tasks_per_process": [1, 4, 16, 64],
+}
+
+
+class Distribution:
+    """A latency distribution the simulator draws reader and writer timings from.
+
+    Distributions are declared as strings so they can be passed on the command line:
+
+    - `0.01` or `const:0.01`: always the same latency.
+    - `exp:0.05`: exponentially distributed with the given mean.
+    - `uniform:0.01,0.1`: uniformly distributed between two bounds.
+    - `lognormal:0.05,0.5`: log-normally distributed with the given median and sigma.
+    - `file:latencies.txt`: measured samples, one per line in seconds.
+    - `histogram:metrics.json`: a histogram from `metrics_snapshot()` or the `/metrics.json` endpoint.
+    """
+
+    def __init__(self, spec: str, sampler: Callable[[random.Random], float]) -> None:
+        self.spec = spec
+        self.sampler = sampler
+
+    def __repr__(self) -> str:
+        return f"Distribution({self.spec!r})"
+
+    def sample(self, rng: random.Random) -> float:
+        return max(0.0, self.sampler(rng))
+
+    @classmethod
+    def parse(cls, spec: str, histogram: str = "reader_latency") -> "Distribution":
+        """Build a distribution from its string form.
+
+        Args:
+            spec (str): The distribution, such as `exp:0.05`.
+            histogram (str, optional): The histogram to read from a metrics snapshot. Defaults to "reader_latency".
+        """
+        kind, _, value = spec.partition(":")
+        if not value:
+            kind, value = "const", spec
+
+        if kind == "const":
+            latency = float(value)
+            return cls(spec, lambda rng: latency)
+        if kind == "exp":
+            mean = float(value)
+            return cls(spec, lambda rng: rng.expovariate(1 / mean) if mean > 0 else 0.0)
+        if kind == "uniform":
+            low, high = (float(x) for x in value.split(","))
+            return cls(spec, lambda rng: rng.uniform(low, high))
+        if kind == "lognormal":
+            median, sigma = (float(x) for x in value.split(","))
+            return cls(spec, lambda rng: rng.lognormvariate(math.log(median), sigma))
+        if kind == "file":
+            with open(value) as f:
+                samples = [float(line) for line in f if line.strip()]
+            if not samples:
+                raise ValueError(f"No latency samples in {value}.")
+            return cls(spec, lambda rng: rng.choice(samples))
+        if kind == "histogram":
+            with open(value) as f:
+                snapshot = json.load(f)
+            if isinstance(snapshot, list):
+                snapshot = snapshot[0]
+            return cls(spec, _histogram_sampler(snapshot["histograms"][histogram]["buckets"]))
+        raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+def _histogram_sampler(buckets: List[Tuple[Any, int]]) -> Callable[[random.Random], float]:
+    ranges = []
+    weights = []
+    lower = 0.0
+    previous = 0
+    for bound, cumulative in buckets:
+        # The overflow bucket has no upper bound, so assume it is no wider than the one before it.
+        upper = lower * 2 if bound == "+Inf" else float(bound)
+        if cumulative > previous:
+            ranges.append((lower, upper))
+            weights.append(cumulative - previous)
+        lower, previous = upper, cumulative
+    if not ranges:
+        raise ValueError("The histogram has no observations.")
+
+    def sample(rng: random.Random) -> float:
+        low, high = rng.choices(ranges, weights)[0]
+        return rng.uniform(low, high)
+
+    return sample
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class _Worker:
+    def __init__(self) -> None:
+        self.in_flight = 0
+        self.jobs = 0
+        self.token = 0
+        self.held: float | None = None
+        self.recycling = False
+
+
+class Simulator:
+    """A discrete event model of a single queue: the `Builder.populate` policy in the parent and the
+    `reader_runner` loop in each worker.
+
+    The model follows the real loops closely, including the 30% refill threshold and 80% fill target,
+    the 50 item cap per populate call, the fixed parent sleeps, exponential backoff, the empty queue sleep
+    in workers and the way async workers take an item off of the queue before waiting for a free task slot.
+    It ignores the cost of pickling items and of the queue itself, so treat the results as an upper bound.
+    """
+
+    def __init__(
+        self,
+        settings: Settings,
+        reader_latency: Distribution,
+        writer_latency: Distribution,
+        is_async: bool = True,
+        arrival_rate: float | None = None,
+        duration: float = 30.0,
+        seed: int = 0,
+    ) -> None:
+        """
+        Args:
+            settings (Settings): The queue settings to simulate.
+            reader_latency (Distribution): Time the reader spends on each item.
+            writer_latency (Distribution): Time each writer call takes.
+            is_async (bool, optional): Whether the reader is async. Defaults to True.
+            arrival_rate (float | None, optional): New items per second available to the writer. Defaults to None,
+                a backlog the writer never runs out of.
+            duration (float, optional): Simulated seconds. The first 10% is treated as warm up. Defaults to 30.0.
+            seed (int, optional): Seed for the latency samples so runs are repeatable. Defaults to 0.
+        """
+        self.settings = settings
+        self.reader_latency = reader_latency
+        self.writer_latency = writer_latency
+        self.is_async = is_async
+        self.arrival_rate = arrival_rate
+        self.duration = duration
+        self.seed = seed
+
+    def run(self) -> Dict[str, Any]:
+        """Simulate the queue and return its throughput, latency percentiles and queue depth."""
+        settings = self.settings
+        rng = random.Random(self.seed)
+        events: List[Tuple[float, int, Callable[..., None], Tuple[Any, ...]]] = []
+        sequence = itertools.count()
+        queue: Deque[float] = deque()
+        waiters: Deque[_Worker] = deque()
+        limit = settings.concurrent_tasks_per_process if self.is_async else 1
+        warm_up = self.duration * 0.1
+        state: Dict[str, Any] = {
+            "now": 0.0,
+            "written": 0,
+            "full_consecutive": 0,
+            "max_depth": 0,
+            "writer_calls": 0,
+            "backoffs": 0,
+        }
+        latencies: List[float] = []
+
+        def schedule(delay: float, callback: Callable[..., None], *args: Any) -> None:
+            heapq.heappush(events, (state["now"] + delay, next(sequence), callback, args))
+
+        def backoff() -> float:
+            if state["full_consecutive"] == 0:
+                return settings.full_queue_sleep_min
+            return min(
+                settings.full_queue_sleep_min * (2 ** min(state["full_consecutive"] - 1, 64)),
+                settings.full_queue_sleep_max,
+            )
+
+        def populate() -> None:
+            size = len(queue)
+            if size >= settings.max_queue_size * 0.3:
+                state["full_consecutive"] = 0
+                schedule(POPULATE_SLEEP, populate)
+                return
+            count = min(int(settings.max_queue_size * 0.8) - size, POPULATE_MAX)
+            if count <= 0:
+                state["full_consecutive"] += 1
+                state["backoffs"] += 1
+                schedule(backoff(), populate)
+                return
+            wanted = min(settings.lookup_block_size, count)
+            if self.arrival_rate is not None:
+                wanted = min(wanted, int(self.arrival_rate * state["now"]) - state["written"])
+            state["writer_calls"] += 1
+            schedule(self.writer_latency.sample(rng), written, max(wanted, 0))
+
+        def written(count: int) -> None:
+            state["written"] += count
+            for _ in range(count):
+                queue.append(state["now"])
+            state["max_depth"] = max(state["max_depth"], len(queue))
+            while waiters and queue:
+                worker = waiters.popleft()
+                worker.token += 1
+                take(worker, queue.popleft())
+            if count:
+                state["full_consecutive"] = 0
+                schedule(POPULATE_SLEEP, populate)
+            else:
+                state["full_consecutive"] += 1
+                state["backoffs"] += 1
+                schedule(backoff(), populate)
+
+        def get(worker: _Worker) -> None:
+            if queue:
+                take(worker, queue.popleft())
+                return
+            # Block on the queue for queue_interaction_timeout, then sleep before trying again.
+            worker.token += 1
+            waiters.append(worker)
+            schedule(settings.queue_interaction_timeout, empty, worker, worker.token)
+
+        def empty(worker: _Worker, token: int) -> None:
+            if worker.token != token:
+                return
+            waiters.remove(worker)
+            schedule(settings.empty_queue_sleep_time, get, worker)
+
+        def take(worker: _Worker, enqueued: float) -> None:
+            worker.jobs += 1
+            if worker.in_flight < limit:
+                start(worker, enqueued)
+            else:
+                # Async workers hold the item while polling for a free task slot.
+                worker.held = enqueued
+
+        def start(worker: _Worker, enqueued: float) -> None:
+            worker.in_flight += 1
+            schedule(self.reader_latency.sample(rng), finish, worker, enqueued)
+            if settings.max_jobs_per_process and worker.jobs >= settings.max_jobs_per_process:
+                worker.recycling = True
+            elif self.is_async:
+                schedule(0, get, worker)
+
+        def finish(worker: _Worker, enqueued: float) -> None:
+            worker.in_flight -= 1
+            if state["now"] >= warm_up:
+                latencies.append(state["now"] - enqueued)
+            if worker.recycling:
+                if worker.in_flight == 0:
+                    # The parent notices the exit on its next loop and pauses after starting the replacement.
+                    schedule(POPULATE_SLEEP / 2 + SPAWN_SLEEP, restart, worker)
+            elif worker.held is not None:
+                held, worker.held = worker.held, None
+                schedule(SLOT_POLL / 2, start, worker, held)
+            elif not self.is_async:
+                get(worker)
+
+        def restart(worker: _Worker) -> None:
+            worker.jobs = 0
+            worker.recycling = False
+            get(worker)
+
+        for _ in range(settings.num_processes):
+            schedule(0, get, _Worker())
+        schedule(SPAWN_SLEEP, populate)
+
+        while events:
+            at, _, callback, args = heapq.heappop(events)
+            if at > self.duration:
+                break
+            state["now"] = at
+            callback(*args)
+
+        measured = self.duration - warm_up
+        return {
+            "throughput": len(latencies) / measured,
+            "latency_p50": percentile(latencies, 0.5),
+            "latency_p99": percentile(latencies, 0.99),
+            "max_queue_depth": state["max_depth"],
+            "writer_calls_per_sec": state["writer_calls"] / self.duration,
+            "backoffs_per_sec": state["backoffs"] / self.duration,
+        }
+
+
+def settings_grid(base: Settings, grid: Dict[str, List[Any]]) -> Iterable[Settings]:
+    """Yield a copy of the base settings for every combination of values in the grid.
+
+    The `full_queue_sleep` key takes `(min, max)` pairs that set `full_queue_sleep_min` and `full_queue_sleep_max`.
+    """
+    keys = list(grid)
+    for values in itertools.product(*grid.values()):
+        update: Dict[str, Any] = {}
+        for key, value in zip(keys, values):
+            if key == "full_queue_sleep":
+                update["full_queue_sleep_min"], update["full_queue_sleep_max"] = value
+            else:
+                update[key] = value
+        yield base.model_copy(update=update)
+
+
+def tune(
+    reader_latency: Distribution,
+    writer_latency: Distribution,
+    base: Settings | None = None,
+    grid: Dict[str, List[Any]] | None = None,
+    is_async: bool = True,
+    arrival_rate: float | None = None,
+    item_bytes: int = 1024,
+    max_memory_mb: float | None = None,
+    max_latency_p99: float | None = None,
+    duration: float = 30.0,
+) -> List[Dict[str, Any]]:
+    """Simulate every combination of settings in the grid and rank the ones that fit the limits.
+
+    Args:
+        reader_latency (Distribution): Time the reader spends on each item.
+        writer_latency (Distribution): Time each writer call takes.
+        base (Settings | None, optional): Settings for everything the grid doesn't sweep. Defaults to None.
+        grid (Dict[str, List[Any]] | None, optional): The values to sweep. Defaults to DEFAULT_GRID.
+        is_async (bool, optional): Whether the reader is async. Sync readers skip `concurrent_tasks_per_process`.
+        arrival_rate (float | None, optional): New items per second available to the writer. Defaults to None.
+        item_bytes (int, optional): The pickled size of an item, used for the memory limit. Defaults to 1024.
+        max_memory_mb (float | None, optional): The most memory a full queue may use. Defaults to None.
+        max_latency_p99 (float | None, optional): The highest acceptable p99 latency in seconds. Defaults to None.
+        duration (float, optional): Simulated seconds per configuration. Defaults to 30.0.
+
+    Returns:
+        List[Dict[str, Any]]: The candidates that fit the limits, best first. Each has the `settings` it changed
+            and the simulation results.
+    """
+    base = base if base else Settings()
+    grid = dict(grid if grid else DEFAULT_GRID)
+    if not is_async:
+        grid.pop("concurrent_tasks_per_process", None)
+    swept = set(grid) - {"full_queue_sleep"}
+    if "full_queue_sleep" in grid:
+        swept |= {"full_queue_sleep_min", "full_queue_sleep_max"}
+
+    candidates = []
+    for settings in settings_grid(base, grid):
+        queue_mb = settings.max_queue_size * item_bytes / 2**20
+        if max_memory_mb is not None and queue_mb > max_memory_mb:
+            continue
+        result = Simulator(settings, reader_latency, writer_latency, is_async, arrival_rate, duration).run()
+        if max_latency_p99 is not None and result["latency_p99"] > max_latency_p99:
+            continue
+        result["queue_memory_mb"] = queue_mb
+        result["settings"] = {key: getattr(settings, key) for key in sorted(swept)}
+        candidates.append(result)
+
+    # Configurations within 1% of each other are treated as equally fast and ranked on latency, then memory.
+    best = max((candidate["throughput"] for candidate in candidates), default=0)
+    candidates.sort(
+        key=lambda c: (
+            -round(c["throughput"] / best, 2) if best else 0,
+            c["latency_p99"],
+            c["queue_memory_mb"],
+        )
+    )
+    return candidates
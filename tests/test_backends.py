@@ -0,0 +1,173 @@
+import multiprocessing as mp
+import os
+import tempfile
+import time
+from pathlib import Path
+from queue import Empty, Full
+
+import pytest
+
+from quasiqueue import Settings
+from quasiqueue.backends import MemoryQueue, SQLiteQueue, create_queue, split_claim
+from quasiqueue.builder import Builder
+from tests.utils import QuickTestSettings, run_and_gather
+
+
+def claim_items(queue: SQLiteQueue, count: int) -> list:
+    return [split_claim(claim)[0] for claim in queue.get_many(count, 0.1)]
+
+
+def test_create_queue():
+    ctx = mp.get_context("fork")
+    assert isinstance(create_queue(Settings(), "testing", ctx), MemoryQueue)
+    with tempfile.TemporaryDirectory() as d:
+        queue = create_queue(Settings(queue_backend="sqlite", queue_path=f"{d}/queue.db"), "testing", ctx)
+        assert isinstance(queue, SQLiteQueue)
+        queue.close()
+        queue = create_queue(
+            Settings(queue_backend="quasiqueue.backends:SQLiteQueue", queue_path=f"{d}/queue.db"), "testing", ctx
+        )
+        assert isinstance(queue, SQLiteQueue)
+        queue.close()
+    with pytest.raises(ValueError):
+        create_queue(Settings(queue_backend="sqlite"), "testing", ctx)
+
+
+def test_memory_queue_batches():
+    queue = MemoryQueue(10, ctx=mp.get_context("fork"))
+    queue.put_many([1, 2, 3])
+    # A feeder thread moves items into the pipe, and get_many only takes what has already arrived.
+    time.sleep(0.1)
+    assert queue.get_many(5, 1) == [1, 2, 3]
+    with pytest.raises(Empty):
+        queue.get_many(5, 0.05)
+
+
+def test_sqlite_items_survive_reopening():
+    with tempfile.TemporaryDirectory() as d:
+        queue = SQLiteQueue(f"{d}/queue.db")
+        queue.put_many([1, "two", {"three": 3}])
+        queue.put(4)
+        queue.close()
+
+        queue = SQLiteQueue(f"{d}/queue.db")
+        assert queue.qsize() == 4
+        assert claim_items(queue, 10) == [1, "two", {"three": 3}, 4]
+        queue.close()
+
+
+def test_sqlite_visibility_timeout():
+    with tempfile.TemporaryDirectory() as d:
+        queue = SQLiteQueue(f"{d}/queue.db", visibility_timeout=0.2)
+        queue.put_many(["acked", "abandoned"])
+        acked, abandoned = queue.get_many(2, 0.1)
+        queue.ack(acked.receipt)
+        assert queue.qsize() == 0
+        with pytest.raises(Empty):
+            queue.get(False)
+
+        # The unacknowledged item comes back once its timeout passes.
+        time.sleep(0.3)
+        assert queue.qsize() == 1
+        claim = queue.get(True, 0.1)
+        assert claim.item == "abandoned"
+        queue.ack(claim.receipt)
+        time.sleep(0.3)
+        with pytest.raises(Empty):
+            queue.get(False)
+        queue.close()
+
+
+def test_sqlite_max_deliveries():
+    with tempfile.TemporaryDirectory() as d:
+        queue = SQLiteQueue(f"{d}/queue.db", visibility_timeout=0.05, max_deliveries=2)
+        queue.put("poison")
+        for _ in range(2):
+            assert queue.get(True, 0.1).item == "poison"
+            time.sleep(0.1)
+        # The third delivery is dropped instead.
+        with pytest.raises(Empty):
+            queue.get(True, 0.1)
+        assert queue.db.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 0
+        queue.close()
+
+
+def test_sqlite_maxsize():
+    with tempfile.TemporaryDirectory() as d:
+        queue = SQLiteQueue(f"{d}/queue.db", maxsize=3)
+        queue.put_many([1, 2])
+        with pytest.raises(Full):
+            queue.put_many([3, 4], 0.05)
+        queue.put(3, False)
+        with pytest.raises(Full):
+            queue.put(4, False)
+        queue.close()
+
+
+def _crashing_worker(queue: SQLiteQueue) -> None:
+    queue.get(True, 1)
+    os._exit(1)
+
+
+def test_sqlite_recovers_claims_after_crash():
+    """Items claimed by workers that died are released when the queue starts again."""
+    with tempfile.TemporaryDirectory() as d:
+        settings = Settings(queue_backend="sqlite", queue_path=f"{d}/queue.db")
+        ctx = mp.get_context("spawn")
+        queue = create_queue(settings, "testing", ctx)
+        queue.put_many(["first", "second"])
+        worker = ctx.Process(target=_crashing_worker, args=(queue,))
+        worker.start()
+        worker.join()
+        assert worker.exitcode == 1
+        assert queue.qsize() == 1
+        queue.close()
+
+        queue = create_queue(settings, "testing", ctx)
+        assert queue.qsize() == 2
+        assert claim_items(queue, 2) == ["first", "second"]  # type: ignore[arg-type]
+        queue.close()
+
+
+@pytest.mark.asyncio
+async def test_builder_batches_durable_queues():
+    with tempfile.TemporaryDirectory() as d:
+        queue = SQLiteQueue(f"{d}/queue.db", maxsize=100)
+        writes = []
+        original = queue.put_many
+
+        def put_many(items, timeout=None):
+            writes.append(len(items))
+            original(items, timeout)
+
+        queue.put_many = put_many  # type: ignore[method-assign]
+
+        async def writer(desired: int):
+            for i in range(25):
+                yield i
+
+        settings = QuickTestSettings(save_dir=d, max_queue_size=100, lookup_block_size=10)
+        builder = Builder(queue, settings, writer)
+        assert await builder.populate()
+        assert writes == [10, 10, 5]
+        assert queue.qsize() == 25
+
+        # Shutdown sentinels would still be in the database on the next run.
+        builder.close()
+        assert queue.qsize() == 25
+        queue.close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("async_preferred", [True, False])
+async def test_sqlite_backend_run(async_preferred):
+    with tempfile.TemporaryDirectory() as d:
+        path = Path(d) / "queue.db"
+        settings = QuickTestSettings(save_dir=d, queue_backend="sqlite", queue_path=str(path))
+        results = await run_and_gather(settings, async_preferred)
+        assert len(results["missing"]) == 0
+
+        # Every item was acknowledged, so nothing is left for the next run.
+        queue = SQLiteQueue(str(path))
+        assert queue.db.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 0
+        queue.close()
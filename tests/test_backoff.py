@@ -58,3 +58,9 @@ def test_backoff_custom_min_max():
 
     b.full_consecutive = 10
     assert b.full_queue_sleep_time() == 10.0
+
+
+def test_backoff_long_idle():
+    b = make_builder()
+    b.full_consecutive = 5000
+    assert b.full_queue_sleep_time() == 90.0
@@ -0,0 +1,100 @@
+import multiprocessing as mp
+import os
+import tempfile
+
+import pytest
+
+from quasiqueue.builder import Builder
+from quasiqueue.codecs import BytesCodec, Codec, CompressedCodec, PickleCodec, create_codec
+from tests.utils import QuickTestSettings, run_and_gather
+
+
+class UpperCodec(Codec):
+    def encode(self, item):
+        return item.upper().encode()
+
+    def decode(self, data):
+        return data.decode().lower()
+
+
+def test_create_codec():
+    assert create_codec("none") is None
+    assert isinstance(create_codec("pickle"), PickleCodec)
+    assert isinstance(create_codec("bytes"), BytesCodec)
+    assert isinstance(create_codec("tests.test_codecs:UpperCodec"), UpperCodec)
+    compressed = create_codec("pickle", 100)
+    assert isinstance(compressed, CompressedCodec)
+    assert isinstance(compressed.codec, PickleCodec)
+    with pytest.raises(ValueError):
+        create_codec("none", 100)
+
+
+def test_pickle_codec():
+    codec = PickleCodec()
+    item = {"id": 1, "tags": ("a", "b"), "body": b"\x00" * 10}
+    assert codec.decode(codec.encode(item)) == item
+
+
+def test_msgpack_codec():
+    pytest.importorskip("msgpack")
+    codec = create_codec("msgpack")
+    assert codec is not None
+    item = {"id": 1, "tags": ["a", "b"], "body": b"\x00" * 10, 5: None}
+    assert codec.decode(codec.encode(item)) == item
+
+
+def test_bytes_codec():
+    codec = BytesCodec()
+    assert codec.encode(b"abc") == b"abc"
+    assert codec.encode(bytearray(b"abc")) == b"abc"
+    assert codec.decode(b"abc") == b"abc"
+    with pytest.raises(TypeError):
+        codec.encode("abc")
+
+
+def test_compressed_codec():
+    codec = CompressedCodec(BytesCodec(), 100)
+    # Small payloads aren't compressed.
+    assert codec.encode(b"small") == b"\x00small"
+    large = b"x" * 10000
+    encoded = codec.encode(large)
+    assert len(encoded) < 100
+    assert codec.decode(encoded) == large
+    # Payloads that don't shrink are sent as they are.
+    noise = os.urandom(1000)
+    assert codec.encode(noise) == b"\x00" + noise
+    assert codec.decode(codec.encode(noise)) == noise
+    assert codec.decode(codec.encode(b"small")) == b"small"
+
+
+@pytest.mark.asyncio
+async def test_builder_encodes_items():
+    with tempfile.TemporaryDirectory() as d:
+        queue = mp.get_context("fork").Queue()
+
+        async def writer():
+            for i in range(5):
+                yield {"id": i, "body": "x" * 1000}
+
+        settings = QuickTestSettings(save_dir=d, queue_codec="pickle", queue_compress_min_bytes=512)
+        builder = Builder(queue, settings, writer, dedup_key=lambda item: item["id"])
+        assert await builder.populate()
+        codec = create_codec("pickle", 512)
+        assert codec is not None
+        for i in range(5):
+            encoded = queue.get(True, 1)
+            assert type(encoded) is bytes
+            assert len(encoded) < 100
+            assert codec.decode(encoded) == {"id": i, "body": "x" * 1000}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("async_preferred", [True, False])
+@pytest.mark.parametrize("trace_sample_rate", [0.0, 1.0])
+async def test_codec_run(async_preferred, trace_sample_rate):
+    with tempfile.TemporaryDirectory() as d:
+        settings = QuickTestSettings(
+            save_dir=d, queue_codec="pickle", queue_compress_min_bytes=1, trace_sample_rate=trace_sample_rate
+        )
+        results = await run_and_gather(settings, async_preferred)
+        assert len(results["missing"]) == 0
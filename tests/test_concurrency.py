@@ -0,0 +1,99 @@
+import asyncio
+import json
+import multiprocessing as mp
+import tempfile
+import time
+from pathlib import Path
+
+import pytest
+
+from quasiqueue import QuasiQueue
+from quasiqueue.concurrency import AIMDController
+from tests.utils import QuickTestSettings, StopTestException
+
+
+def test_additive_increase():
+    controller = AIMDController(initial=4, minimum=1, maximum=10, latency_target=1.0)
+    for _ in range(4):
+        controller.record(time.monotonic(), 0.1)
+    # One full window of healthy tasks adds roughly one slot.
+    assert controller.limit == 4
+    for _ in range(4):
+        controller.record(time.monotonic(), 0.1)
+    assert controller.limit == 5
+
+
+def test_increase_capped_at_maximum():
+    controller = AIMDController(initial=4, minimum=1, maximum=6, latency_target=1.0)
+    for _ in range(500):
+        controller.record(time.monotonic(), 0.1)
+    assert controller.limit == 6
+
+
+def test_multiplicative_decrease_on_latency_and_errors():
+    controller = AIMDController(initial=16, minimum=2, maximum=32, latency_target=1.0)
+    controller.record(time.monotonic(), 5.0)
+    assert controller.limit == 8
+    controller.record(time.monotonic(), 0.1, failed=True)
+    assert controller.limit == 4
+    controller.record(time.monotonic(), 0.1, failed=True)
+    controller.record(time.monotonic(), 0.1, failed=True)
+    assert controller.limit == 2
+
+
+def test_stale_tasks_do_not_decrease_twice():
+    controller = AIMDController(initial=16, minimum=1, maximum=32, latency_target=1.0)
+    started = time.monotonic()
+    for _ in range(8):
+        controller.record(started, 5.0)
+    assert controller.limit == 8
+
+
+def test_gauge_mirrors_limit():
+    gauge = mp.get_context("fork").RawValue("i", 0)
+    controller = AIMDController(initial=8, minimum=1, maximum=32, latency_target=1.0, gauge=gauge)
+    assert gauge.value == 8
+    controller.record(time.monotonic(), 0.1, failed=True)
+    assert gauge.value == 4
+
+
+def test_invalid_bounds():
+    with pytest.raises(ValueError):
+        AIMDController(initial=4, minimum=5, maximum=2, latency_target=1.0)
+
+
+@pytest.mark.asyncio
+async def test_adaptive_concurrency_backs_off_slow_readers():
+    with tempfile.TemporaryDirectory() as d:
+        settings = QuickTestSettings(
+            save_dir=d,
+            num_processes=1,
+            concurrent_tasks_per_process=8,
+            adaptive_concurrency=True,
+            adaptive_latency_target=0.05,
+            max_jobs_per_process=None,
+        )
+        qq = None
+
+        async def writer(desired: int, settings: dict):
+            for i in range(12):
+                yield i
+            await asyncio.sleep(1)
+            limits.update(qq.concurrency_limits())
+            raise StopTestException("Test complete")
+
+        async def reader(item: str | int, settings: dict):
+            await asyncio.sleep(0.1)
+            with open(Path(settings["save_dir"]) / f"{item}.output", "w") as f:
+                json.dump({"item": item}, f)
+
+        limits = {}
+        qq = QuasiQueue(name="adaptive_test", reader=reader, writer=writer, settings=settings)
+        try:
+            await qq.main()
+        except StopTestException:
+            pass
+
+        assert len(list(Path(d).glob("*.output"))) == 12
+        assert len(limits) == 1
+        assert list(limits.values())[0] < 8
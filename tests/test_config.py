@@ -0,0 +1,149 @@
+import json
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+from pydantic import ValidationError
+
+from quasiqueue.config import build_runners, load_config, parse_overrides, queue_settings
+from tests.utils import QuickTestSettings
+
+CONFIG = """
+[pool]
+processes = 3
+
+[queues.images]
+reader = "tests.utils:_reader"
+writer = "tests.utils:_writer"
+context = "tests.utils:_context"
+
+[queues.images.settings]
+num_processes = 4
+max_queue_size = 50
+
+[queues.audio]
+reader = "tests.utils:_reader_sync"
+writer = "tests.utils:_writer"
+"""
+
+
+def write_config(directory: str, body: str, name: str = "queues.toml") -> Path:
+    path = Path(directory) / name
+    path.write_text(body)
+    return path
+
+
+def test_load_toml():
+    with tempfile.TemporaryDirectory() as d:
+        config = load_config(write_config(d, CONFIG))
+    assert list(config.queues) == ["images", "audio"]
+    assert config.pool is not None and config.pool.processes == 3
+    assert config.queues["images"].settings == {"num_processes": 4, "max_queue_size": 50}
+
+
+def test_build_runners(monkeypatch):
+    monkeypatch.setenv("QUASIQUEUE_IMAGES_MAX_QUEUE_SIZE", "10")
+    monkeypatch.setenv("QUASIQUEUE_AUDIO_MAX_QUEUE_SIZE", "20")
+    with tempfile.TemporaryDirectory() as d:
+        config = load_config(write_config(d, CONFIG))
+    images, audio = build_runners(config, parse_overrides(["lookup_block_size=7"]))
+
+    assert images.name == "images"
+    assert images.context is not None
+    # The config file wins over the environment, and overrides win over both.
+    assert images.settings.max_queue_size == 50
+    assert images.settings.num_processes == 4
+    assert audio.settings.max_queue_size == 20
+    assert images.settings.lookup_block_size == audio.settings.lookup_block_size == 7
+
+
+def test_sharded_writers():
+    with tempfile.TemporaryDirectory() as d:
+        body = (
+            '[queues.images]\nreader = "tests.utils:_reader"\nwriter = ["tests.utils:_writer", "tests.utils:_writer"]\n'
+        )
+        config = load_config(write_config(d, body))
+    (images,) = build_runners(config)
+    assert isinstance(images.writer, list) and len(images.writer) == 2
+
+
+def test_settings_class():
+    with tempfile.TemporaryDirectory() as d:
+        body = (
+            CONFIG + '\nsettings_class = "tests.utils:QuickTestSettings"\n[queues.audio.settings]\nsave_dir = "/tmp"\n'
+        )
+        config = load_config(write_config(d, body))
+    settings = queue_settings("audio", config.queues["audio"])
+    assert isinstance(settings, QuickTestSettings)
+    assert settings.save_dir == "/tmp"
+
+
+def test_unknown_setting():
+    with tempfile.TemporaryDirectory() as d:
+        config = load_config(write_config(d, CONFIG + "\n[queues.audio.settings]\nnot_a_setting = 1\n"))
+    with pytest.raises(ValidationError):
+        build_runners(config)
+
+
+def test_invalid_config():
+    with tempfile.TemporaryDirectory() as d:
+        with pytest.raises(ValidationError):
+            load_config(write_config(d, '[queues.images]\nreader = "tests.utils:_reader"\n'))
+        with pytest.raises(ValidationError):
+            load_config(write_config(d, ""))
+        with pytest.raises(ValueError):
+            load_config(write_config(d, CONFIG, "queues.ini"))
+
+
+def test_parse_overrides():
+    assert parse_overrides(["num_processes=4", " rate_limit = 2.5 "]) == {"num_processes": "4", "rate_limit": "2.5"}
+    with pytest.raises(ValueError):
+        parse_overrides(["num_processes"])
+
+
+def test_load_yaml():
+    pytest.importorskip("yaml")
+    with tempfile.TemporaryDirectory() as d:
+        body = "queues:\n  images:\n    reader: tests.utils:_reader\n    writer: tests.utils:_writer\n"
+        config = load_config(write_config(d, body, "queues.yaml"))
+    assert config.queues["images"].reader == "tests.utils:_reader"
+
+
+def test_run_config_file():
+    """Run two queues from one config file in a single parent, the way `quasiqueue run --config` does."""
+    with tempfile.TemporaryDirectory() as d:
+        for name in ("a", "b"):
+            (Path(d) / name).mkdir()
+        body = "\n".join(
+            f"""
+[queues.{name}]
+reader = "tests.utils:_reader"
+writer = "tests.utils:_writer"
+context = "tests.utils:_context"
+settings_class = "tests.utils:QuickTestSettings"
+
+[queues.{name}.settings]
+save_dir = "{Path(d) / name}"
+num_processes = 1
+"""
+            for name in ("a", "b")
+        )
+        path = write_config(d, body)
+        script = f"""
+from quasiqueue.config import build_runners, load_config
+from quasiqueue.runner import run_queues
+from tests.utils import StopTestException
+
+try:
+    run_queues(*build_runners(load_config({str(path)!r})))
+except StopTestException:
+    pass
+"""
+        subprocess.run([sys.executable, "-c", script], cwd=Path(__file__).parent.parent, timeout=60, check=True)
+
+        for name in ("a", "b"):
+            outputs = list((Path(d) / name).glob("*.output"))
+            assert len(outputs) == 50
+            assert all("pid" in json.loads(output.read_text()) for output in outputs)
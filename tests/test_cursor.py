@@ -0,0 +1,170 @@
+import json
+import multiprocessing as mp
+import tempfile
+from datetime import date, datetime, timezone
+from pathlib import Path
+from queue import Empty
+
+import pytest
+
+from quasiqueue import Cursor, QuasiQueue
+from quasiqueue.builder import Builder
+from quasiqueue.cursor import CURSOR_SUFFIX, CursorStore
+from tests.utils import QuickTestSettings, StopTestException, _context, _reader
+
+
+def drain(queue) -> list:
+    items = []
+    while True:
+        try:
+            items.append(queue.get(True, 0.1))
+        except Empty:
+            return items
+
+
+def test_cursor_store():
+    with tempfile.TemporaryDirectory() as d:
+        path = Path(d) / f"testing{CURSOR_SUFFIX}"
+        store = CursorStore(path, interval=60)
+        store.set("0", 10)
+        assert json.loads(path.read_text()) == {"0": 10}
+
+        # Later changes are batched until the interval passes or the store closes.
+        store.set("0", 20)
+        store.set("1", {"page": "abc"})
+        assert json.loads(path.read_text()) == {"0": 10}
+        store.close()
+        assert json.loads(path.read_text()) == {"0": 20, "1": {"page": "abc"}}
+        assert [p.name for p in Path(d).iterdir()] == [path.name]
+
+        store = CursorStore(path)
+        assert store.get("0") == 20
+        assert store.get("2") is None
+
+
+def test_cursor_types_survive_restarts():
+    with tempfile.TemporaryDirectory() as d:
+        path = Path(d) / f"testing{CURSOR_SUFFIX}"
+        watermark = datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc)
+        cursors = {"0": watermark, "1": (date(2024, 5, 1), 17), "2": {"after": [watermark, ("a", 1)]}}
+        store = CursorStore(path)
+        for key, value in cursors.items():
+            store.set(key, value)
+        store.close()
+        assert CursorStore(path).values == cursors
+
+        # Values that can't be saved fail when the writer yields them, with the allowed types in the error.
+        with pytest.raises(TypeError, match="datetimes"):
+            store.set("0", object())
+        with pytest.raises(TypeError):
+            store.set("0", {1: "a"})
+        assert store.get("0") == watermark
+
+
+def test_memory_cursor_store():
+    store = CursorStore()
+    store.set("0", 5)
+    store.close()
+    assert store.get("0") == 5
+
+
+@pytest.mark.asyncio
+async def test_builder_cursor():
+    with tempfile.TemporaryDirectory() as d:
+        queue = mp.get_context("fork").Queue()
+        table = list(range(100))
+        seen = []
+
+        async def writer(desired: int, cursor: int | None):
+            seen.append(cursor)
+            start = 0 if cursor is None else cursor + 1
+            for row in table[start : start + desired]:
+                yield row
+                yield Cursor(row)
+
+        settings = QuickTestSettings(save_dir=d, lookup_block_size=10)
+        builder = Builder(queue, settings, writer, cursors=CursorStore(Path(d) / "cursor.json"))
+        assert await builder.populate()
+        assert await builder.populate()
+        assert seen == [None, 9]
+        assert drain(queue) == list(range(20))
+        builder.release()
+        assert json.loads((Path(d) / "cursor.json").read_text()) == {"0": 19}
+
+
+@pytest.mark.asyncio
+async def test_cursor_stops_with_the_writer():
+    """When the Builder stops a writer early the saved cursor is the last one it yielded."""
+    with tempfile.TemporaryDirectory() as d:
+        queue = mp.get_context("fork").Queue()
+
+        async def writer(cursor: int | None):
+            for row in range(100):
+                yield row
+                yield Cursor(row)
+
+        builder = Builder(queue, QuickTestSettings(save_dir=d, max_queue_size=1000), writer)
+        assert await builder.populate(max=30)
+        assert builder.cursors.get("0") == 28
+        assert len(drain(queue)) == 30
+
+
+@pytest.mark.asyncio
+async def test_shard_cursors():
+    with tempfile.TemporaryDirectory() as d:
+        queue = mp.get_context("fork").Queue()
+        seen = []
+
+        def writer(shard: int, cursor: int | None):
+            seen.append((shard, cursor))
+            yield f"{shard}-{cursor}"
+            yield Cursor((cursor or 0) + shard + 1)
+
+        builder = Builder(queue, QuickTestSettings(save_dir=d, writer_shards=2), writer)
+        assert await builder.populate()
+        assert await builder.populate()
+        assert sorted(seen, key=str) == [(0, 1), (0, None), (1, 2), (1, None)]
+        assert builder.cursors.values == {"0": 2, "1": 4}
+        builder.release()
+
+
+@pytest.mark.asyncio
+async def test_cursor_survives_restarts():
+    with tempfile.TemporaryDirectory() as d:
+        seen = []
+
+        async def writer(desired: int, cursor: int | None):
+            seen.append(cursor)
+            start = 0 if cursor is None else cursor + 1
+            if start >= 25:
+                raise StopTestException("End Run")
+            for row in range(start, start + 5):
+                yield row
+            yield Cursor(start + 4)
+
+        settings = QuickTestSettings(
+            save_dir=d, cursor_dir=d, prevent_requeuing_time=0, queue_backend="sqlite", queue_path=f"{d}/queue.db"
+        )
+        qq = QuasiQueue("testing", reader=_reader, writer=writer, context=_context, settings=settings)
+        with pytest.raises(StopTestException):
+            await qq.main()
+        assert seen == [None, 4, 9, 14, 19, 24]
+        assert json.loads((Path(d) / f"testing{CURSOR_SUFFIX}").read_text()) == {"0": 24}
+
+        # A new run picks up where the last one stopped.
+        seen.clear()
+        with pytest.raises(StopTestException):
+            await qq.main()
+        assert seen == [24]
+        assert {path.name for path in Path(d).glob("*.output")} == {f"{i}.output" for i in range(25)}
+
+
+def test_cursor_dir_needs_durable_queue():
+    with tempfile.TemporaryDirectory() as d:
+        with pytest.raises(ValueError):
+            CursorStore.for_queue(QuickTestSettings(save_dir=d, cursor_dir=d), "testing")
+        with pytest.raises(ValueError):
+            CursorStore.for_queue(QuickTestSettings(save_dir=d, cursor_dir=d, overflow_max_bytes=1024), "testing", True)
+        assert CursorStore.for_queue(QuickTestSettings(save_dir=d, cursor_dir=d), "testing", True).path
+        # Cursors that only last as long as the process work with any queue.
+        assert CursorStore.for_queue(QuickTestSettings(save_dir=d), "testing").path is None
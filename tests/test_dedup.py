@@ -0,0 +1,176 @@
+import asyncio
+import multiprocessing as mp
+import tempfile
+from pathlib import Path
+from queue import Empty
+from typing import Any, Dict
+
+import pytest
+
+from quasiqueue import QuasiQueue
+from quasiqueue.builder import Builder
+from quasiqueue.dedup import HashedHistory
+from tests.utils import QuickTestSettings, StopTestException, _context
+
+
+def drain(queue) -> list:
+    items = []
+    while True:
+        try:
+            items.append(queue.get(True, 0.1))
+        except Empty:
+            return items
+
+
+def test_hashed_history():
+    history = HashedHistory()
+    history["a"] = 10.0
+    history[("b", 1)] = 20.0
+    assert "a" in history
+    assert ("b", 1) in history
+    assert "c" not in history
+    assert history["a"] == 10.0
+    with pytest.raises(KeyError):
+        history["c"]
+
+    history["a"] = 30.0
+    assert history["a"] == 30.0
+    assert len(history) == 2
+
+    del history["a"]
+    assert "a" not in history
+    with pytest.raises(KeyError):
+        del history["a"]
+    history["a"] = 40.0
+    assert history["a"] == 40.0
+
+    history[0] = 50.0
+    assert 0 in history
+    assert 1 not in history
+
+
+def test_hashed_history_integer_collisions():
+    # Python's own hash maps each of these pairs to the same value.
+    pairs = [(-1, -2), (1, 2**61), (5, 5 + 2**61 - 1)]
+    for first, second in pairs:
+        history = HashedHistory()
+        history[first] = 10.0
+        assert second not in history
+        history[second] = 20.0
+        assert history[first] == 10.0
+        assert (second,) not in history
+
+
+def test_hashed_history_other_keys():
+    history = HashedHistory()
+    for i in range(2000):
+        history[i + 0.5] = float(i + 1)
+    assert all(i + 0.5 in history for i in range(2000))
+    assert 0.25 not in history
+
+
+def test_expire_rebuilds_rarely():
+    history = HashedHistory()
+    rebuilds = 0
+    rebuild = history._rebuild
+
+    def counting_rebuild(cutoff: float, headroom: int) -> None:
+        nonlocal rebuilds
+        rebuilds += 1
+        rebuild(cutoff, headroom)
+
+    history._rebuild = counting_rebuild  # type: ignore[method-assign]
+    # Every entry is still live, the way the Builder calls expire before each populate.
+    for i in range(20000):
+        history[i] = float(i + 1)
+        history.expire(0.0)
+    assert rebuilds <= 6
+
+
+def test_hashed_history_grows_and_expires():
+    history = HashedHistory()
+    for i in range(9000):
+        history[f"item-{i}"] = float(i + 1)
+    assert history.capacity > 9000
+    assert all(f"item-{i}" in history for i in range(9000))
+    assert len(history) == 9000
+
+    history.expire(8000)
+    assert len(history) == 1000
+    assert "item-7999" not in history
+    assert history["item-8000"] == 8001.0
+    # 16 bytes a slot, and the table shrank back down after dropping the expired entries.
+    assert history.nbytes == history.capacity * 16
+    assert history.capacity == 4096
+
+
+@pytest.mark.asyncio
+async def test_dedup_key():
+    with tempfile.TemporaryDirectory() as d:
+        queue = mp.get_context("fork").Queue()
+
+        async def writer():
+            for i in range(10):
+                # Dicts can't be dict keys themselves.
+                yield {"id": i % 5, "attempt": i}
+
+        builder = Builder(queue, QuickTestSettings(save_dir=d), writer, dedup_key=lambda item: item["id"])
+        assert await builder.populate()
+        assert drain(queue) == [{"id": i, "attempt": i} for i in range(5)]
+        assert set(builder.last_queued) == set(range(5))
+
+
+@pytest.mark.asyncio
+async def test_hashed_dedup():
+    with tempfile.TemporaryDirectory() as d:
+        queue = mp.get_context("fork").Queue()
+
+        async def writer():
+            for i in range(10):
+                yield f"item-{i % 5}"
+
+        builder = Builder(queue, QuickTestSettings(save_dir=d, dedup_hash=True), writer)
+        assert isinstance(builder.last_queued, HashedHistory)
+        assert await builder.populate()
+        assert drain(queue) == [f"item-{i}" for i in range(5)]
+        assert not await builder.populate()
+
+        # Expired items are queued again.
+        builder.settings.prevent_requeuing_time = 0
+        assert await builder.populate()
+        assert len(drain(queue)) == 10
+
+
+def reader(item: dict, settings: Dict[str, Any]):
+    with open(Path(settings["save_dir"]) / f"{item['id']}.output", "w") as f:
+        f.write(str(item["attempt"]))
+
+
+@pytest.mark.asyncio
+async def test_dedup_run():
+    with tempfile.TemporaryDirectory() as d:
+
+        async def writer(desired: int):
+            for i in range(40):
+                yield {"id": i % 20, "attempt": i}
+            await asyncio.sleep(1)
+            raise StopTestException("End Run")
+
+        qq = QuasiQueue(
+            "testing",
+            reader=reader,
+            writer=writer,
+            context=_context,
+            settings=QuickTestSettings(save_dir=d, dedup_hash=True),
+            dedup_key="tests.test_dedup:item_id",
+        )
+        with pytest.raises(StopTestException):
+            await qq.main()
+        # Only the first payload with each id was queued.
+        assert {path.name: path.read_text() for path in Path(d).glob("*.output")} == {
+            f"{i}.output": str(i) for i in range(20)
+        }
+
+
+def item_id(item: dict) -> int:
+    return item["id"]
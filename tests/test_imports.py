@@ -0,0 +1,50 @@
+import subprocess
+import sys
+
+import pytest
+
+from quasiqueue.imports import get_function_from_string, resolve
+
+HEAVY_MODULES = ["pydantic", "pydantic_settings", "psutil", "typer", "http.server"]
+
+
+def loaded_modules(statement: str) -> set:
+    """Run a statement in a fresh interpreter and return which of the heavy modules it imported."""
+    code = f"import sys\n{statement}\nprint(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return set(result.stdout.split())
+
+
+def test_package_import_is_lazy():
+    assert loaded_modules("import quasiqueue") == set()
+
+
+@pytest.mark.parametrize("module", ["quasiqueue.reader", "quasiqueue.pool"])
+def test_worker_imports_are_light(module):
+    # These are the modules a spawn or forkserver worker loads to run reader_process or pool_process.
+    assert loaded_modules(f"import {module}") == set()
+
+
+def test_lazy_attributes():
+    import quasiqueue
+    from quasiqueue.runner import QueueRunner
+
+    assert quasiqueue.QuasiQueue is QueueRunner
+    assert "Settings" in dir(quasiqueue)
+    with pytest.raises(AttributeError):
+        quasiqueue.NotAThing
+
+
+def test_import_time():
+    # Importing the package and the worker entry point should stay far below the cost of pydantic and psutil.
+    code = "import time; start = time.perf_counter(); import quasiqueue.reader; print(time.perf_counter() - start)"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert float(result.stdout) < 0.5
+
+
+def test_resolve():
+    assert resolve("tests.utils:_reader") is get_function_from_string("tests.utils:_reader")
+    assert resolve(print) is print
+    assert resolve(None) is None
+    with pytest.raises(ValueError):
+        resolve("tests.utils")
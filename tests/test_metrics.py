@@ -0,0 +1,141 @@
+import asyncio
+import json
+import multiprocessing as mp
+import tempfile
+import urllib.request
+from pathlib import Path
+
+import pytest
+
+from quasiqueue import QuasiQueue
+from quasiqueue.metrics import MetricsRegistry, WorkerMetrics, register_endpoint, render_prometheus, unregister_endpoint
+from tests.utils import QuickTestSettings, StopTestException
+
+
+def _record(metrics: WorkerMetrics):
+    for latency in (0.002, 0.02, 0.2):
+        metrics.inc("items_processed")
+        metrics.observe("reader_latency", latency)
+    metrics.inc("reader_errors")
+
+
+def test_worker_rows_aggregate_in_parent():
+    ctx = mp.get_context("fork")
+    registry = MetricsRegistry("test", slots=4, mp_context=ctx)
+    workers = [registry.worker() for _ in range(2)]
+    processes = [ctx.Process(target=_record, args=(worker,)) for worker in workers]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    snapshot = registry.snapshot()
+    assert snapshot["counters"]["items_processed"] == 6
+    assert snapshot["counters"]["reader_errors"] == 2
+    histogram = snapshot["histograms"]["reader_latency"]
+    assert histogram["count"] == 6
+    assert histogram["sum"] == pytest.approx(0.444)
+    assert dict(histogram["buckets"])[0.005] == 2
+    assert dict(histogram["buckets"])["+Inf"] == 6
+
+    # Released rows keep counting towards the totals and can be handed to new workers.
+    for worker in workers:
+        registry.release(worker)
+    assert registry.snapshot()["counters"]["items_processed"] == 6
+    assert len([registry.worker() for _ in range(4)]) == 4
+    assert registry.worker() is None
+
+
+def test_registry_grows():
+    ctx = mp.get_context("fork")
+    registry = MetricsRegistry("test", slots=1, mp_context=ctx)
+    first = registry.worker()
+    assert registry.worker() is None
+    registry.grow(3)
+    registry.grow(2)
+    assert registry.slots == 3
+    workers = [first, registry.worker(), registry.worker()]
+    assert registry.worker() is None
+    processes = [ctx.Process(target=_record, args=(worker,)) for worker in workers]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert registry.snapshot()["counters"]["items_processed"] == 9
+
+
+def test_parent_metrics():
+    registry = MetricsRegistry("test", slots=1)
+    registry.inc("writer_calls")
+    registry.set("queue_depth", 12)
+    registry.observe("writer_latency", 0.3)
+    snapshot = registry.snapshot()
+    assert snapshot["counters"]["writer_calls"] == 1
+    assert snapshot["gauges"]["queue_depth"] == 12
+    assert snapshot["histograms"]["writer_latency"]["count"] == 1
+
+
+def test_prometheus_format():
+    registry = MetricsRegistry("images", slots=1)
+    registry.inc("items_queued", 3)
+    registry.observe("writer_latency", 0.3)
+    text = render_prometheus([registry.snapshot()])
+    assert "# TYPE quasiqueue_items_queued_total counter" in text
+    assert 'quasiqueue_items_queued_total{queue="images"} 3.0' in text
+    assert 'quasiqueue_writer_latency_seconds_bucket{queue="images",le="0.5"} 1' in text
+    assert 'quasiqueue_writer_latency_seconds_count{queue="images"} 1' in text
+
+
+def test_http_endpoint():
+    registry = MetricsRegistry("http_test", slots=1)
+    registry.inc("items_queued", 2)
+    server = register_endpoint(registry, "127.0.0.1", 0)
+    try:
+        port = server.httpd.server_port
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+            assert 'quasiqueue_items_queued_total{queue="http_test"} 2.0' in response.read().decode()
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics.json") as response:
+            assert json.load(response)[0]["counters"]["items_queued"] == 2
+    finally:
+        unregister_endpoint(registry, "127.0.0.1", 0)
+
+
+@pytest.mark.asyncio
+async def test_runner_metrics_callback():
+    with tempfile.TemporaryDirectory() as d:
+        settings = QuickTestSettings(save_dir=d, num_processes=2, metrics_interval=0.1)
+        snapshots = []
+
+        async def writer(desired: int, settings: dict):
+            for i in range(20):
+                yield i
+            await asyncio.sleep(0.5)
+            raise StopTestException("Test complete")
+
+        async def reader(item: str | int, settings: dict):
+            if item == 0:
+                raise ValueError("Broken item")
+            with open(Path(settings["save_dir"]) / f"{item}.output", "w") as f:
+                json.dump({"item": item}, f)
+
+        qq = QuasiQueue(
+            name="metrics_test",
+            reader=reader,
+            writer=writer,
+            settings=settings,
+            metrics_callback=snapshots.append,
+        )
+        try:
+            await qq.main()
+        except StopTestException:
+            pass
+
+        final = snapshots[-1]
+        assert final["queue"] == "metrics_test"
+        assert final["counters"]["items_queued"] == 20
+        assert final["counters"]["items_processed"] == 20
+        assert final["counters"]["reader_errors"] == 1
+        assert final["counters"]["writer_calls"] >= 1
+        assert final["counters"]["worker_starts"] == 2
+        assert final["gauges"]["workers"] == 2
+        assert final["histograms"]["reader_latency"]["count"] == 20
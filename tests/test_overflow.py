@@ -0,0 +1,167 @@
+import asyncio
+import multiprocessing as mp
+import os
+import tempfile
+from pathlib import Path
+from queue import Empty, Full
+
+import pytest
+
+from quasiqueue import QuasiQueue
+from quasiqueue.builder import Builder
+from quasiqueue.overflow import OverflowBuffer
+from tests.utils import QuickTestSettings, StopTestException, _context, _reader
+
+
+def drain(queue) -> list:
+    items = []
+    while True:
+        try:
+            items.append(queue.get(True, 0.1))
+        except Empty:
+            return items
+
+
+class SmallQueue:
+    """A queue that raises Full once it holds `room` items."""
+
+    def __init__(self, room: int) -> None:
+        self.items: list = []
+        self.room = room
+
+    def qsize(self) -> int:
+        return 0
+
+    def put(self, item, block=True, timeout=None) -> None:
+        if len(self.items) >= self.room:
+            raise Full
+        self.items.append(item)
+
+
+def test_overflow_buffer():
+    with tempfile.TemporaryDirectory() as d:
+        buffer = OverflowBuffer(1024, d)
+        assert os.path.getsize(buffer.path) == 1024
+        for i in range(10):
+            assert buffer.append({"id": i})
+        assert len(buffer) == 10
+        assert buffer.peek_many(2) == [{"id": 0}, {"id": 1}]
+        assert len(buffer) == 10
+        assert buffer.pop_many(3) == [{"id": 0}, {"id": 1}, {"id": 2}]
+        assert buffer.pop_many(100) == [{"id": i} for i in range(3, 10)]
+        assert len(buffer) == 0
+        assert buffer.pop_many(5) == []
+        buffer.close()
+        assert not os.path.exists(buffer.path)
+
+
+def test_overflow_buffer_full():
+    with tempfile.TemporaryDirectory() as d:
+        buffer = OverflowBuffer(100, d)
+        added = 0
+        while buffer.append("x" * 10):
+            added += 1
+        assert 0 < added < 10
+
+        # Reading from the front makes room again, by moving the unread records to the start of the file.
+        assert buffer.pop_many(2) == ["x" * 10] * 2
+        assert buffer.append("y" * 10)
+        assert buffer.append("y" * 10)
+        assert not buffer.append("y" * 10)
+        assert buffer.pop_many(100) == ["x" * 10] * (added - 2) + ["y" * 10] * 2
+        assert not buffer.append("z" * 200)
+        buffer.close()
+
+
+@pytest.mark.asyncio
+async def test_builder_overflow():
+    """One large page from the writer feeds several populates without calling the writer again."""
+    with tempfile.TemporaryDirectory() as d:
+        queue = mp.get_context("fork").Queue()
+        calls = []
+
+        async def writer(desired: int):
+            calls.append(desired)
+            for i in range(200):
+                yield i
+
+        settings = QuickTestSettings(
+            save_dir=d, max_queue_size=50, lookup_block_size=500, overflow_max_bytes=2**20, overflow_dir=d
+        )
+        builder = Builder(queue, settings, writer)
+        assert builder.overflow is not None
+        queued = []
+        while len(queued) < 200:
+            assert await builder.populate()
+            queued.extend(drain(queue))
+        assert queued == list(range(200))
+        assert calls == [500]
+        assert len(builder.overflow) == 0
+
+        builder.close_overflow()
+        assert builder.overflow is None
+        assert not list(os.scandir(d))
+
+
+@pytest.mark.asyncio
+async def test_builder_overflow_full():
+    with tempfile.TemporaryDirectory() as d:
+        queue = mp.get_context("fork").Queue()
+
+        async def writer(desired: int):
+            for i in range(100):
+                yield i
+
+        settings = QuickTestSettings(save_dir=d, max_queue_size=10, overflow_max_bytes=64)
+        builder = Builder(queue, settings, writer)
+        assert await builder.populate()
+        spilled = len(builder.overflow)  # type: ignore[arg-type]
+        assert 0 < spilled < 92
+        # Items that didn't fit anywhere can be returned by the writer again right away.
+        assert set(builder.last_queued) == set(range(8 + spilled))
+        builder.close_overflow()
+
+
+@pytest.mark.asyncio
+async def test_overflow_kept_when_queue_fills():
+    with tempfile.TemporaryDirectory() as d:
+        queue = SmallQueue(5)
+        settings = QuickTestSettings(save_dir=d, overflow_max_bytes=2**16, queue_interaction_timeout=0.01)
+
+        async def writer(desired: int):
+            yield None
+
+        builder = Builder(queue, settings, writer)
+        assert builder.overflow is not None
+        for i in range(20):
+            builder.overflow.append(i)
+        # The queue fills partway through the batch, and the rest stays in the buffer.
+        assert not await builder.populate()
+        assert queue.items == list(range(5))
+        assert len(builder.overflow) == 15
+        queue.room = 100
+        assert await builder.populate()
+        assert queue.items == list(range(20))
+        builder.close_overflow()
+
+
+@pytest.mark.asyncio
+async def test_overflow_run():
+    with tempfile.TemporaryDirectory() as d:
+        calls = []
+
+        async def writer(desired: int):
+            # The whole page arrives in one call, then the writer ends the test once the overflow has drained.
+            calls.append(desired)
+            if len(calls) > 1:
+                await asyncio.sleep(2)
+                raise StopTestException("End Run")
+            for i in range(50):
+                yield i
+
+        settings = QuickTestSettings(save_dir=d, max_queue_size=10, overflow_max_bytes=2**16)
+        qq = QuasiQueue("testing", reader=_reader, writer=writer, context=_context, settings=settings)
+        with pytest.raises(StopTestException):
+            await qq.main()
+        assert {path.name for path in Path(d).glob("*.output")} == {f"{i}.output" for i in range(50)}
+        assert len(calls) == 2
@@ -0,0 +1,136 @@
+import asyncio
+import json
+import multiprocessing as mp
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Dict
+
+import pytest
+
+from quasiqueue import QuasiQueue
+from quasiqueue.placement import CpuPlacement, numa_nodes, parse_cpu_list
+from quasiqueue.pool import SharedPool
+from tests.utils import QuickTestSettings, StopTestException, _context
+
+
+def fake_topology(directory: str, nodes: Dict[int, str]) -> Path:
+    root = Path(directory) / "node"
+    for node, cpus in nodes.items():
+        (root / f"node{node}").mkdir(parents=True)
+        (root / f"node{node}" / "cpulist").write_text(f"{cpus}\n")
+    # Files that aren't nodes are skipped.
+    (root / "possible").write_text("0-1\n")
+    return root
+
+
+@pytest.fixture
+def eight_cpus(monkeypatch):
+    monkeypatch.setattr(os, "sched_getaffinity", lambda pid: set(range(8)))
+
+
+def test_parse_cpu_list():
+    assert parse_cpu_list("0-3,8,10-11") == [0, 1, 2, 3, 8, 10, 11]
+    assert parse_cpu_list("3,1,1-2\n") == [1, 2, 3]
+    assert parse_cpu_list("") == []
+
+
+def test_numa_nodes():
+    with tempfile.TemporaryDirectory() as d:
+        root = fake_topology(d, {1: "4-7", 0: "0-3"})
+        assert numa_nodes(root) == {0: [0, 1, 2, 3], 1: [4, 5, 6, 7]}
+        assert numa_nodes(Path(d) / "missing") == {}
+
+
+def test_placement_modes(eight_cpus):
+    with tempfile.TemporaryDirectory() as d:
+        root = fake_topology(d, {0: "0-3", 1: "4-7"})
+        settings = QuickTestSettings(save_dir=d)
+        assert CpuPlacement(settings, root).assign("worker_000") is None
+
+        settings = QuickTestSettings(save_dir=d, cpu_affinity="2-5")
+        assert CpuPlacement(settings, root).assign("worker_000") == [2, 3, 4, 5]
+
+        settings = QuickTestSettings(save_dir=d, cpu_affinity="2-4", cpu_pinning="cpu")
+        placement = CpuPlacement(settings, root)
+        assert [placement.assign(f"worker_{i:03d}") for i in range(4)] == [[2], [3], [4], [2]]
+
+        settings = QuickTestSettings(save_dir=d, cpu_affinity="2-5", cpu_pinning="numa")
+        placement = CpuPlacement(settings, root)
+        assert [placement.assign(f"worker_{i:03d}") for i in range(3)] == [[2, 3], [4, 5], [2, 3]]
+
+        # Without the topology every CPU counts as one node.
+        settings = QuickTestSettings(save_dir=d, cpu_pinning="numa")
+        assert CpuPlacement(settings, Path(d) / "missing").assign("worker_000") == list(range(8))
+
+
+def test_replacements_fill_gaps(eight_cpus):
+    with tempfile.TemporaryDirectory() as d:
+        placement = CpuPlacement(QuickTestSettings(save_dir=d, cpu_affinity="0-2", cpu_pinning="cpu"))
+        for i in range(3):
+            placement.assign(f"worker_{i:03d}")
+        placement.release("worker_001")
+        assert placement.assign("worker_003") == [1]
+
+
+def test_unavailable_cpus(eight_cpus):
+    with tempfile.TemporaryDirectory() as d:
+        placement = CpuPlacement(QuickTestSettings(save_dir=d, cpu_affinity="6-9", cpu_pinning="cpu"))
+        assert placement.slots == [[6], [7]]
+        with pytest.raises(ValueError):
+            CpuPlacement(QuickTestSettings(save_dir=d, cpu_affinity="12-15"))
+
+
+async def placement_reader(item: int, settings: Dict[str, Any]):
+    with open(Path(settings["save_dir"]) / f"{item}.output", "w") as f:
+        json.dump({"cpus": sorted(os.sched_getaffinity(0)), "nice": os.getpriority(os.PRIO_PROCESS, 0)}, f)
+
+
+@pytest.mark.asyncio
+async def test_workers_are_placed():
+    with tempfile.TemporaryDirectory() as d:
+        cpu = min(os.sched_getaffinity(0))
+        nice = min(os.getpriority(os.PRIO_PROCESS, 0) + 5, 19)
+
+        async def writer(desired: int):
+            for i in range(20):
+                yield i
+            await asyncio.sleep(1)
+            raise StopTestException("End Run")
+
+        settings = QuickTestSettings(save_dir=d, cpu_affinity=str(cpu), cpu_pinning="cpu", worker_nice=nice)
+        qq = QuasiQueue("testing", reader=placement_reader, writer=writer, context=_context, settings=settings)
+        with pytest.raises(StopTestException):
+            await qq.main()
+        results = [json.loads(path.read_text()) for path in Path(d).glob("*.output")]
+        assert len(results) == 20
+        assert all(result == {"cpus": [cpu], "nice": nice} for result in results)
+
+
+@pytest.mark.asyncio
+async def test_pool_workers_are_placed():
+    with tempfile.TemporaryDirectory() as d:
+        cpu = min(os.sched_getaffinity(0))
+        nice = min(os.getpriority(os.PRIO_PROCESS, 0) + 5, 19)
+
+        async def writer(desired: int):
+            for i in range(10):
+                yield i
+            await asyncio.sleep(1)
+            raise StopTestException("End Run")
+
+        settings = QuickTestSettings(save_dir=d, cpu_affinity=str(cpu), cpu_pinning="cpu", worker_nice=nice)
+        qq = QuasiQueue("testing", reader=placement_reader, writer=writer, settings=settings)
+        qq._prepare(2)
+        pool = SharedPool([qq], 2)
+        shutdown_event = mp.get_context("fork").Event()
+        pool_loop = asyncio.create_task(pool._run_loop(shutdown_event))
+        try:
+            with pytest.raises(StopTestException):
+                await qq._run_loop(shutdown_event, launch_workers=False)
+        finally:
+            shutdown_event.set()
+            await pool_loop
+        results = [json.loads(path.read_text()) for path in Path(d).glob("*.output")]
+        assert len(results) == 10
+        assert all(result == {"cpus": [cpu], "nice": nice} for result in results)
@@ -0,0 +1,216 @@
+import asyncio
+import json
+import multiprocessing as mp
+import subprocess
+import sys
+import tempfile
+from collections import Counter
+from pathlib import Path
+
+import pytest
+
+from quasiqueue import QuasiQueue
+from quasiqueue.pool import Lane, SharedPool, WeightedFairScheduler
+from quasiqueue.ratelimit import RateLimiter
+from quasiqueue.reader import QueueConsumer
+from quasiqueue.settings import Settings
+from tests.utils import QuickTestSettings, StopTestException
+
+
+async def _reader(item: str | int):
+    pass
+
+
+def make_lane(name: str, rate_limiter: RateLimiter | None = None, **kwargs) -> Lane:
+    settings = Settings(concurrent_tasks_per_process=100).model_dump()
+    return Lane(name, QueueConsumer(None, _reader, None, settings, rate_limiter=rate_limiter), **kwargs)  # type: ignore
+
+
+def dispatch_many(scheduler: WeightedFairScheduler, count: int) -> Counter:
+    served: Counter = Counter()
+    for _ in range(count):
+        lane = scheduler.candidates()[0]
+        scheduler.charge(lane)
+        served[lane.name] += 1
+    return served
+
+
+def test_weighted_fair_order():
+    lanes = [make_lane("a", weight=3), make_lane("b", weight=1)]
+    scheduler = WeightedFairScheduler(lanes, capacity=8)
+    served = dispatch_many(scheduler, 400)
+    assert served["a"] == 300
+    assert served["b"] == 100
+
+
+def test_idle_lane_does_not_bank_credit():
+    a = make_lane("a")
+    b = make_lane("b")
+    b.closed = True
+    scheduler = WeightedFairScheduler([a, b], capacity=8)
+    dispatch_many(scheduler, 100)
+
+    # Once b has work again it shares evenly instead of being served 100 times in a row.
+    b.closed = False
+    served = dispatch_many(scheduler, 20)
+    assert served["a"] == 10
+    assert served["b"] == 10
+
+
+def test_closed_lanes_are_skipped():
+    a = make_lane("a")
+    b = make_lane("b")
+    b.closed = True
+    scheduler = WeightedFairScheduler([a, b], capacity=8)
+    assert scheduler.candidates() == [a]
+    a.closed = True
+    assert scheduler.open is False
+
+
+def test_min_share_goes_first():
+    a = make_lane("a", weight=10)
+    b = make_lane("b", weight=1, min_share=0.5)
+    scheduler = WeightedFairScheduler([a, b], capacity=8)
+    assert scheduler.candidates()[0] is b
+
+
+def test_max_share_cap():
+    scheduler = WeightedFairScheduler([make_lane("a", max_share=0.25)], capacity=8)
+    assert scheduler.cap(scheduler.lanes[0]) == 2
+    scheduler = WeightedFairScheduler([make_lane("a", max_share=0.01)], capacity=8)
+    assert scheduler.cap(scheduler.lanes[0]) == 1
+
+
+def test_rate_limited_lane_is_skipped():
+    limiter = RateLimiter(rate=1)
+    a = make_lane("a", rate_limiter=limiter)
+    b = make_lane("b")
+    scheduler = WeightedFairScheduler([a, b], capacity=8)
+    assert scheduler.candidates() == [a, b]
+    limiter.reserve()
+    assert scheduler.candidates() == [b]
+
+
+def test_invalid_weight():
+    with pytest.raises(ValueError):
+        make_lane("a", weight=0)
+
+
+def test_shared_pool_serves_every_queue():
+    with tempfile.TemporaryDirectory() as d:
+        dir_a = Path(d) / "a"
+        dir_b = Path(d) / "b"
+        dir_a.mkdir()
+        dir_b.mkdir()
+
+        script = f"""
+import asyncio
+import json
+import multiprocessing as mp
+from pathlib import Path
+
+from quasiqueue.runner import QueueRunner, run_queues
+from quasiqueue.settings import Settings
+
+class TestSettings(Settings):
+    graceful_shutdown_timeout: float = 0.5
+    empty_queue_sleep_time: float = 0.05
+    save_dir: str = ""
+
+async def writer_a(desired, settings):
+    for i in range(10):
+        yield f"a_{{i}}"
+    await asyncio.sleep(1)
+    raise StopIteration("done")
+
+async def writer_b(desired, settings):
+    for i in range(10):
+        yield f"b_{{i}}"
+    await asyncio.sleep(1)
+    raise StopIteration("done")
+
+async def reader_a(item, settings, ctx):
+    with open(Path(settings["save_dir"]) / f"{{item}}.output", "w") as f:
+        json.dump({{"item": item, "worker": mp.current_process().name, "ctx": ctx["queue"]}}, f)
+
+def reader_b(item, settings, ctx):
+    with open(Path(settings["save_dir"]) / f"{{item}}.output", "w") as f:
+        json.dump({{"item": item, "worker": mp.current_process().name, "ctx": ctx["queue"]}}, f)
+
+async def context_a():
+    return {{"queue": "a"}}
+
+def context_b():
+    return {{"queue": "b"}}
+
+runner_a = QueueRunner(
+    name="pool_a", reader=reader_a, writer=writer_a, context=context_a,
+    settings=TestSettings(save_dir=r"{dir_a}", pool_weight=2),
+)
+runner_b = QueueRunner(
+    name="pool_b", reader=reader_b, writer=writer_b, context=context_b,
+    settings=TestSettings(save_dir=r"{dir_b}"),
+)
+
+try:
+    run_queues(runner_a, runner_b, pool_processes=1)
+except:
+    pass
+"""
+        result = subprocess.run(
+            [sys.executable, "-c", script],
+            capture_output=True,
+            text=True,
+            timeout=30,
+        )
+
+        for queue, directory in (("a", dir_a), ("b", dir_b)):
+            files = list(directory.glob("*.output"))
+            assert len(files) == 10, f"Queue {queue} should have processed every item; stderr: {result.stderr}"
+            for file in files:
+                with open(file) as f:
+                    data = json.load(f)
+                assert data["item"].startswith(f"{queue}_")
+                assert data["ctx"] == queue
+                assert data["worker"].startswith("pool_worker_")
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_queue_does_not_block_pool():
+    with tempfile.TemporaryDirectory() as d:
+        dirs = {name: Path(d) / name for name in ("slow", "fast")}
+
+        def make_writer(name: str):
+            async def writer(desired: int):
+                for i in range(20):
+                    yield f"{name}_{i}"
+                await asyncio.sleep(1.5)
+                raise StopTestException("End Run")
+
+            return writer
+
+        async def reader(item: str, settings: dict):
+            (Path(settings["save_dir"]) / f"{item}.output").touch()
+
+        runners = []
+        for name, directory in dirs.items():
+            directory.mkdir()
+            settings = QuickTestSettings(save_dir=str(directory), rate_limit=2 if name == "slow" else None)
+            runners.append(QuasiQueue(name, reader=reader, writer=make_writer(name), settings=settings))
+        for runner in runners:
+            runner._prepare(1)
+        pool = SharedPool(runners, 1)
+        shutdown_event = mp.get_context("fork").Event()
+        pool_loop = asyncio.create_task(pool._run_loop(shutdown_event))
+        try:
+            await asyncio.gather(
+                *[runner._run_loop(shutdown_event, launch_workers=False) for runner in runners],
+                return_exceptions=True,
+            )
+        finally:
+            shutdown_event.set()
+            await pool_loop
+
+        # The slow queue gets its few items a second while the fast queue is served in full.
+        assert len(list(dirs["fast"].glob("*.output"))) == 20
+        assert len(list(dirs["slow"].glob("*.output"))) < 10
@@ -0,0 +1,138 @@
+import asyncio
+import os
+import pstats
+import signal
+import tempfile
+
+import pytest
+
+from quasiqueue import QuasiQueue
+from quasiqueue.profiling import WorkerProfiler
+from tests.utils import QuickTestSettings, StopTestException, _context
+
+
+def test_cprofile_item_window():
+    with tempfile.TemporaryDirectory() as d:
+        profiler = WorkerProfiler({"profile_dir": d, "profile_items": 3, "profile_duration": 60})
+        profiler.request()
+        profiler.tick()
+        assert profiler.active
+
+        for _ in range(3):
+            sum(range(1000))
+            profiler.item_dispatched()
+            profiler.tick()
+
+        assert not profiler.active
+        files = os.listdir(d)
+        assert len(files) == 1
+        assert files[0].endswith(".prof")
+        pstats.Stats(os.path.join(d, files[0]))
+
+
+def test_tracemalloc_duration_window():
+    with tempfile.TemporaryDirectory() as d:
+        profiler = WorkerProfiler({"profile_dir": d, "profile_mode": "tracemalloc", "profile_duration": 0})
+        profiler.request()
+        profiler.tick()
+        retained = [bytearray(1024) for _ in range(100)]
+        profiler.tick()
+
+        assert not profiler.active
+        assert len(retained) == 100
+        files = os.listdir(d)
+        assert len(files) == 1
+        with open(os.path.join(d, files[0])) as f:
+            assert f.read().startswith("# Memory growth")
+
+
+def test_stop_without_window():
+    profiler = WorkerProfiler({})
+    assert profiler.stop() is None
+
+
+@pytest.mark.asyncio
+async def test_profile_on_start():
+    with tempfile.TemporaryDirectory() as d, tempfile.TemporaryDirectory() as profile_dir:
+        settings = QuickTestSettings(
+            save_dir=d, profile_on_start=True, profile_items=5, profile_duration=0.3, profile_dir=profile_dir
+        )
+
+        async def writer(desired: int, settings: dict):
+            for i in range(20):
+                yield i
+            await asyncio.sleep(1)
+            raise StopTestException("Test complete")
+
+        def reader(item: str | int):
+            pass
+
+        qq = QuasiQueue(name="profile_on_start_test", reader=reader, writer=writer, settings=settings)
+        try:
+            await qq.main()
+        except StopTestException:
+            pass
+
+        profiles = [name for name in os.listdir(profile_dir) if name.endswith(".prof")]
+        assert len(profiles) == settings.num_processes
+        assert all(name.startswith("worker_") for name in profiles)
+
+
+@pytest.mark.asyncio
+async def test_profile_workers():
+    with tempfile.TemporaryDirectory() as d, tempfile.TemporaryDirectory() as profile_dir:
+        settings = QuickTestSettings(save_dir=d, profile_duration=0.2, profile_dir=profile_dir)
+        signalled = []
+
+        async def writer(desired: int, settings: dict):
+            if not signalled:
+                await asyncio.sleep(0.5)
+                signalled.append(qq.profile_workers())
+            for i in range(10):
+                yield i
+            await asyncio.sleep(1)
+            raise StopTestException("Test complete")
+
+        def reader(item: str | int):
+            pass
+
+        qq = QuasiQueue(name="profile_workers_test", reader=reader, writer=writer, settings=settings)
+        try:
+            await qq.main()
+        except StopTestException:
+            pass
+
+        assert signalled == [settings.num_processes]
+        assert len(os.listdir(profile_dir)) == settings.num_processes
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("start_method", ["fork", "spawn", "forkserver"])
+async def test_sigusr1_profiles_workers(start_method):
+    with tempfile.TemporaryDirectory() as d, tempfile.TemporaryDirectory() as profile_dir:
+        settings = QuickTestSettings(
+            save_dir=d, num_processes=2, start_method=start_method, profile_duration=0.2, profile_dir=profile_dir
+        )
+        signalled = []
+
+        async def writer(desired: int, settings: dict):
+            if not signalled:
+                # Give spawned workers time to start.
+                await asyncio.sleep(1.5)
+                os.kill(os.getpid(), signal.SIGUSR1)
+                signalled.append(True)
+            for i in range(10):
+                yield i
+            await asyncio.sleep(1)
+            raise StopTestException("Test complete")
+
+        qq = QuasiQueue(
+            name="sigusr1_test", reader="tests.utils:_reader", writer=writer, context=_context, settings=settings
+        )
+        try:
+            await qq.main()
+        except StopTestException:
+            pass
+
+        # Only the workers were signalled, not the forkserver or the resource tracker.
+        assert len(os.listdir(profile_dir)) == settings.num_processes
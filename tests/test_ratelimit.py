@@ -0,0 +1,91 @@
+import asyncio
+import json
+import multiprocessing as mp
+import tempfile
+import time
+from pathlib import Path
+
+import pytest
+
+from quasiqueue import QuasiQueue
+from quasiqueue.ratelimit import RateLimiter
+from tests.utils import QuickTestSettings, StopTestException
+
+
+def test_reservations_are_spaced_by_rate():
+    limiter = RateLimiter(rate=10)
+    delays = [limiter.reserve() for _ in range(5)]
+    assert delays[0] == 0
+    for i, delay in enumerate(delays):
+        assert delay == pytest.approx(i * 0.1, abs=0.02)
+
+
+def test_burst_allows_immediate_dispatch():
+    limiter = RateLimiter(rate=10, burst=3)
+    delays = [limiter.reserve() for _ in range(5)]
+    assert delays[:3] == [0, 0, 0]
+    assert delays[3] == pytest.approx(0.1, abs=0.02)
+    assert delays[4] == pytest.approx(0.2, abs=0.02)
+
+
+def test_ready():
+    limiter = RateLimiter(rate=10)
+    assert limiter.ready()
+    limiter.reserve()
+    assert not limiter.ready()
+    time.sleep(0.11)
+    assert limiter.ready()
+
+
+def test_invalid_rate():
+    with pytest.raises(ValueError):
+        RateLimiter(rate=0)
+
+
+def _reserve_many(limiter: RateLimiter, results, count: int):
+    for _ in range(count):
+        results.put(limiter.reserve())
+
+
+def test_limit_is_shared_across_processes():
+    ctx = mp.get_context("fork")
+    limiter = RateLimiter(rate=50, mp_context=ctx)
+    results = ctx.Queue()
+    processes = [ctx.Process(target=_reserve_many, args=(limiter, results, 10)) for _ in range(2)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    delays = sorted(results.get(timeout=1) for _ in range(20))
+    # Twenty reservations at 50/s need to be spread across ~0.38s regardless of which process made them.
+    assert delays[-1] == pytest.approx(19 / 50, abs=0.05)
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_queue():
+    with tempfile.TemporaryDirectory() as d:
+        settings = QuickTestSettings(save_dir=d, num_processes=2, rate_limit=20)
+
+        async def writer(desired: int, settings: dict):
+            for i in range(20):
+                yield i
+            await asyncio.sleep(1.5)
+            raise StopTestException("Test complete")
+
+        async def reader(item: str | int, settings: dict):
+            with open(Path(settings["save_dir"]) / f"{item}.output", "w") as f:
+                json.dump({"time": time.time()}, f)
+
+        qq = QuasiQueue(name="rate_limit_test", reader=reader, writer=writer, settings=settings)
+        try:
+            await qq.main()
+        except StopTestException:
+            pass
+
+        times = []
+        for file in Path(d).glob("*.output"):
+            with open(file) as f:
+                times.append(json.load(f)["time"])
+        assert len(times) == 20
+        assert max(times) - min(times) >= 0.85
@@ -0,0 +1,129 @@
+import asyncio
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import pytest
+
+from quasiqueue import QuasiQueue
+from quasiqueue.metrics import MetricsRegistry
+from quasiqueue.reader import QueueConsumer
+from tests.utils import QuickTestSettings, StopTestException
+
+
+async def _writer(desired: int, settings: dict):
+    for i in range(6):
+        yield i
+    await asyncio.sleep(1.5)
+    raise StopTestException("Test complete")
+
+
+def _timeout_handler(item: str | int, settings: dict):
+    with open(Path(settings["save_dir"]) / f"{item}.timeout", "w") as f:
+        json.dump({"item": item, "pid": os.getpid()}, f)
+
+
+@pytest.mark.asyncio
+async def test_async_reader_timeout_frees_slot():
+    with tempfile.TemporaryDirectory() as d:
+        settings = QuickTestSettings(
+            save_dir=d,
+            num_processes=1,
+            concurrent_tasks_per_process=1,
+            reader_timeout=0.2,
+        )
+
+        async def hanging_reader(item: str | int, settings: dict):
+            if item in (0, 1):
+                await asyncio.sleep(60)
+            with open(Path(settings["save_dir"]) / f"{item}.output", "w") as f:
+                json.dump({"item": item}, f)
+
+        qq = QuasiQueue(
+            name="async_timeout_test",
+            reader=hanging_reader,
+            writer=_writer,
+            settings=settings,
+            timeout_handler=_timeout_handler,
+        )
+
+        try:
+            await qq.main()
+        except StopTestException:
+            pass
+
+        outputs = {f.stem for f in Path(d).glob("*.output")}
+        timeouts = {f.stem for f in Path(d).glob("*.timeout")}
+        assert outputs == {"2", "3", "4", "5"}
+        assert timeouts == {"0", "1"}
+
+
+@pytest.mark.asyncio
+async def test_sync_reader_timeout_recycles_worker():
+    with tempfile.TemporaryDirectory() as d:
+        settings = QuickTestSettings(
+            save_dir=d,
+            num_processes=1,
+            reader_timeout=0.2,
+        )
+
+        started = time.time()
+
+        async def returning_writer(desired: int, settings: dict):
+            # Return between calls so the runner gets a chance to replace the recycled worker.
+            if time.time() > started + 1.5:
+                raise StopTestException("Test complete")
+            for i in range(6):
+                yield i
+
+        def hanging_reader(item: str | int, settings: dict):
+            if item == 0:
+                time.sleep(60)
+            with open(Path(settings["save_dir"]) / f"{item}.output", "w") as f:
+                json.dump({"item": item, "pid": os.getpid()}, f)
+
+        qq = QuasiQueue(
+            name="sync_timeout_test",
+            reader=hanging_reader,
+            writer=returning_writer,
+            settings=settings,
+            timeout_handler=_timeout_handler,
+        )
+
+        try:
+            await qq.main()
+        except StopTestException:
+            pass
+
+        outputs = {f.stem for f in Path(d).glob("*.output")}
+        assert outputs == {"1", "2", "3", "4", "5"}
+
+        with open(Path(d) / "0.timeout") as f:
+            hung_pid = json.load(f)["pid"]
+        for file in Path(d).glob("*.output"):
+            with open(file) as f:
+                assert json.load(f)["pid"] != hung_pid
+        assert qq.worker_launches >= 2
+
+
+@pytest.mark.asyncio
+async def test_reader_timeout_error_is_a_reader_error():
+    registry = MetricsRegistry("testing", 1)
+    timed_out = []
+
+    async def reader(item: int):
+        # Such as an HTTP client giving up, well within reader_timeout.
+        raise TimeoutError("upstream timed out")
+
+    settings = QuickTestSettings(save_dir="/tmp", reader_timeout=5).model_dump()
+    consumer = QueueConsumer(
+        None, reader, None, settings, timeout_handler=lambda item: timed_out.append(item), metrics=registry.worker()
+    )
+    with pytest.raises(TimeoutError):
+        await consumer._run_async({"item": 1})
+    counters = registry.snapshot()["counters"]
+    assert counters["reader_errors"] == 1
+    assert counters.get("reader_timeouts", 0) == 0
+    assert timed_out == []
@@ -0,0 +1,160 @@
+import asyncio
+import multiprocessing as mp
+import os
+import signal
+import tempfile
+import time
+from pathlib import Path
+
+import pytest
+
+from quasiqueue import QuasiQueue
+from quasiqueue.builder import Builder
+from quasiqueue.config import build_runners, load_config
+from quasiqueue.reader import QueueConsumer
+from quasiqueue.runner import QueueRunner
+from tests.utils import QuickTestSettings, _context, _reader
+
+
+async def empty_writer():
+    yield None
+
+
+def make_runner(d: str, **settings) -> tuple[QueueRunner, dict]:
+    """A runner whose settings_loader returns its starting settings updated with the `loaded` dict."""
+    base = {"save_dir": d, **settings}
+    loaded: dict = {}
+    runner = QuasiQueue(
+        "testing",
+        reader=_reader,
+        writer=empty_writer,
+        context=_context,
+        settings=QuickTestSettings(**base),
+        settings_loader=lambda: QuickTestSettings(**{**base, **loaded}),
+    )
+    return runner, loaded
+
+
+def test_reload_settings():
+    with tempfile.TemporaryDirectory() as d:
+        runner, loaded = make_runner(d)
+        builder = Builder(mp.get_context("fork").Queue(), runner.settings, empty_writer)
+        assert not runner.reload_settings(builder)
+
+        loaded.update(full_queue_sleep_max=7, cursor_save_interval=3, queue_backend="sqlite")
+        assert runner.reload_settings(builder)
+        assert runner.settings.full_queue_sleep_max == 7
+        assert builder.settings is runner.settings
+        assert builder.shards[0].settings is runner.settings
+        assert builder.cursors.interval == 3
+        # The backend can't change while the queue runs.
+        assert runner.settings.queue_backend == "memory"
+
+
+def test_reload_grows_metrics():
+    with tempfile.TemporaryDirectory() as d:
+        runner, loaded = make_runner(d, num_processes=1)
+        runner._prepare()
+        assert runner.metrics is not None
+        slots = runner.metrics.slots
+        loaded.update(num_processes=5)
+        assert runner.reload_settings()
+        assert runner.metrics.slots == slots * 5
+        # Every new worker gets a metrics row.
+        assert all(runner.metrics.worker() for _ in range(runner.metrics.slots))
+
+
+def test_reload_without_loader():
+    with tempfile.TemporaryDirectory() as d:
+        runner = QuasiQueue("testing", reader=_reader, writer=empty_writer, settings=QuickTestSettings(save_dir=d))
+        assert not runner.reload_settings()
+
+
+def test_failed_reload_keeps_settings():
+    with tempfile.TemporaryDirectory() as d:
+        runner, loaded = make_runner(d)
+        settings = runner.settings
+        loaded.update(num_processes="many")
+        assert not runner.reload_settings()
+        assert runner.settings is settings
+
+
+def test_consumer_follows_gauge():
+    gauge = mp.get_context("fork").RawValue("i", 4)
+    consumer = QueueConsumer(
+        None, _reader, None, QuickTestSettings(save_dir="/tmp").model_dump(), concurrency_gauge=gauge
+    )
+    assert consumer.limit == 4
+    gauge.value = 9
+    assert consumer.limit == 9
+
+
+def test_sighup():
+    with tempfile.TemporaryDirectory() as d:
+        runner, _ = make_runner(d)
+        previous = signal.getsignal(signal.SIGHUP)
+        try:
+            runner.setup_signals(mp.get_context("fork").Event())
+            generation = QueueRunner.reload_generation
+            os.kill(os.getpid(), signal.SIGHUP)
+            assert QueueRunner.reload_generation == generation + 1
+        finally:
+            signal.signal(signal.SIGHUP, previous)
+
+
+def test_reload_from_config_file():
+    with tempfile.TemporaryDirectory() as d:
+        path = Path(d) / "queues.toml"
+        body = """
+[queues.images]
+reader = "tests.utils:_reader"
+writer = "tests.utils:_writer"
+
+[queues.images.settings]
+lookup_block_size = {size}
+"""
+        path.write_text(body.format(size=10))
+        (runner,) = build_runners(load_config(path), path=path)
+        path.write_text(body.format(size=25))
+        assert runner.reload_settings()
+        assert runner.settings.lookup_block_size == 25
+
+
+async def wait_for(condition, timeout: float = 5) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "Timed out waiting for the reload."
+        await asyncio.sleep(0.02)
+
+
+@pytest.mark.asyncio
+async def test_reload_running_queue():
+    with tempfile.TemporaryDirectory() as d:
+        # A long backoff, which the reload has to cut short.
+        runner, loaded = make_runner(d, num_processes=2, full_queue_sleep_min=30, full_queue_sleep_max=30)
+        shutdown_event = mp.get_context("fork").Event()
+        loop = asyncio.create_task(runner._run_loop(shutdown_event))
+        try:
+            await wait_for(lambda: len(runner.processes) == 2)
+            await asyncio.sleep(0.3)
+            original = {process.pid for process in runner.processes}
+
+            loaded.update(num_processes=3, concurrent_tasks_per_process=7)
+            runner.request_reload()
+            await wait_for(lambda: len(runner.processes) == 3)
+            # The existing workers kept running and got the new task limit.
+            assert original < {process.pid for process in runner.processes}
+            assert set(runner.concurrency_limits().values()) == {7}
+            assert all(runner.worker_metrics.values())
+
+            loaded.update(num_processes=1)
+            runner.request_reload()
+            await wait_for(lambda: len([process for process in runner.processes if process.is_alive()]) == 1)
+            # The oldest workers were retired and nothing replaced them.
+            await asyncio.sleep(0.3)
+            survivors = [process for process in runner.processes if process.is_alive()]
+            assert len(survivors) == 1
+            assert survivors[0].pid not in original
+        finally:
+            shutdown_event.set()
+            await loop
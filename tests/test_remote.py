@@ -0,0 +1,170 @@
+import asyncio
+import json
+import multiprocessing as mp
+import socket
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from quasiqueue import QuasiQueue, Settings
+from quasiqueue.builder import Builder
+from quasiqueue.remote import AuthenticationError, QueueBroker, RemoteSource, parse_address
+from tests.utils import QuickTestSettings, StopTestException
+
+NODE = """
+import asyncio
+from quasiqueue.remote import remote_worker
+from tests.utils import QuickTestSettings, _context, _reader
+
+settings = QuickTestSettings(save_dir={save_dir!r}, num_processes=2, remote_authkey="secret", **{extra!r})
+asyncio.run(remote_worker({address!r}, _reader, _context, name="node", settings=settings).main())
+"""
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def start_broker(items: int = 0, **settings) -> QueueBroker:
+    queue = mp.get_context("fork").Queue()
+    for i in range(items):
+        queue.put(i)
+    # Let the queue's feeder thread flush so the broker sees every item.
+    await asyncio.sleep(0.2)
+    broker = QueueBroker(queue, Settings(remote_port=0, remote_authkey="secret", **settings))
+    await broker.start()
+    return broker
+
+
+def drain(queue) -> list:
+    items = []
+    while True:
+        try:
+            items.append(queue.get(True, 0.2))
+        except Exception:
+            return items
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("extra", [{}, {"queue_codec": "pickle", "trace_sample_rate": 0.5}])
+async def test_remote_worker_nodes(extra):
+    """Two worker nodes with two processes each share the items of one queue that has no local workers."""
+    port = free_port()
+    with tempfile.TemporaryDirectory() as d:
+        script = NODE.format(save_dir=d, address=f"127.0.0.1:{port}", extra=extra)
+        nodes = [subprocess.Popen([sys.executable, "-c", script], cwd=Path(__file__).parent.parent) for _ in range(2)]
+
+        async def writer(desired: int, settings: QuickTestSettings):
+            for i in range(50):
+                yield i
+            for _ in range(400):
+                if len(list(Path(settings.save_dir).glob("*.output"))) >= 50:
+                    break
+                await asyncio.sleep(0.05)
+            raise StopTestException("End Run")
+
+        settings = QuickTestSettings(save_dir=d, num_processes=0, remote_port=port, remote_authkey="secret", **extra)
+        qq = QuasiQueue("remote", reader=lambda item: None, writer=writer, settings=settings)
+        try:
+            with pytest.raises(StopTestException):
+                await qq.main()
+        finally:
+            for node in nodes:
+                node.terminate()
+            for node in nodes:
+                node.wait(10)
+
+        outputs = [json.loads(path.read_text()) for path in Path(d).glob("*.output")]
+        # The readers got the items themselves, decoded exactly once.
+        assert {path.name for path in Path(d).glob("*.output")} == {f"{i}.output" for i in range(50)}
+    assert len(outputs) == 50
+    assert len({output["pid"] for output in outputs}) >= 2
+
+
+@pytest.mark.asyncio
+async def test_credit_and_batch_size():
+    broker = await start_broker(20, remote_batch_size=8)
+    source = RemoteSource("127.0.0.1", broker.port, "secret")
+    try:
+        assert await source.fetch(5) == [0, 1, 2, 3, 4]
+        # Credit above the batch size is capped.
+        assert len(await source.fetch(100)) == 8
+        assert len(await source.fetch(100)) == 7
+        assert await source.fetch(100) == []
+    finally:
+        source.close()
+        await broker.close()
+
+
+@pytest.mark.asyncio
+async def test_disconnect_requeues_batch():
+    broker = await start_broker(10)
+    source = RemoteSource("127.0.0.1", broker.port, "secret")
+    try:
+        first = await source.fetch(4)
+        second = await source.fetch(4)
+        # The node disconnects without acknowledging its second batch by asking for more.
+        source.close()
+        for _ in range(50):
+            if not broker.connections:
+                break
+            await asyncio.sleep(0.02)
+        remaining = drain(broker.queue)
+    finally:
+        await broker.close()
+    assert first == [0, 1, 2, 3]
+    assert sorted(remaining) == sorted(second + [8, 9])
+
+
+@pytest.mark.asyncio
+async def test_wrong_authkey():
+    broker = await start_broker(5)
+    source = RemoteSource("127.0.0.1", broker.port, "wrong")
+    try:
+        with pytest.raises(AuthenticationError):
+            await source.fetch(5)
+        # A node that can't authenticate backs off instead of crashing.
+        assert [item async for item in source(5)] == [None]
+    finally:
+        source.close()
+        await broker.close()
+    assert len(drain(broker.queue)) == 5
+
+
+@pytest.mark.asyncio
+async def test_node_queues_unhashable_items():
+    broker = await start_broker()
+    for i in range(3):
+        broker.queue.put({"id": i})
+    await asyncio.sleep(0.2)
+    source = RemoteSource("127.0.0.1", broker.port, "secret")
+    node_queue = mp.get_context("fork").Queue()
+    try:
+        # Nodes skip the requeue history, so dict items don't need a dedup_key.
+        assert await Builder(node_queue, Settings(prevent_requeuing_time=0), source).populate()
+    finally:
+        source.close()
+        await broker.close()
+    assert drain(node_queue) == [{"id": i} for i in range(3)]
+
+
+@pytest.mark.asyncio
+async def test_empty_authkey_rejected():
+    broker = QueueBroker(mp.get_context("fork").Queue(), Settings(remote_port=0))
+    with pytest.raises(ValueError):
+        await broker.start()
+    assert broker.server is None
+    with pytest.raises(ValueError):
+        RemoteSource("127.0.0.1", 8750, "")
+
+
+def test_parse_address():
+    assert parse_address("10.0.0.5:8750") == ("10.0.0.5", 8750)
+    assert parse_address(":8750") == ("127.0.0.1", 8750)
+    with pytest.raises(ValueError):
+        parse_address("10.0.0.5")
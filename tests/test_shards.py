@@ -0,0 +1,223 @@
+import asyncio
+import multiprocessing as mp
+import tempfile
+import threading
+import time
+from pathlib import Path
+from queue import Empty
+
+import pytest
+
+from quasiqueue import QuasiQueue
+from quasiqueue.builder import Builder
+from tests.utils import QuickTestSettings, StopTestException, _context, _reader
+
+
+def drain(queue) -> list:
+    items = []
+    while True:
+        try:
+            items.append(queue.get(True, 0.1))
+        except Empty:
+            return items
+
+
+def slow_shard(name: str, delay: float = 0.2, items: int = 5):
+    async def writer(desired: int):
+        await asyncio.sleep(delay)
+        for i in range(items):
+            yield f"{name}-{i}"
+
+    return writer
+
+
+@pytest.mark.asyncio
+async def test_shards_run_concurrently():
+    with tempfile.TemporaryDirectory() as d:
+        queue = mp.get_context("fork").Queue()
+        settings = QuickTestSettings(save_dir=d)
+        builder = Builder(queue, settings, [slow_shard(f"shard{i}") for i in range(4)])
+        started = time.monotonic()
+        assert await builder.populate()
+        # The shards sleep at the same time, so this takes about one shard's latency instead of four.
+        assert time.monotonic() - started < 0.6
+        assert sorted(drain(queue)) == sorted(f"shard{s}-{i}" for s in range(4) for i in range(5))
+
+
+@pytest.mark.asyncio
+async def test_shard_argument_and_fair_shares():
+    with tempfile.TemporaryDirectory() as d:
+        queue = mp.get_context("fork").Queue()
+        calls = []
+
+        async def writer(desired: int, shard: int):
+            calls.append((shard, desired))
+            for i in range(100):
+                yield f"{shard}-{i}"
+
+        settings = QuickTestSettings(save_dir=d, writer_shards=3, max_queue_size=100, lookup_block_size=100)
+        builder = Builder(queue, settings, writer)
+        assert await builder.populate()
+        # 50 items of room split between three shards.
+        assert sorted(calls) == [(0, 17), (1, 17), (2, 17)]
+        items = drain(queue)
+        for shard in range(3):
+            assert len([item for item in items if item.startswith(f"{shard}-")]) == 17
+
+
+@pytest.mark.asyncio
+async def test_shards_back_off_separately():
+    with tempfile.TemporaryDirectory() as d:
+        queue = mp.get_context("fork").Queue()
+        calls = {"busy": 0, "empty": 0}
+
+        async def busy(desired: int):
+            calls["busy"] += 1
+            for i in range(desired):
+                yield f"busy-{calls['busy']}-{i}"
+
+        async def empty(desired: int):
+            calls["empty"] += 1
+            yield None
+
+        settings = QuickTestSettings(save_dir=d, full_queue_sleep_min=10, full_queue_sleep_max=10)
+        builder = Builder(queue, settings, [busy, empty])
+        assert await builder.populate()
+        drain(queue)
+        assert await builder.populate()
+        assert calls == {"busy": 2, "empty": 1}
+        assert builder.shards[1].empty_count == 1
+        assert not builder.shards[1].ready()
+        assert builder.full_consecutive == 0
+
+
+@pytest.mark.asyncio
+async def test_shards_exhausted():
+    with tempfile.TemporaryDirectory() as d:
+        queue = mp.get_context("fork").Queue()
+
+        async def empty(desired: int):
+            yield None
+
+        settings = QuickTestSettings(
+            save_dir=d, empty_queue_sleep_time=2, full_queue_sleep_min=0.01, full_queue_sleep_max=0.01
+        )
+        builder = Builder(queue, settings, [empty, empty])
+        assert not await builder.populate()
+        assert not builder.exhausted
+        await asyncio.sleep(0.05)
+        assert not await builder.populate()
+        assert builder.exhausted
+
+
+@pytest.mark.asyncio
+async def test_shard_errors_propagate():
+    with tempfile.TemporaryDirectory() as d:
+        queue = mp.get_context("fork").Queue()
+
+        async def broken(desired: int):
+            await asyncio.sleep(0.05)
+            raise StopTestException("broken shard")
+            yield
+
+        builder = Builder(queue, QuickTestSettings(save_dir=d), [slow_shard("ok", 0.01), broken])
+        with pytest.raises(StopTestException):
+            await builder.populate()
+        # Items from the healthy shard were still queued.
+        assert len(drain(queue)) == 5
+
+
+@pytest.mark.asyncio
+async def test_sharded_run():
+    with tempfile.TemporaryDirectory() as d:
+
+        async def writer(desired: int, shard: int):
+            for i in range(shard, 50, 5):
+                yield i
+            await asyncio.sleep(1)
+            raise StopTestException("End Run")
+
+        settings = QuickTestSettings(save_dir=d, writer_shards=5)
+        qq = QuasiQueue("testing", reader=_reader, writer=writer, context=_context, settings=settings)
+        with pytest.raises(StopTestException):
+            await qq.main()
+        assert {path.name for path in Path(d).glob("*.output")} == {f"{i}.output" for i in range(50)}
+
+
+@pytest.mark.asyncio
+async def test_sync_writer_keeps_loop_responsive():
+    with tempfile.TemporaryDirectory() as d:
+        queue = mp.get_context("fork").Queue()
+        threads = set()
+        calls = []
+
+        def writer(desired: int):
+            threads.add(threading.current_thread().name)
+            # A blocking query.
+            time.sleep(0.3)
+            start = len(threads) * 1000 + len(calls) * desired
+            calls.append(desired)
+            yield from range(start, start + desired)
+
+        gaps = []
+
+        async def ticker():
+            last = time.monotonic()
+            while True:
+                await asyncio.sleep(0.01)
+                gaps.append(time.monotonic() - last)
+                last = time.monotonic()
+
+        builder = Builder(queue, QuickTestSettings(save_dir=d), writer)
+        ticks = asyncio.create_task(ticker())
+        assert await builder.populate()
+        ticks.cancel()
+        assert max(gaps) < 0.1
+        assert sorted(drain(queue)) == list(range(1000, 1010))
+
+        # Every call runs on the shard's own thread.
+        assert await builder.populate()
+        assert len(threads) == 1
+        builder.release()
+
+
+@pytest.mark.asyncio
+async def test_sync_writer_chunks():
+    with tempfile.TemporaryDirectory() as d:
+        queue = mp.get_context("fork").Queue()
+        closed = []
+
+        class Writer:
+            def __call__(self, desired: int, shard: int):
+                try:
+                    for i in range(1000):
+                        yield f"{shard}-{i}"
+                finally:
+                    closed.append(shard)
+
+        settings = QuickTestSettings(save_dir=d, writer_shards=2, lookup_block_size=10)
+        builder = Builder(queue, settings, Writer())
+        assert await builder.populate()
+        # Each shard fills its half of the 50 items of room, fetched from its thread 10 at a time.
+        assert len(drain(queue)) == 50
+        # Stopping early closes the generators in their threads.
+        await asyncio.sleep(0.1)
+        assert sorted(closed) == [0, 1]
+        builder.release()
+
+
+@pytest.mark.asyncio
+async def test_sync_writer_run():
+    with tempfile.TemporaryDirectory() as d:
+
+        def writer(desired: int):
+            yield from range(50)
+            time.sleep(1)
+            raise StopTestException("End Run")
+
+        qq = QuasiQueue(
+            "testing", reader=_reader, writer=writer, context=_context, settings=QuickTestSettings(save_dir=d)
+        )
+        with pytest.raises(StopTestException):
+            await qq.main()
+        assert {path.name for path in Path(d).glob("*.output")} == {f"{i}.output" for i in range(50)}
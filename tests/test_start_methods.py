@@ -0,0 +1,72 @@
+import asyncio
+import tempfile
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from quasiqueue import QuasiQueue
+from tests.utils import QuickTestSettings, StopTestException, _context, _reader, get_pids_from_results, run_and_gather
+
+
+async def _wait_for_outputs(desired: int, settings: QuickTestSettings):
+    """Yield ten items, then wait for the slower starting workers to finish them before stopping."""
+    for i in range(10):
+        yield i
+    for _ in range(200):
+        if len(list(Path(settings.save_dir).glob("*.output"))) >= 10:
+            break
+        await asyncio.sleep(0.05)
+    raise StopTestException("End Run")
+
+
+async def run_with(settings: QuickTestSettings, reader: Any, context: Any = _context) -> int:
+    qq = QuasiQueue("start_methods", reader=reader, writer=_wait_for_outputs, context=context, settings=settings)
+    try:
+        await qq.main()
+    except StopTestException:
+        pass
+    return len(list(Path(settings.save_dir).glob("*.output")))
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("start_method", ["spawn", "forkserver"])
+async def test_start_method(start_method):
+    with tempfile.TemporaryDirectory() as d:
+        settings = QuickTestSettings(save_dir=d, num_processes=2, start_method=start_method)
+        assert await run_with(settings, _reader) == 10
+
+
+@pytest.mark.asyncio
+async def test_reader_import_path():
+    with tempfile.TemporaryDirectory() as d:
+        settings = QuickTestSettings(save_dir=d, num_processes=1, start_method="spawn", preload_modules=["json"])
+        assert await run_with(settings, "tests.utils:_reader", "tests.utils:_context") == 10
+
+
+@pytest.mark.asyncio
+async def test_import_path_with_fork():
+    with tempfile.TemporaryDirectory() as d:
+        settings = QuickTestSettings(save_dir=d, num_processes=1)
+        assert await run_with(settings, "tests.utils:_reader") == 10
+
+
+@pytest.mark.asyncio
+async def test_closure_rejected_for_spawn():
+    def closure_reader(item: str):
+        pass
+
+    with tempfile.TemporaryDirectory() as d:
+        settings = QuickTestSettings(save_dir=d, start_method="spawn")
+        qq = QuasiQueue("start_methods", reader=closure_reader, writer=_wait_for_outputs, settings=settings)
+        with pytest.raises(ValueError, match="reader"):
+            await qq.main()
+
+
+@pytest.mark.asyncio
+async def test_fork_is_default():
+    with tempfile.TemporaryDirectory() as d:
+        settings = QuickTestSettings(save_dir=d, num_processes=2)
+        assert settings.start_method == "fork"
+        results = await run_and_gather(settings)
+    assert len(get_pids_from_results(results)) == 2
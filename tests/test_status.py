@@ -0,0 +1,129 @@
+import asyncio
+import multiprocessing as mp
+import tempfile
+import time
+from pathlib import Path
+
+import pytest
+
+from quasiqueue import QuasiQueue
+from quasiqueue.status import StatusPublisher, read_status, render_status
+from tests.utils import QuickTestSettings, StopTestException, _context, _reader
+
+
+@pytest.mark.asyncio
+async def test_status_published():
+    seen = []
+    calls = []
+
+    async def writer(desired: int, settings: QuickTestSettings):
+        # The status is published between writer calls, so later calls only check on it.
+        calls.append(desired)
+        if len(calls) == 1:
+            for i in range(50):
+                yield i
+        statuses = read_status(settings.status_dir)
+        if statuses and statuses[0]["items_processed"] >= 50:
+            seen.append(statuses[0])
+            raise StopTestException("End Run")
+        if len(calls) > 200:
+            raise StopTestException("End Run")
+
+    with tempfile.TemporaryDirectory() as d:
+        settings = QuickTestSettings(save_dir=d, status_dir=f"{d}/status", status_interval=0.05, num_processes=2)
+        qq = QuasiQueue("status", reader=_reader, writer=writer, context=_context, settings=settings)
+        with pytest.raises(StopTestException):
+            await qq.main()
+        # The file is removed when the queue shuts down.
+        assert read_status(settings.status_dir) == []
+
+    assert seen, "The status never showed the processed items."
+    status = seen[0]
+    assert status["queue"] == "status"
+    assert status["max_queue_size"] == settings.max_queue_size
+    assert status["items_queued"] == 50
+    assert status["items_processed_per_sec"] is not None
+    assert len(status["workers"]) == 2
+    assert sum(worker["jobs"] for worker in status["workers"]) == 50
+    assert all(worker["pid"] and worker["tasks"] == 4 for worker in status["workers"])
+    assert "status" in render_status(seen)
+
+
+@pytest.mark.asyncio
+async def test_status_published_during_backoff():
+    async def writer(desired: int):
+        yield None
+
+    with tempfile.TemporaryDirectory() as d:
+        settings = QuickTestSettings(
+            save_dir=d,
+            status_dir=f"{d}/status",
+            status_interval=0.05,
+            full_queue_sleep_min=30,
+            full_queue_sleep_max=30,
+        )
+        qq = QuasiQueue("status", reader=_reader, writer=writer, context=_context, settings=settings)
+        shutdown_event = mp.get_context("fork").Event()
+        loop = asyncio.create_task(qq._run_loop(shutdown_event))
+        published = set()
+        try:
+            for _ in range(20):
+                await asyncio.sleep(0.05)
+                statuses = read_status(settings.status_dir)
+                if statuses:
+                    published.add(statuses[0]["time"])
+        finally:
+            shutdown_event.set()
+            await loop
+
+    # The file kept being rewritten while the queue loop slept, and it shows the backoff.
+    assert len(published) >= 5
+    assert statuses[0]["backoff_sleep_seconds"] == 30
+
+
+def make_status(**changes):
+    status = {
+        "queue": "images",
+        "pid": 100,
+        "depth": 12,
+        "max_queue_size": 300,
+        "items_queued": 500,
+        "items_processed": 488,
+        "reader_errors": 1,
+        "backoff_consecutive": 0,
+        "backoff_sleep_seconds": 0,
+        "writer_exhausted": False,
+        "workers": [{"name": "worker_000", "pid": 101, "started": time.time() - 90, "jobs": 44, "tasks": 4}],
+    }
+    status.update(changes)
+    return status
+
+
+def test_publisher_rates():
+    with tempfile.TemporaryDirectory() as d:
+        publisher = StatusPublisher(d, "images", 0.01)
+        assert publisher.due()
+        publisher.publish(make_status())
+        assert read_status(d)[0]["items_processed_per_sec"] is None
+        time.sleep(0.02)
+        publisher.publish(make_status(items_processed=588))
+        rate = read_status(d)[0]["items_processed_per_sec"]
+        assert 0 < rate <= 100 / 0.02
+        publisher.close()
+        assert list(Path(d).iterdir()) == []
+
+
+def test_render_status():
+    with tempfile.TemporaryDirectory() as d:
+        publisher = StatusPublisher(d, "images", 1.0)
+        publisher.publish(make_status(writer_exhausted=True, backoff_consecutive=3, backoff_sleep_seconds=4.0))
+        output = render_status(read_status(d))
+    assert "images" in output
+    assert "12/300" in output
+    assert "writer exhausted" in output
+    assert "backoff x3" in output
+    assert "worker_000" in output and "1m30s" in output
+
+    stale = make_status(time=time.time() - 60, interval=1.0, items_queued_per_sec=None, items_processed_per_sec=None)
+    assert "stale 1m00s" in render_status([stale], workers=False)
+    assert render_status([]) == "No queues are publishing status."
@@ -0,0 +1,87 @@
+import asyncio
+import json
+import os
+import tempfile
+
+import pytest
+
+from quasiqueue import QuasiQueue
+from quasiqueue.timeline import MERGED_TRACE, EventRecorder, get_recorder, merge_traces, now
+from tests.utils import QuickTestSettings, StopTestException
+
+
+def test_recorder_ring_buffer():
+    with tempfile.TemporaryDirectory() as d:
+        recorder = EventRecorder(d, capacity=3)
+        for i in range(5):
+            recorder.instant(f"event_{i}", "loop")
+        assert [event[1] for event in recorder.events] == ["event_2", "event_3", "event_4"]
+
+
+def test_recorder_lanes():
+    with tempfile.TemporaryDirectory() as d:
+        recorder = EventRecorder(d)
+        first = recorder.acquire_lane()
+        second = recorder.acquire_lane()
+        assert (first, second) == ("task 0", "task 1")
+        recorder.release_lane(first)
+        assert recorder.acquire_lane() == "task 0"
+        assert recorder.acquire_lane() == "task 2"
+
+
+def test_dump_and_merge():
+    with tempfile.TemporaryDirectory() as d:
+        recorder = EventRecorder(d)
+        start = now()
+        recorder.complete("populate", "queue", start, start + 50, {"populated": True})
+        recorder.name_process(12345, "queue worker_000")
+        path = recorder.dump()
+        assert path.name == f"{os.getpid()}.trace.json"
+
+        with open(merge_traces(d)) as f:
+            events = json.load(f)["traceEvents"]
+        populate = [event for event in events if event["name"] == "populate"][0]
+        assert populate["ph"] == "X"
+        assert populate["dur"] == 50
+        assert populate["args"] == {"populated": True}
+        names = {event["pid"]: event["args"]["name"] for event in events if event["name"] == "process_name"}
+        assert names[12345] == "queue worker_000"
+
+
+def test_get_recorder_disabled():
+    assert get_recorder({}) is None
+    assert get_recorder({"timeline_dir": None}) is None
+
+
+@pytest.mark.asyncio
+async def test_timeline_run():
+    with tempfile.TemporaryDirectory() as d, tempfile.TemporaryDirectory() as timeline_dir:
+        settings = QuickTestSettings(save_dir=d, timeline_dir=timeline_dir, max_jobs_per_process=2)
+        calls = []
+
+        async def writer(desired: int, settings: dict):
+            calls.append(desired)
+            if len(calls) == 1:
+                for i in range(8):
+                    yield i
+            elif len(calls) > 20:
+                raise StopTestException("Test complete")
+
+        async def reader(item: str | int):
+            await asyncio.sleep(0.01)
+
+        qq = QuasiQueue(name="timeline_test", reader=reader, writer=writer, settings=settings)
+        try:
+            await qq.main()
+        except StopTestException:
+            pass
+
+        with open(os.path.join(timeline_dir, MERGED_TRACE)) as f:
+            events = json.load(f)["traceEvents"]
+        names = {event["name"] for event in events}
+        assert {"spawn", "spawn_sleep", "populate", "worker_exit", "reader", "get", "recycle"} <= names
+
+        readers = [event for event in events if event["name"] == "reader"]
+        assert sorted(int(event["args"]["item"]) for event in readers) == list(range(8))
+        process_names = [event["args"]["name"] for event in events if event["name"] == "process_name"]
+        assert "timeline_test worker_000" in process_names
@@ -0,0 +1,74 @@
+import asyncio
+import multiprocessing as mp
+import pickle
+import tempfile
+
+import pytest
+
+from quasiqueue import Builder, QuasiQueue, Settings
+from quasiqueue.tracing import TracedItem, unwrap
+from tests.utils import QuickTestSettings, StopTestException
+
+
+def test_unwrap():
+    assert unwrap("plain") == ("plain", None)
+    assert unwrap(TracedItem("traced", 12.5)) == ("traced", 12.5)
+
+
+def test_traced_item_pickles():
+    traced = pickle.loads(pickle.dumps(TracedItem({"id": 1}, 3.0)))
+    assert traced.item == {"id": 1}
+    assert traced.enqueued == 3.0
+
+
+@pytest.mark.asyncio
+async def test_builder_sampling():
+    ctx = mp.get_context("fork")
+
+    async def writer():
+        for i in range(20):
+            yield i
+
+    for rate, expected in ((0.0, 0), (1.0, 20)):
+        queue = ctx.Queue(100)
+        builder = Builder(queue, Settings(trace_sample_rate=rate), writer)
+        await builder.populate()
+        items = [queue.get(timeout=1) for _ in range(20)]
+        assert len([item for item in items if isinstance(item, TracedItem)]) == expected
+        assert [unwrap(item)[0] for item in items] == list(range(20))
+
+
+@pytest.mark.asyncio
+async def test_queue_wait_and_service_time():
+    with tempfile.TemporaryDirectory() as d:
+        settings = QuickTestSettings(save_dir=d, num_processes=1, trace_sample_rate=1.0)
+        snapshots = []
+
+        async def writer(desired: int, settings: dict):
+            for i in range(10):
+                yield i
+            await asyncio.sleep(0.5)
+            raise StopTestException("Test complete")
+
+        async def reader(item: str | int):
+            assert isinstance(item, int)
+            await asyncio.sleep(0.05)
+
+        qq = QuasiQueue(
+            name="tracing_test",
+            reader=reader,
+            writer=writer,
+            settings=settings,
+            metrics_callback=snapshots.append,
+        )
+        try:
+            await qq.main()
+        except StopTestException:
+            pass
+
+        # Readers receive the original items, so the isinstance check never fails.
+        assert snapshots[-1]["counters"]["reader_errors"] == 0
+        histograms = snapshots[-1]["histograms"]
+        assert histograms["queue_wait"]["count"] == 10
+        assert histograms["service_time"]["count"] == 10
+        assert histograms["service_time"]["sum"] >= 10 * 0.05
@@ -0,0 +1,103 @@
+import json
+import random
+import tempfile
+
+import pytest
+
+from quasiqueue import Settings
+from quasiqueue.tuner import Distribution, Simulator, settings_grid, tune
+
+
+def test_distribution_parse():
+    rng = random.Random(0)
+    assert Distribution.parse("0.25").sample(rng) == 0.25
+    assert Distribution.parse("const:0.5").sample(rng) == 0.5
+    assert 0.1 <= Distribution.parse("uniform:0.1,0.2").sample(rng) <= 0.2
+    assert Distribution.parse("exp:0.1").sample(rng) >= 0
+    assert Distribution.parse("lognormal:0.1,0.5").sample(rng) > 0
+    with pytest.raises(ValueError):
+        Distribution.parse("bogus:1")
+
+
+def test_distribution_from_samples():
+    rng = random.Random(0)
+    with tempfile.NamedTemporaryFile("w", suffix=".txt") as f:
+        f.write("0.1\n0.2\n\n0.3\n")
+        f.flush()
+        distribution = Distribution.parse(f"file:{f.name}")
+        assert {distribution.sample(rng) for _ in range(50)} == {0.1, 0.2, 0.3}
+
+
+def test_distribution_from_metrics_snapshot():
+    rng = random.Random(0)
+    snapshot = {
+        "histograms": {
+            "reader_latency": {"buckets": [[0.01, 0], [0.05, 10], [0.1, 10], ["+Inf", 10]], "sum": 0.3, "count": 10}
+        }
+    }
+    with tempfile.NamedTemporaryFile("w", suffix=".json") as f:
+        json.dump([snapshot], f)
+        f.flush()
+        distribution = Distribution.parse(f"histogram:{f.name}")
+        assert all(0.01 <= distribution.sample(rng) <= 0.05 for _ in range(50))
+
+
+def test_simulator_matches_default_policy():
+    # With defaults the scheduler only adds lookup_block_size items per populate and waits
+    # for the queue to drain below 30%, while idle workers sleep for a full second.
+    result = Simulator(Settings(), Distribution.parse("0.001"), Distribution.parse("0")).run()
+    assert 80 < result["throughput"] < 120
+    assert result["latency_p50"] > 0.5
+    assert result["max_queue_depth"] <= Settings().max_queue_size * 0.8
+
+
+def test_simulator_reader_bound():
+    settings = Settings(num_processes=2, lookup_block_size=50, empty_queue_sleep_time=0.05)
+    sync = Simulator(settings, Distribution.parse("0.1"), Distribution.parse("0"), is_async=False).run()
+    # Two sync workers at 100ms per item can't do better than 20 items per second.
+    assert 15 < sync["throughput"] <= 20.5
+
+    settings = settings.model_copy(update={"concurrent_tasks_per_process": 8})
+    concurrent = Simulator(settings, Distribution.parse("0.1"), Distribution.parse("0")).run()
+    assert concurrent["throughput"] > sync["throughput"] * 4
+
+
+def test_simulator_arrival_rate():
+    settings = Settings(empty_queue_sleep_time=0.05)
+    result = Simulator(settings, Distribution.parse("0.01"), Distribution.parse("0"), arrival_rate=20).run()
+    assert 15 < result["throughput"] < 25
+    assert result["backoffs_per_sec"] > 0
+
+
+def test_settings_grid():
+    grid = {"max_queue_size": [100, 200], "full_queue_sleep": [(0.1, 1.0), (1.0, 10.0)]}
+    combinations = list(settings_grid(Settings(num_processes=3), grid))
+    assert len(combinations) == 4
+    assert {(s.max_queue_size, s.full_queue_sleep_min, s.full_queue_sleep_max) for s in combinations} == {
+        (100, 0.1, 1.0),
+        (100, 1.0, 10.0),
+        (200, 0.1, 1.0),
+        (200, 1.0, 10.0),
+    }
+    assert all(s.num_processes == 3 for s in combinations)
+
+
+def test_tune_recommends_within_limits():
+    grid = {"max_queue_size": [100, 1000], "lookup_block_size": [10, 50], "empty_queue_sleep_time": [0.05, 1.0]}
+    candidates = tune(
+        Distribution.parse("0.005"),
+        Distribution.parse("0.001"),
+        grid=grid,
+        is_async=False,
+        item_bytes=1024 * 512,
+        max_memory_mb=100,
+        duration=10,
+    )
+    # 1000 items of 512KB would blow the memory limit.
+    assert {c["settings"]["max_queue_size"] for c in candidates} == {100}
+    best = candidates[0]
+    assert best["settings"]["lookup_block_size"] == 50
+    assert best["settings"]["empty_queue_sleep_time"] == 0.05
+    assert best["throughput"] == max(c["throughput"] for c in candidates)
+
+    assert tune(Distribution.parse("1"), Distribution.parse("0"), grid=grid, max_latency_p99=0.5, duration=5) == []